@@ -5,18 +5,48 @@ Calendar Event API
 This module provides a simple REST API for managing calendar events using Flask.
 
 Routes:
-    POST /api/v1/calendar/ - Create a new event
-    GET /api/v1/calendar/ - List all events
+    POST /api/v1/calendar/ - Create a new event; with ?check_conflicts=1 a timed event overlapping other events is
+        refused with 409 and the list of conflicting events
+    GET /api/v1/calendar/ - List all events, optionally within a date range (?from=YYYY-MM-DD&to=YYYY-MM-DD),
+        one page at a time (?limit=N&cursor=...) or as a streamed JSON array (?stream=1), with only some fields
+        of every event (?fields=id,date,title). Large responses are compressed with brotli or gzip as negotiated
+        from Accept-Encoding. Recurring series are expanded into their occurrences only within a date range.
     GET /api/v1/calendar/<event_id>/ - Get details of a specific event
     PUT /api/v1/calendar/<event_id>/ - Update an existing event
     DELETE /api/v1/calendar/<event_id>/ - Delete an event
+    DELETE /api/v1/calendar/<event_id>/<YYYY-MM-DD>/ - Cancel one occurrence of a recurring event
+    POST /api/v1/calendar/batch - Create, update and delete many events with a single save
+    GET /api/v1/calendar/search?q=... - Find events by word prefixes of their title and text, best matches first
+    GET /api/v1/calendar/changes?since=N - Get the events created, updated or deleted after change number N
+    GET /api/v1/calendar/stream - Answered with 501: the Server-Sent Events stream of changes is only served by the
+        ASGI application in asgi.py
+    GET /api/v1/calendar/freebusy?from=YYYY-MM-DDTHH:MM&to=YYYY-MM-DDTHH:MM - Get the busy and free intervals of
+        a time window, and with ?events=1 the timed events overlapping it
+    GET /api/v1/calendar/export.ics - Stream all events as an iCalendar (.ics) file, read from storage a chunk at a time
+    POST /api/v1/calendar/import - Create the events of an iCalendar (.ics) body, parsed while it is read and committed
+        in batches, and report the events that could not be imported
+    GET /metrics - Operation timings, counters and storage size in the Prometheus text format
+
+Every route under /api/v1/calendar/ is also served under /api/v1/calendars/<calendar_id>/ for a separate calendar with
+a storage of its own, created by its first POST; the default calendar keeps the original paths. Calendar IDs consist
+of Latin letters, digits, '-' and '_'. An unknown calendar is answered with 404.
 
 Functions:
     create_event(): Create a new event with given data
-    list_events(): List all events
+    list_events(): List all events or events within a date range
     read_event(event_id): Get details of a specific event
     update_event(event_id): Update an existing event with given data
     delete_event(event_id): Delete an event
+    cancel_occurrence(event_id, day): Cancel one occurrence of a recurring event
+    batch_events(): Apply a batch of create/update/delete operations and report the status of each
+    search_events(): Find events matching a search query
+    list_changes(): Get the changes made after a sequence number for incremental sync
+    stream_changes(): Refuse the stream of changes, which only the ASGI application serves
+    freebusy(): Get the busy and free intervals of a time window
+    export_calendar(): Stream the events of a calendar in the iCalendar format
+    import_calendar(): Import the events of an iCalendar body in batches
+    export_metrics(): Render the collected metrics for Prometheus
+    set_default_calendar(calendar): Serve the default calendar from another storage
 
 Exceptions:
     LogicException: Custom exception raised for logical errors in event operations
@@ -28,91 +58,477 @@ API для управления событиями календаря
 Этот модуль предоставляет простой REST API для управления событиями календаря с использованием Flask.
 
 Маршруты:
-    POST /api/v1/calendar/ - Создать новое событие
-    GET /api/v1/calendar/ - Получить список всех событий
+    POST /api/v1/calendar/ - Создать новое событие; с ?check_conflicts=1 событие со временем, пересекающееся
+        с другими событиями, отклоняется с кодом 409 и списком конфликтующих событий
+    GET /api/v1/calendar/ - Получить список всех событий, при необходимости в диапазоне дат (?from=YYYY-MM-DD&to=YYYY-MM-DD),
+        постранично (?limit=N&cursor=...) или потоковым JSON-массивом (?stream=1), только с частью полей каждого
+        события (?fields=id,date,title). Большие ответы сжимаются brotli или gzip по заголовку Accept-Encoding.
+        Повторяющиеся серии разворачиваются в повторения только в диапазоне дат.
     GET /api/v1/calendar/<event_id>/ - Получить информацию о конкретном событии
     PUT /api/v1/calendar/<event_id>/ - Обновить существующее событие
     DELETE /api/v1/calendar/<event_id>/ - Удалить событие
+    DELETE /api/v1/calendar/<event_id>/<YYYY-MM-DD>/ - Отменить одно повторение повторяющегося события
+    POST /api/v1/calendar/batch - Создать, обновить и удалить множество событий с одним сохранением
+    GET /api/v1/calendar/search?q=... - Найти события по префиксам слов заголовка и текста, лучшие совпадения первыми
+    GET /api/v1/calendar/changes?since=N - Получить события, созданные, обновленные или удаленные после изменения N
+    GET /api/v1/calendar/stream - Возвращает 501: поток изменений Server-Sent Events обслуживается только
+        ASGI-приложением из asgi.py
+    GET /api/v1/calendar/freebusy?from=YYYY-MM-DDTHH:MM&to=YYYY-MM-DDTHH:MM - Получить занятые и свободные интервалы
+        окна времени, а с ?events=1 — пересекающиеся с ним события со временем
+    GET /api/v1/calendar/export.ics - Выгрузить все события потоком в виде файла iCalendar (.ics), читая их
+        из хранилища порциями
+    POST /api/v1/calendar/import - Создать события из тела запроса в формате iCalendar (.ics), разбираемого по мере
+        чтения и сохраняемого пакетами, и сообщить о событиях, которые не удалось импортировать
+    GET /metrics - Время и счетчики операций и размер хранилища в текстовом формате Prometheus
+
+Каждый маршрут из /api/v1/calendar/ также обслуживается по адресу /api/v1/calendars/<calendar_id>/ для отдельного
+календаря с собственным хранилищем, который создается его первым POST; календарь по умолчанию сохраняет прежние пути.
+ID календаря состоит из латинских букв, цифр, '-' и '_'. На запросы к неизвестному календарю возвращается 404.
 
 Функции:
     create_event(): Создать новое событие с заданными данными
-    list_events(): Получить список всех событий
+    list_events(): Получить список всех событий или событий в диапазоне дат
     read_event(event_id): Получить информацию о конкретном событии
     update_event(event_id): Обновить существующее событие с заданными данными
     delete_event(event_id): Удалить событие
+    cancel_occurrence(event_id, day): Отменить одно повторение повторяющегося события
+    batch_events(): Применить пакет операций создания/обновления/удаления и сообщить статус каждой
+    search_events(): Найти события, подходящие под поисковый запрос
+    list_changes(): Получить изменения, сделанные после номера последовательности, для инкрементальной синхронизации
+    stream_changes(): Отклонить поток изменений, который обслуживает только ASGI-приложение
+    freebusy(): Получить занятые и свободные интервалы окна времени
+    export_calendar(): Выгрузить события календаря потоком в формате iCalendar
+    import_calendar(): Импортировать события из тела в формате iCalendar пакетами
+    export_metrics(): Вывести собранные метрики для Prometheus
+    set_default_calendar(calendar): Обслуживать календарь по умолчанию из другого хранилища
 
 Исключения:
     LogicException: Пользовательское исключение, возникающее при логических ошибках в операциях с событиями
 """
 
-from flask import Flask, request, jsonify
-from logic import EventLogic, LogicException
-from model import Event
+from flask import Flask, Response, abort, g, request, jsonify, make_response, stream_with_context
+from logic import ConflictException, EventLogic, LogicException, free_busy, parse_event
+from model import events_to_json, parse_date, parse_datetime, parse_fields
+import cache
+import compression
+import config
+import db
+import ical
+import metrics
+import registry
 import uuid
 
 app = Flask(__name__)
-logic = EventLogic()
+event_db = db.EventDB()
+logic = EventLogic(event_db)
+response_cache = cache.ResponseCache(config.RESPONSE_CACHE_MAX_ENTRIES)
+logic.add_listener(response_cache.invalidate)
+default_calendar = registry.Calendar(event_db, logic, response_cache)
+calendars = registry.CalendarRegistry()
+metrics.REGISTRY.gauge('calendar_events', 'Number of stored events.', lambda: event_db.stats()['events'])
+metrics.REGISTRY.gauge('calendar_storage_size_bytes', 'Size of the storage files in bytes.',
+                       lambda: event_db.stats()['size_bytes'])
+metrics.REGISTRY.gauge('calendar_open_calendars', 'Number of open calendars of /api/v1/calendars/.',
+                       lambda: len(calendars))
+
+if metrics.ENABLED:
+    @app.before_request
+    def _start_timing():
+        metrics.start_request()
+
+    @app.after_request
+    def _finish_timing(response):
+        server_timing = metrics.finish_request(request.endpoint or 'unknown')
+        if server_timing is not None:
+            response.headers['Server-Timing'] = server_timing
+        return response
+
+def set_default_calendar(calendar: registry.Calendar):
+    """
+    <EN>
+    Serve the default calendar of /api/v1/calendar/ from another storage, for example the one of a benchmark.
+    The response cache of the calendar must already listen to the changes of its logic.
+    Args:
+        calendar (registry.Calendar): The calendar to serve.
+    """
+    """
+    <RUS>
+    Обслуживает календарь по умолчанию из /api/v1/calendar/ из другого хранилища, например хранилища бенчмарка.
+    Кэш ответов календаря уже должен получать изменения его логики.
+    Аргументы:
+        calendar (registry.Calendar): Обслуживаемый календарь.
+    """
+    global event_db, logic, response_cache, default_calendar
+    event_db, logic, response_cache = calendar
+    default_calendar = calendar
+
+def _calendar(calendar_id, create=False):
+    if calendar_id is None:
+        return default_calendar
+    try:
+        calendar = calendars.acquire(calendar_id, create)
+    except ValueError:
+        abort(make_response(jsonify({'Ошибка': 'Неверный идентификатор календаря, допустимы латинские буквы, '
+                                               'цифры, - и _'}), 400))
+    except registry.RegistryException:
+        abort(make_response(jsonify({'Ошибка': 'Не удалось открыть календарь'}), 500))
+    if calendar is None:
+        abort(make_response(jsonify({'Ошибка': 'Календарь не найден'}), 404))
+    # Released once the request, including a streamed response, is finished.
+    g.calendar_id = calendar_id
+    return calendar
+
+@app.teardown_request
+def _release_calendar(exception=None):
+    calendar_id = g.pop('calendar_id', None)
+    if calendar_id is not None:
+        calendars.release(calendar_id)
+
+@metrics.timed('app', 'parse')
+def _request_json():
+    return request.get_json(silent=True)
 
 @app.route('/api/v1/calendar/', methods=['POST'])
-def create_event():
-    data = request.get_json()
-    if data is None or 'data' not in data:
-        return jsonify({'Ошибка': 'Неверный JSON или отсутствует поле данных'}), 400
-
-    try:
-        date, title, text = data['data'].split('|')
-        if len(title) > 30:
-            return jsonify({'Ошибка': 'Заголовок превышает 30 символов'}), 400
-        if len(text) > 200:
-            return jsonify({'Ошибка': 'Текст превышает 200 символов'}), 400
-        event = Event(id=str(uuid.uuid4()), date=date, title=title, text=text)
-        logic.create(event)
+@app.route('/api/v1/calendars/<calendar_id>/', methods=['POST'])
+def create_event(calendar_id=None):
+    calendar = _calendar(calendar_id, create=True)
+    check_conflicts = request.args.get('check_conflicts') in ('1', 'true')
+    try:
+        calendar.logic.create(parse_event(_request_json(), str(uuid.uuid4())), check_conflicts)
         return jsonify({'Сообщение': 'Событие создано'}), 201
+    except ConflictException as e:
+        return jsonify({'Ошибка': str(e), 'conflicts': [event.to_dict() for event in e.conflicts]}), 409
     except LogicException as e:
         return jsonify({'Ошибка': str(e)}), 400
 
 @app.route('/api/v1/calendar/', methods=['GET'])
-def list_events():
+@app.route('/api/v1/calendars/<calendar_id>/', methods=['GET'])
+def list_events(calendar_id=None):
+    """
+    <EN>
+    List the events of a calendar. Whether the list is returned whole, a page at a time or streamed, it holds the same
+    events: without ?from= and ?to= every series is listed once, as stored, at its first date; with either of them
+    every series contributes its occurrences within the range instead, expanded up to the recurrence horizon.
+    """
+    """
+    <RUS>
+    Получает список событий календаря. Целиком, постранично или потоком список содержит одни и те же события:
+    без ?from= и ?to= каждая серия выводится один раз в сохраненном виде на дату первого повторения; с любым из них
+    каждая серия вместо этого дает свои повторения в диапазоне, развернутые до горизонта повторений.
+    """
+    calendar = _calendar(calendar_id)
+    try:
+        start = parse_date(request.args['from']) if 'from' in request.args else None
+        end = parse_date(request.args['to']) if 'to' in request.args else None
+    except ValueError:
+        return jsonify({'Ошибка': 'Неверный формат даты, ожидается YYYY-MM-DD'}), 400
     try:
-        events = logic.list()
-        serialized_events = [{'id': event.id, 'date': event.date, 'title': event.title, 'text': event.text} for event in events]
-        return jsonify(serialized_events), 200
+        fields = parse_fields(request.args['fields']) if 'fields' in request.args else None
+    except ValueError:
+        return jsonify({'Ошибка': 'Неверный список полей, допустимы: date, end, exdates, id, rrule, start, text, title'}), 400
+    try:
+        version = calendar.logic.version()
+        not_modified = _not_modified(version)
+        if not_modified is not None:
+            return not_modified
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if request.args.get('stream') in ('1', 'true'):
+            events = calendar.logic.iter_events(start, end, cursor)
+            first = next(events, None)
+            chunks = _stream_json_array(first, events, fields)
+            encoding = compression.negotiate(request.accept_encodings)
+            if encoding is not None:
+                chunks = compression.compress_stream(chunks, encoding)
+            response = Response(stream_with_context(chunks), mimetype='application/json')
+            if encoding is not None:
+                response.content_encoding = encoding
+            response.vary.add('Accept-Encoding')
+            return _with_validators(response, version)
+        if limit is not None or cursor is not None:
+            events, next_cursor = calendar.logic.page(config.PAGE_DEFAULT_LIMIT if limit is None else limit,
+                                                      cursor, start, end)
+            body = f'{{"events": {events_to_json(events, fields)}, "next_cursor": {app.json.dumps(next_cursor)}}}\n'
+            return _with_validators(_json_response(body), version), 200
+        if start is None and end is None:
+            entry = calendar.response_cache.get(cache.list_key(fields), version.tag)
+            if entry is None:
+                body = f"{events_to_json(calendar.logic.list(), fields)}\n".encode('utf-8')
+                entry = calendar.response_cache.put(cache.list_key(fields), version.tag, body)
+            return _with_validators(_cached_response(entry), version), 200
+        body = f"{events_to_json(calendar.logic.list(start, end), fields)}\n"
+        return _with_validators(_json_response(body), version), 200
     except LogicException as e:
         return jsonify({'Ошибка': str(e)}), 400
 
+def _not_modified(version):
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(version.tag)
+    elif request.if_modified_since is not None:
+        matched = int(version.modified) <= request.if_modified_since.timestamp()
+    else:
+        return None
+    if not matched:
+        return None
+    return _with_validators(Response(status=304), version)
+
+def _cached_response(entry):
+    body = entry.body
+    response = Response(mimetype='application/json')
+    encoding = compression.negotiate(request.accept_encodings, len(body))
+    if encoding is not None:
+        body = entry.compressed(encoding)
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_data(body)
+    return response
+
+def _json_response(body: str):
+    data = body.encode('utf-8')
+    response = Response(mimetype='application/json')
+    encoding = compression.negotiate(request.accept_encodings, len(data))
+    if encoding is not None:
+        data = compression.compress(data, encoding)
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_data(data)
+    return response
+
+def _with_validators(response, version):
+    response.set_etag(version.tag)
+    response.last_modified = version.modified
+    return response
+
+def _stream_json_array(first, events, fields=None):
+    yield '['
+    if first is not None:
+        yield first.to_json(fields)
+        for event in events:
+            yield ',' + event.to_json(fields)
+    yield ']'
+
 @app.route('/api/v1/calendar/<event_id>/', methods=['GET'])
-def read_event(event_id):
+@app.route('/api/v1/calendars/<calendar_id>/<event_id>/', methods=['GET'])
+def read_event(event_id, calendar_id=None):
+    calendar = _calendar(calendar_id)
     try:
-        event = logic.read(event_id)
-        serialized_event = {'id': event.id, 'date': event.date, 'title': event.title, 'text': event.text}
-        return jsonify(serialized_event), 200
+        version = calendar.logic.event_version(event_id)
+        if version is not None:
+            not_modified = _not_modified(version)
+            if not_modified is not None:
+                return not_modified
+        if version is not None:
+            entry = calendar.response_cache.get(cache.event_key(event_id), version.tag)
+            if entry is not None:
+                return _with_validators(_cached_response(entry), version), 200
+        event = calendar.logic.read(event_id)
+        body = f"{event.to_json()}\n"
+        if version is None:
+            return Response(body, mimetype='application/json'), 200
+        entry = calendar.response_cache.put(cache.event_key(event_id), version.tag, body.encode('utf-8'))
+        return _with_validators(_cached_response(entry), version), 200
     except LogicException as e:
         return jsonify({'Ошибка': str(e)}), 404
 
 @app.route('/api/v1/calendar/<event_id>/', methods=['PUT'])
-def update_event(event_id):
-    data = request.get_json()
-    if data is None:
-        return jsonify({'Ошибка': 'Invalid JSON'}), 400
-    try:
-        date, title, text = data['data'].split('|')
-        if len(title) > 30:
-            return jsonify({'Ошибка': 'Заголовок превышает 30 символов'}), 400
-        if len(text) > 200:
-            return jsonify({'Ошибка': 'Текст превышает 200 символов'}), 400
-        event = Event(id=event_id, date=date, title=title, text=text)
-        logic.update(event_id, event)
+@app.route('/api/v1/calendars/<calendar_id>/<event_id>/', methods=['PUT'])
+def update_event(event_id, calendar_id=None):
+    calendar = _calendar(calendar_id)
+    try:
+        calendar.logic.update(event_id, parse_event(_request_json(), event_id))
         return jsonify({'Сообщение': 'Событие обновлено'}), 200
     except LogicException as e:
         return jsonify({'Ошибка': str(e)}), 400
 
 @app.route('/api/v1/calendar/<event_id>/', methods=['DELETE'])
-def delete_event(event_id):
+@app.route('/api/v1/calendars/<calendar_id>/<event_id>/', methods=['DELETE'])
+def delete_event(event_id, calendar_id=None):
+    calendar = _calendar(calendar_id)
     try:
-        logic.delete(event_id)
+        calendar.logic.delete(event_id)
         return jsonify({'Сообщение': 'Событие удалено'}), 200
     except LogicException as e:
         return jsonify({'Ошибка': str(e)}), 404
 
+@app.route('/api/v1/calendar/<event_id>/<day>/', methods=['DELETE'])
+@app.route('/api/v1/calendars/<calendar_id>/<event_id>/<day>/', methods=['DELETE'])
+def cancel_occurrence(event_id, day, calendar_id=None):
+    calendar = _calendar(calendar_id)
+    try:
+        occurrence_date = parse_date(day)
+    except ValueError:
+        return jsonify({'Ошибка': 'Неверный формат даты, ожидается YYYY-MM-DD'}), 400
+    try:
+        calendar.logic.cancel_occurrence(event_id, occurrence_date)
+        return jsonify({'Сообщение': 'Повторение отменено'}), 200
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 404
+
+@app.route('/api/v1/calendar/batch', methods=['POST'])
+@app.route('/api/v1/calendars/<calendar_id>/batch', methods=['POST'])
+def batch_events(calendar_id=None):
+    calendar = _calendar(calendar_id, create=True)
+    data = _request_json()
+    if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+        return jsonify({'Ошибка': 'Неверный JSON или отсутствует список операций'}), 400
+
+    operations = []
+    results = []
+    for item in data['operations']:
+        try:
+            # A malformed item only fails itself; it must never reach the storage and fail the whole batch.
+            if not isinstance(item, dict) or item.get('op') not in ('create', 'update', 'delete'):
+                raise LogicException("Invalid operation")
+            operation = item['op']
+            if operation == 'create':
+                event_id = str(uuid.uuid4())
+            elif isinstance(item.get('id'), str):
+                event_id = item['id']
+            else:
+                raise LogicException("Invalid event ID")
+            event = parse_event(item, event_id) if operation in ('create', 'update') else None
+            operations.append((operation, event_id, event))
+            results.append({'id': event_id})
+        except (KeyError, TypeError, LogicException):
+            operations.append(None)
+            results.append({'status': 400, 'Ошибка': 'Неверный формат операции'})
+
+    try:
+        parsed = [operation for operation in operations if operation is not None]
+        errors = iter(calendar.logic.bulk_apply(parsed))
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+
+    for operation, result in zip(operations, results):
+        if operation is None:
+            continue
+        error = next(errors)
+        if error is None:
+            result['status'] = 201 if operation[0] == 'create' else 200
+        else:
+            if operation[0] == 'create':
+                del result['id']
+            result['status'] = 404 if operation[0] == 'delete' else 400
+            result['Ошибка'] = str(error)
+    return jsonify({'results': results}), 200
+
+@app.route('/api/v1/calendar/search', methods=['GET'])
+@app.route('/api/v1/calendars/<calendar_id>/search', methods=['GET'])
+def search_events(calendar_id=None):
+    calendar = _calendar(calendar_id)
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)
+    try:
+        version = calendar.logic.version()
+        not_modified = _not_modified(version)
+        if not_modified is not None:
+            return not_modified
+        events = calendar.logic.search(query, limit)
+        body = f"{events_to_json(events)}\n"
+        return _with_validators(_json_response(body), version), 200
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+
+@app.route('/api/v1/calendar/changes', methods=['GET'])
+@app.route('/api/v1/calendars/<calendar_id>/changes', methods=['GET'])
+def list_changes(calendar_id=None):
+    calendar = _calendar(calendar_id)
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'Ошибка': 'Неверный номер изменения, ожидается целое число'}), 400
+    limit = request.args.get('limit', type=int)
+    try:
+        change_set = calendar.logic.changes(since, limit)
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+    if change_set.changes is None:
+        # The changes since the given number are no longer known: the client replaces its copy with all events.
+        body = f'{{"resync": true, "events": {events_to_json(change_set.events)}, "next_since": {change_set.seq}}}\n'
+    else:
+        changes = ', '.join(
+            f'{{"seq": {seq}, "id": {app.json.dumps(event_id)}, "deleted": true}}' if event is None
+            else f'{{"seq": {seq}, "id": {app.json.dumps(event_id)}, "event": {event.to_json()}}}'
+            for seq, event_id, event in change_set.changes)
+        body = (f'{{"resync": false, "changes": [{changes}], "next_since": {change_set.seq}, '
+                f'"has_more": {app.json.dumps(change_set.more)}}}\n')
+    return _json_response(body), 200
+
+@app.route('/api/v1/calendar/stream', methods=['GET'])
+@app.route('/api/v1/calendars/<calendar_id>/stream', methods=['GET'])
+def stream_changes(calendar_id=None):
+    # Every connection would hold a worker thread for as long as the client stays, so only asgi.py serves the stream.
+    return jsonify({'Ошибка': 'Поток изменений доступен только через ASGI-сервер: uvicorn asgi:app'}), 501
+
+@app.route('/api/v1/calendar/freebusy', methods=['GET'])
+@app.route('/api/v1/calendars/<calendar_id>/freebusy', methods=['GET'])
+def freebusy(calendar_id=None):
+    calendar = _calendar(calendar_id)
+    if 'from' not in request.args or 'to' not in request.args:
+        return jsonify({'Ошибка': 'Не указано окно времени, ожидаются параметры from и to'}), 400
+    try:
+        start = parse_datetime(request.args['from'])
+        end = parse_datetime(request.args['to'])
+    except ValueError:
+        return jsonify({'Ошибка': 'Неверный формат времени, ожидается YYYY-MM-DDTHH:MM'}), 400
+    try:
+        version = calendar.logic.version()
+        not_modified = _not_modified(version)
+        if not_modified is not None:
+            return not_modified
+        events = calendar.logic.overlapping(start, end)
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+    busy, free = free_busy(events, start, end)
+    busy = app.json.dumps([{'start': low.isoformat(), 'end': high.isoformat()} for low, high in busy])
+    free = app.json.dumps([{'start': low.isoformat(), 'end': high.isoformat()} for low, high in free])
+    if request.args.get('events') in ('1', 'true'):
+        body = f'{{"busy": {busy}, "events": {events_to_json(events)}, "free": {free}}}\n'
+    else:
+        body = f'{{"busy": {busy}, "free": {free}}}\n'
+    return _with_validators(_json_response(body), version), 200
+
+@app.route('/api/v1/calendar/export.ics', methods=['GET'])
+@app.route('/api/v1/calendars/<calendar_id>/export.ics', methods=['GET'])
+def export_calendar(calendar_id=None):
+    calendar = _calendar(calendar_id)
+    try:
+        version = calendar.logic.version()
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+    not_modified = _not_modified(version)
+    if not_modified is not None:
+        return not_modified
+    chunks = ical.serialize_calendar(calendar.logic.export_events())
+    encoding = compression.negotiate(request.accept_encodings)
+    if encoding is not None:
+        chunks = compression.compress_stream(chunks, encoding)
+    response = Response(stream_with_context(chunks), mimetype='text/calendar')
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Content-Disposition'] = f'attachment; filename="{calendar_id or "calendar"}.ics"'
+    return _with_validators(response, version)
+
+@app.route('/api/v1/calendar/import', methods=['POST'])
+@app.route('/api/v1/calendars/<calendar_id>/import', methods=['POST'])
+def import_calendar(calendar_id=None):
+    calendar = _calendar(calendar_id, create=True)
+    chunks = iter(lambda: request.stream.read(64 * 1024), b'')
+    try:
+        result = calendar.logic.import_events(ical.parse_calendar(chunks, lambda: str(uuid.uuid4())))
+    except ical.ICalException as e:
+        return jsonify({'Ошибка': str(e)}), 400
+    except LogicException as e:
+        return jsonify({'Ошибка': str(e)}), 500
+    errors = [{'index': position, 'Ошибка': str(error)} for position, error in result.errors]
+    return jsonify({'imported': result.imported, 'failed': result.failed, 'errors': errors}), 200
+
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    if not config.METRICS:
+        return jsonify({'Ошибка': 'Метрики отключены'}), 404
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
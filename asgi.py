@@ -0,0 +1,570 @@
+"""
+<EN>
+Asynchronous (ASGI) Entry Point
+
+This module exposes the calendar API as an ASGI application for servers such as uvicorn or hypercorn. The event
+routes are served by coroutines on top of AsyncEventLogic: storage reads run in a pool of threads and every save
+runs in a single writer thread, so a slow disk write or fsync never blocks the event loop and the requests it is
+serving. Every other route, including the calendars under /api/v1/calendars/<calendar_id>/, is passed to the Flask
+application from the app module, which runs in a worker thread; the body of a request to Flask is read whole first,
+except for the iCalendar imports, which Flask parses as the body arrives. Both share the same storage and response
+cache. Natively served routes record their duration in the same metrics as the Flask routes; the Server-Timing
+header is only added to responses of routes served by Flask.
+
+Usage:
+    uvicorn asgi:app
+Routes served natively:
+    POST /api/v1/calendar/ - Create a new event, optionally refusing one whose time is taken (?check_conflicts=1)
+    GET /api/v1/calendar/ - List events, with the same date range, pagination, streaming, field projection and
+        compression as app.py
+    GET /api/v1/calendar/<event_id>/ - Get details of a specific event
+    PUT /api/v1/calendar/<event_id>/ - Update an existing event
+    DELETE /api/v1/calendar/<event_id>/ - Delete an event
+    GET /api/v1/calendar/stream - Receive the created, updated and deleted events as Server-Sent Events, optionally
+        only within a date range (?from=YYYY-MM-DD&to=YYYY-MM-DD), resuming after the change given in Last-Event-ID.
+        Only served here: every connection is a coroutine, while the Flask application would hold a thread per client.
+    GET /api/v1/calendars/<calendar_id>/stream - The same stream for a calendar of /api/v1/calendars/. Its broadcaster
+        keeps the calendar open while clients are connected and is closed with the last of them.
+
+Functions:
+    app(scope, receive, send): The ASGI application.
+"""
+"""
+<RUS>
+Асинхронная (ASGI) точка входа
+
+Этот модуль предоставляет API календаря в виде ASGI-приложения для серверов, таких как uvicorn или hypercorn.
+Маршруты событий обслуживаются корутинами поверх AsyncEventLogic: чтения из хранилища выполняются в пуле потоков, а
+каждое сохранение — в одном потоке записи, поэтому медленная запись на диск или fsync никогда не блокирует цикл
+событий и обслуживаемые им запросы. Все остальные маршруты, включая календари из /api/v1/calendars/<calendar_id>/,
+передаются Flask-приложению из модуля app, которое выполняется в рабочем потоке; тело запроса к Flask сначала
+читается целиком, кроме импорта iCalendar, который Flask разбирает по мере поступления тела. Оба используют общее
+хранилище и кэш ответов. Маршруты, обслуживаемые напрямую, записывают свою длительность в те же метрики, что и
+маршруты Flask; заголовок Server-Timing добавляется только к ответам маршрутов, обслуживаемых Flask.
+
+Использование:
+    uvicorn asgi:app
+Маршруты, обслуживаемые напрямую:
+    POST /api/v1/calendar/ - Создать новое событие, при необходимости отклоняя событие с занятым временем
+        (?check_conflicts=1)
+    GET /api/v1/calendar/ - Получить список событий с теми же параметрами диапазона дат, страниц, потоковой выдачи
+        и выбора полей и тем же сжатием, что и в app.py
+    GET /api/v1/calendar/<event_id>/ - Получить информацию о конкретном событии
+    PUT /api/v1/calendar/<event_id>/ - Обновить существующее событие
+    DELETE /api/v1/calendar/<event_id>/ - Удалить событие
+    GET /api/v1/calendar/stream - Получать созданные, обновленные и удаленные события как Server-Sent Events,
+        при необходимости только в диапазоне дат (?from=YYYY-MM-DD&to=YYYY-MM-DD), продолжая после изменения,
+        указанного в Last-Event-ID. Обслуживается только здесь: каждое соединение — корутина, тогда как
+        Flask-приложение занимало бы поток на каждого клиента.
+    GET /api/v1/calendars/<calendar_id>/stream - Тот же поток для календаря из /api/v1/calendars/. Его рассыльщик
+        держит календарь открытым, пока подключены клиенты, и закрывается вместе с последним из них.
+
+Функции:
+    app(scope, receive, send): ASGI-приложение.
+"""
+
+import asyncio
+import json
+import re
+import sys
+import time
+import uuid
+from collections import namedtuple
+from io import BytesIO
+from typing import Optional
+from urllib.parse import parse_qsl
+from werkzeug.http import http_date, parse_accept_header, parse_date as parse_http_date, parse_etags, quote_etag
+from app import app as flask_app, calendars, event_db, response_cache
+from broadcast import CATCH_UP, ChangeBroadcaster, format_change
+from logic import AsyncEventLogic, ConflictException, LogicException, parse_event
+from model import events_to_json, parse_date, parse_fields
+from registry import RegistryException
+import cache
+import compression
+import config
+import metrics
+
+logic = AsyncEventLogic(event_db)
+broadcaster = ChangeBroadcaster(logic)
+
+# The logic a stream of changes catches up from and the broadcaster its live changes come from.
+_Stream = namedtuple('_Stream', ['logic', 'broadcaster'])
+_default_stream = _Stream(logic, broadcaster)
+# Streams of the calendars of /api/v1/calendars/ with connected clients, as [stream, connections].
+_calendar_streams = {}
+
+metrics.REGISTRY.gauge('calendar_stream_subscribers', 'Number of connected SSE subscribers.',
+                       lambda: len(broadcaster) + sum(len(entry[0].broadcaster)
+                                                      for entry in list(_calendar_streams.values())))
+
+_EVENT_PATH = re.compile(r'/api/v1/calendar/([^/]+)/')
+_CALENDAR_STREAM_PATH = re.compile(r'/api/v1/calendars/([^/]+)/stream')
+_IMPORT_PATH = re.compile(r'/api/v1/(?:calendar|calendars/[^/]+)/import')
+
+
+class _Request:
+    __slots__ = ('method', 'path', 'args', 'headers', 'body')
+
+    def __init__(self, scope, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        self.headers = {}
+        for name, value in scope['headers']:
+            name = name.decode('latin-1')
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    if scope['method'] == 'POST' and _IMPORT_PATH.fullmatch(scope['path']):
+        # An import may be far larger than memory, so Flask parses it as it arrives instead of after buffering it.
+        await _call_wsgi(scope, _BodyStream(receive, asyncio.get_running_loop()), None, send)
+        return
+    body = await _read_body(receive)
+    request = _Request(scope, body)
+    if request.method == 'GET':
+        # A stream lasts as long as the client stays connected, so its duration is not recorded.
+        if request.path == '/api/v1/calendar/stream':
+            await _stream_changes(request, receive, send, _default_stream)
+            return
+        match = _CALENDAR_STREAM_PATH.fullmatch(request.path)
+        if match:
+            await _stream_calendar_changes(request, receive, send, match.group(1))
+            return
+    if request.path == '/api/v1/calendar/':
+        handler = {'GET': _list_events, 'POST': _create_event}.get(request.method)
+        args = ()
+    else:
+        match = _EVENT_PATH.fullmatch(request.path)
+        handler = match and {'GET': _read_event, 'PUT': _update_event, 'DELETE': _delete_event}.get(request.method)
+        args = (match.group(1),) if match else ()
+    if handler is None:
+        await _call_wsgi(scope, BytesIO(body), len(body), send)
+        return
+    if not metrics.ENABLED:
+        await handler(request, send, *args)
+        return
+    # Routes served natively are recorded under the same names as their Flask counterparts.
+    start = time.perf_counter()
+    try:
+        await handler(request, send, *args)
+    finally:
+        metrics.observe('app', handler.__name__.lstrip('_'), time.perf_counter() - start)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            broadcaster.close()
+            # Closing a broadcaster ends its streams, which then close its logic and release its calendar.
+            for stream, _ in list(_calendar_streams.values()):
+                stream.broadcaster.close()
+            await asyncio.get_running_loop().run_in_executor(None, logic.close)
+            await asyncio.get_running_loop().run_in_executor(None, calendars.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+class _BodyStream:
+    # The request body as a file for the WSGI application: read in a worker thread, it waits for each message
+    # from the event loop, so only the part of the body not yet consumed is held in memory.
+    __slots__ = ('_receive', '_loop', '_buffer', '_done')
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done and (size is None or size < 0 or len(self._buffer) < size):
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] != 'http.request':
+                # A disconnected client ends the body, as it does for the buffered requests.
+                self._done = True
+                break
+            self._buffer += message.get('body', b'')
+            self._done = not message.get('more_body', False)
+        if size is None or size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def _send_response(send, status: int, body: bytes = b'', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, data, status: int):
+    body = f"{flask_app.json.dumps(data, separators=(',', ':'))}\n".encode('utf-8')
+    await _send_response(send, status, body, [('content-type', 'application/json')])
+
+
+def _validators(version):
+    return [('etag', quote_etag(version.tag)), ('last-modified', http_date(version.modified))]
+
+
+def _not_modified(request: _Request, version) -> bool:
+    if request.headers.get('if-none-match'):
+        return parse_etags(request.headers['if-none-match']).contains_weak(version.tag)
+    since = parse_http_date(request.headers.get('if-modified-since'))
+    return since is not None and int(version.modified) <= since.timestamp()
+
+
+def _accept_encoding(request: _Request):
+    return parse_accept_header(request.headers.get('accept-encoding'))
+
+
+async def _send_cached(request: _Request, send, entry, version):
+    body = entry.body
+    headers = [('content-type', 'application/json'), ('vary', 'Accept-Encoding')] + _validators(version)
+    encoding = compression.negotiate(_accept_encoding(request), len(body))
+    if encoding is not None:
+        body = entry.compressed(encoding)
+        headers.append(('content-encoding', encoding))
+    await _send_response(send, 200, body, headers)
+
+
+async def _send_body(request: _Request, send, body: str, version):
+    data = body.encode('utf-8')
+    headers = [('content-type', 'application/json'), ('vary', 'Accept-Encoding')] + _validators(version)
+    encoding = compression.negotiate(_accept_encoding(request), len(data))
+    if encoding is not None:
+        data = compression.compress(data, encoding)
+        headers.append(('content-encoding', encoding))
+    await _send_response(send, 200, data, headers)
+
+
+def _int_arg(request: _Request, name: str):
+    try:
+        return int(request.args[name])
+    except (KeyError, ValueError):
+        return None
+
+
+async def _create_event(request: _Request, send):
+    check_conflicts = request.args.get('check_conflicts') in ('1', 'true')
+    try:
+        await logic.create(parse_event(request.json(), str(uuid.uuid4())), check_conflicts)
+    except ConflictException as e:
+        await _send_json(send, {'Ошибка': str(e), 'conflicts': [event.to_dict() for event in e.conflicts]}, 409)
+        return
+    except LogicException as e:
+        await _send_json(send, {'Ошибка': str(e)}, 400)
+        return
+    await _send_json(send, {'Сообщение': 'Событие создано'}, 201)
+
+
+async def _list_events(request: _Request, send):
+    try:
+        start = parse_date(request.args['from']) if 'from' in request.args else None
+        end = parse_date(request.args['to']) if 'to' in request.args else None
+    except ValueError:
+        await _send_json(send, {'Ошибка': 'Неверный формат даты, ожидается YYYY-MM-DD'}, 400)
+        return
+    try:
+        fields = parse_fields(request.args['fields']) if 'fields' in request.args else None
+    except ValueError:
+        await _send_json(send, {'Ошибка': 'Неверный список полей, допустимы: date, end, exdates, id, rrule, start, '
+                                        'text, title'}, 400)
+        return
+    limit = _int_arg(request, 'limit')
+    cursor = request.args.get('cursor')
+    try:
+        version = await logic.version()
+        if _not_modified(request, version):
+            await _send_response(send, 304, headers=_validators(version))
+            return
+        if request.args.get('stream') in ('1', 'true'):
+            events, cursor = await logic.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+            await _stream_events(request, send, version, events, cursor, start, end, fields)
+            return
+        if limit is not None or cursor is not None:
+            events, next_cursor = await logic.page(config.PAGE_DEFAULT_LIMIT if limit is None else limit,
+                                                   cursor, start, end)
+            next_cursor = flask_app.json.dumps(next_cursor)
+            body = f'{{"events": {events_to_json(events, fields)}, "next_cursor": {next_cursor}}}\n'
+            await _send_body(request, send, body, version)
+            return
+        if start is None and end is None:
+            entry = response_cache.get(cache.list_key(fields), version.tag)
+            if entry is None:
+                body = f"{events_to_json(await logic.list(), fields)}\n".encode('utf-8')
+                entry = response_cache.put(cache.list_key(fields), version.tag, body)
+            await _send_cached(request, send, entry, version)
+            return
+        await _send_body(request, send, f"{events_to_json(await logic.list(start, end), fields)}\n", version)
+    except LogicException as e:
+        await _send_json(send, {'Ошибка': str(e)}, 400)
+
+
+async def _stream_events(request: _Request, send, version, events, cursor, start, end, fields):
+    # The first page is fetched before the headers are sent, so an invalid cursor is still reported with 400.
+    headers = [('content-type', 'application/json'), ('vary', 'Accept-Encoding')] + _validators(version)
+    encoding = compression.negotiate(_accept_encoding(request))
+    if encoding is not None:
+        headers.append(('content-encoding', encoding))
+        process, finish = compression.stream_compressor(encoding)
+    else:
+        process, finish = bytes, bytes
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    separator = '['
+    while True:
+        if events:
+            chunk = separator + ','.join(event.to_json(fields) for event in events)
+            separator = ','
+            data = process(chunk.encode('utf-8'))
+            if data:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+        if cursor is None:
+            break
+        events, cursor = await logic.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+    await send({'type': 'http.response.body', 'body': process(b'[]' if separator == '[' else b']') + finish()})
+
+
+async def _read_event(request: _Request, send, event_id: str):
+    try:
+        version = await logic.event_version(event_id)
+        if version is not None:
+            if _not_modified(request, version):
+                await _send_response(send, 304, headers=_validators(version))
+                return
+            entry = response_cache.get(cache.event_key(event_id), version.tag)
+            if entry is not None:
+                await _send_cached(request, send, entry, version)
+                return
+        event = await logic.read(event_id)
+    except LogicException as e:
+        await _send_json(send, {'Ошибка': str(e)}, 404)
+        return
+    body = f"{event.to_json()}\n".encode('utf-8')
+    if version is None:
+        await _send_response(send, 200, body, [('content-type', 'application/json')])
+        return
+    await _send_cached(request, send, response_cache.put(cache.event_key(event_id), version.tag, body), version)
+
+
+async def _update_event(request: _Request, send, event_id: str):
+    try:
+        await logic.update(event_id, parse_event(request.json(), event_id))
+    except LogicException as e:
+        await _send_json(send, {'Ошибка': str(e)}, 400)
+        return
+    await _send_json(send, {'Сообщение': 'Событие обновлено'}, 200)
+
+
+async def _delete_event(request: _Request, send, event_id: str):
+    try:
+        await logic.delete(event_id)
+    except LogicException as e:
+        await _send_json(send, {'Ошибка': str(e)}, 404)
+        return
+    await _send_json(send, {'Сообщение': 'Событие удалено'}, 200)
+
+
+async def _stream_calendar_changes(request: _Request, receive, send, calendar_id: str):
+    # The calendar stays acquired while its stream has connections, so it is never evicted under its broadcaster;
+    # the broadcaster is closed with the last connection, so an idle calendar keeps nothing of the stream.
+    loop = asyncio.get_running_loop()
+    try:
+        calendar = await loop.run_in_executor(None, calendars.acquire, calendar_id)
+    except ValueError:
+        await _send_json(send, {'Ошибка': 'Неверный идентификатор календаря, допустимы латинские буквы, цифры, - и _'},
+                         400)
+        return
+    except RegistryException:
+        await _send_json(send, {'Ошибка': 'Не удалось открыть календарь'}, 500)
+        return
+    if calendar is None:
+        await _send_json(send, {'Ошибка': 'Календарь не найден'}, 404)
+        return
+    entry = _calendar_streams.get(calendar_id)
+    if entry is None:
+        stream_logic = AsyncEventLogic(calendar.event_db)
+        entry = _calendar_streams[calendar_id] = [_Stream(stream_logic, ChangeBroadcaster(stream_logic)), 0]
+    entry[1] += 1
+    try:
+        await _stream_changes(request, receive, send, entry[0])
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _calendar_streams[calendar_id]
+            entry[0].broadcaster.close()
+            await loop.run_in_executor(None, entry[0].logic.close)
+        await loop.run_in_executor(None, calendars.release, calendar_id)
+
+
+async def _stream_changes(request: _Request, receive, send, stream: _Stream):
+    try:
+        start = parse_date(request.args['from']) if 'from' in request.args else None
+        end = parse_date(request.args['to']) if 'to' in request.args else None
+    except ValueError:
+        await _send_json(send, {'Ошибка': 'Неверный формат даты, ожидается YYYY-MM-DD'}, 400)
+        return
+    if start is not None and end is not None and start > end:
+        await _send_json(send, {'Ошибка': 'Start date is after end date'}, 400)
+        return
+    try:
+        since = int(request.headers['last-event-id']) if request.headers.get('last-event-id') else None
+    except ValueError:
+        since = -1
+    if since is not None and since < 0:
+        await _send_json(send, {'Ошибка': 'Неверный Last-Event-ID, ожидается номер изменения'}, 400)
+        return
+    subscription = await stream.broadcaster.subscribe(start, end)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    changes = None
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        if since is None:
+            since = stream.broadcaster.seq
+        else:
+            since = await _catch_up(send, stream, subscription, since)
+        heartbeat = config.SSE_HEARTBEAT_MS / 1000
+        while True:
+            if changes is None:
+                changes = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait((changes, disconnected), timeout=heartbeat,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                return
+            if changes not in done:
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                continue
+            items, changes = changes.result(), None
+            if items is None:
+                break
+            if items is CATCH_UP:
+                since = await _catch_up(send, stream, subscription, since)
+                continue
+            # Changes already sent while catching up come again from the queue and are skipped.
+            frames = ''.join(format_change(*item) for item in items if since is None or item[0] > since)
+            since = max((item[0] for item in items), default=since) if since is not None else None
+            if frames:
+                await send({'type': 'http.response.body', 'body': frames.encode('utf-8'), 'more_body': True})
+    except LogicException:
+        # The client reconnects with the last ID it has received and continues from there.
+        pass
+    finally:
+        stream.broadcaster.unsubscribe(subscription)
+        disconnected.cancel()
+        if changes is not None:
+            changes.cancel()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _catch_up(send, stream: _Stream, subscription, since: int):
+    # Without a change log the missed changes are unknown, so the client reloads the calendar.
+    if stream.broadcaster.seq is None:
+        await send({'type': 'http.response.body', 'body': format_change(None, None, None).encode('utf-8'),
+                    'more_body': True})
+        return None
+    while True:
+        change_set = await stream.logic.changes(since, config.STREAM_CHUNK_SIZE)
+        if change_set.changes is None:
+            frames = format_change(change_set.seq, None, None)
+        else:
+            frames = ''.join(format_change(seq, event_id, event if event is None or subscription.matches(event)
+                                           else None) for seq, event_id, event in change_set.changes)
+        since = change_set.seq
+        if frames:
+            await send({'type': 'http.response.body', 'body': frames.encode('utf-8'), 'more_body': True})
+        if not change_set.more:
+            return since
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _wsgi_environ(scope, body, content_length: Optional[int]) -> dict:
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    if content_length is None:
+        # A streamed body ends with the last ASGI message, which also covers uploads in chunked encoding.
+        environ['wsgi.input_terminated'] = True
+    else:
+        environ['CONTENT_LENGTH'] = str(content_length)
+    return environ
+
+
+async def _call_wsgi(scope, body, content_length: Optional[int], send):
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return lambda data: None
+
+    iterable = await loop.run_in_executor(None, flask_app, _wsgi_environ(scope, body, content_length),
+                                          start_response)
+    try:
+        iterator = iter(iterable)
+        chunk = await loop.run_in_executor(None, next, iterator, None)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(None, next, iterator, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(iterable, 'close'):
+            await loop.run_in_executor(None, iterable.close)
@@ -0,0 +1,522 @@
+"""
+<EN>
+Benchmark Suite
+
+This script measures the latency, throughput and peak memory of every CRUD operation of the calendar at each layer:
+the storage backend, EventDB, EventLogic and the Flask app driven through its test client. Every run starts from
+a fresh temporary storage preloaded with synthetic events, so results of different versions are comparable.
+
+For every (layer, backend, dataset size, operation) the script reports p50/p99/mean latency and throughput from the
+timed iterations, and the peak memory allocated by a few additional iterations traced with tracemalloc. Loading the
+dataset is reported as the 'load' operation. Results can be written as JSON and compared with a previous run.
+
+Usage:
+    python bench.py [--sizes 1000,10000] [--layers storage,db,logic,app] [--backends local,log,sharded,mapped,sqlite]
+                    [--iterations 200] [--list-iterations 20] [--memory-iterations 3] [--seed 0]
+                    [--output results.json] [--compare baseline.json] [--max-regression 20]
+Arguments:
+    --sizes: Comma-separated dataset sizes, from 1k up to 1M events.
+    --layers: Comma-separated layers to measure.
+    --backends: Comma-separated storage backends to measure.
+    --iterations: Timed iterations of the single-event operations (create, read, update, delete).
+    --list-iterations: Timed iterations of the operations returning many events (list, list_range, page, search).
+    --memory-iterations: Iterations traced for peak memory; 0 disables memory tracing.
+    --seed: Seed of the synthetic event generator.
+    --output: File the results are written to as JSON.
+    --compare: JSON results of a previous run to compare the p50 latencies with.
+    --max-regression: Exit with status 1 if any p50 latency grew by more than this many percent against --compare.
+
+Storage settings such as CALENDAR_WRITE_BEHIND are taken from the environment, as for the service itself.
+
+Before measuring, the script checks for every backend that the storages of calendars evicted from the calendar
+registry are freed, and exits with status 1 if any of them is still in memory.
+"""
+"""
+<RUS>
+Набор бенчмарков
+
+Этот скрипт измеряет задержку, пропускную способность и пиковое потребление памяти каждой CRUD-операции календаря
+на каждом уровне: бэкенд хранилища, EventDB, EventLogic и Flask-приложение через его тестовый клиент. Каждый запуск
+начинается с нового временного хранилища, заполненного синтетическими событиями, поэтому результаты разных версий
+можно сравнивать.
+
+Для каждой комбинации (уровень, бэкенд, размер данных, операция) скрипт сообщает задержку p50/p99/среднюю
+и пропускную способность по измеряемым итерациям, а также пиковую память, выделенную несколькими дополнительными
+итерациями под наблюдением tracemalloc. Загрузка данных отображается как операция 'load'. Результаты можно записать
+в JSON и сравнить с предыдущим запуском.
+
+Использование:
+    python bench.py [--sizes 1000,10000] [--layers storage,db,logic,app] [--backends local,log,sharded,mapped,sqlite]
+                    [--iterations 200] [--list-iterations 20] [--memory-iterations 3] [--seed 0]
+                    [--output results.json] [--compare baseline.json] [--max-regression 20]
+Аргументы:
+    --sizes: Размеры данных через запятую, от 1 тыс. до 1 млн событий.
+    --layers: Измеряемые уровни через запятую.
+    --backends: Измеряемые бэкенды хранилища через запятую.
+    --iterations: Измеряемые итерации операций с одним событием (create, read, update, delete).
+    --list-iterations: Измеряемые итерации операций, возвращающих много событий (list, list_range, page, search).
+    --memory-iterations: Итерации, отслеживаемые для пиковой памяти; 0 отключает отслеживание памяти.
+    --seed: Начальное значение генератора синтетических событий.
+    --output: Файл, в который результаты записываются в формате JSON.
+    --compare: JSON-результаты предыдущего запуска для сравнения задержек p50.
+    --max-regression: Завершиться с кодом 1, если какая-либо задержка p50 выросла больше чем на столько процентов
+        относительно --compare.
+
+Настройки хранилища, например CALENDAR_WRITE_BEHIND, берутся из окружения, как и для самого сервиса.
+
+Перед измерениями скрипт проверяет для каждого бэкенда, что хранилища календарей, вытесненных из реестра календарей,
+освобождаются, и завершается с кодом 1, если какое-либо из них осталось в памяти.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import weakref
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Optional
+import config
+import db
+from logic import EventLogic
+from model import Event
+import registry
+
+LAYERS = ('storage', 'db', 'logic', 'app')
+BACKENDS = ('local', 'log', 'sharded', 'mapped', 'sqlite')
+LIST_OPERATIONS = ('list', 'list_range', 'page', 'search')
+
+_FIRST_DAY = date(2024, 1, 1)
+_DAYS = 730
+_WORDS = ('встреча', 'команда', 'проект', 'отчет', 'звонок', 'планерка', 'обед', 'релиз', 'ревью', 'клиент',
+          'meeting', 'review', 'sync', 'demo', 'release', 'budget', 'retro', 'interview', 'launch', 'report')
+
+
+def generate_events(count: int, seed: int = 0) -> Iterator[Event]:
+    """
+    <EN>
+    Generate synthetic events spread over two years, with titles and texts made of a small mixed Russian and English
+    vocabulary. The same seed always produces the same events.
+
+    Args:
+        count (int): Number of events to generate.
+        seed (int): Seed of the random generator.
+
+    Yields:
+        Event: The generated events.
+    """
+    """
+    <RUS>
+    Генерирует синтетические события, распределенные по двум годам, с заголовками и текстами из небольшого
+    смешанного русского и английского словаря. Одно и то же начальное значение всегда дает одни и те же события.
+
+    Аргументы:
+        count (int): Количество генерируемых событий.
+        seed (int): Начальное значение генератора случайных чисел.
+
+    Порождает:
+        Event: Сгенерированные события.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield Event(
+            id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            date=(_FIRST_DAY + timedelta(days=rng.randrange(_DAYS))).isoformat(),
+            title=' '.join(rng.choices(_WORDS, k=rng.randint(1, 2))),
+            text=' '.join(rng.choices(_WORDS, k=rng.randint(3, 15)))
+        )
+
+
+class _Target:
+    # Uniform interface over one layer, so the same operations can be timed at every layer.
+    def __init__(self, layer: str, backend: str, path: str):
+        self.layer = layer
+        if layer == 'storage':
+            self._api = db.create_storage(backend, path)
+        elif layer == 'db':
+            self._api = db.EventDB(backend, path)
+        else:
+            self._event_db = db.EventDB(backend, path)
+            self._api = EventLogic(self._event_db)
+        if layer == 'app':
+            self._client = _app_client(self._event_db, self._api)
+
+    def load(self, events: List[Event]):
+        if self.layer == 'storage':
+            self._api.apply_batch([('create', event.id, event) for event in events])
+        else:
+            self._api.bulk_create(events)
+
+    def create(self, event: Event):
+        if self.layer == 'app':
+            self._check(self._client.post('/api/v1/calendar/', json=_payload(event)))
+        else:
+            self._api.create(event)
+
+    def read(self, event_id: str):
+        if self.layer == 'app':
+            self._check(self._client.get(f'/api/v1/calendar/{event_id}/'))
+        else:
+            self._api.read(event_id)
+
+    def update(self, event_id: str, event: Event):
+        if self.layer == 'app':
+            self._check(self._client.put(f'/api/v1/calendar/{event_id}/', json=_payload(event)))
+        else:
+            self._api.update(event_id, event)
+
+    def delete(self, event_id: str):
+        if self.layer == 'app':
+            self._check(self._client.delete(f'/api/v1/calendar/{event_id}/'))
+        else:
+            self._api.delete(event_id)
+
+    def list(self):
+        if self.layer == 'app':
+            self._check(self._client.get('/api/v1/calendar/'))
+        else:
+            self._api.list()
+
+    def list_range(self, start: date, end: date):
+        if self.layer == 'app':
+            self._check(self._client.get(f'/api/v1/calendar/?from={start.isoformat()}&to={end.isoformat()}'))
+        elif self.layer == 'logic':
+            self._api.list(start, end)
+        else:
+            self._api.list_range(start, end)
+
+    def page(self, start: date, limit: int):
+        if self.layer == 'app':
+            self._check(self._client.get(f'/api/v1/calendar/?from={start.isoformat()}&limit={limit}'))
+        elif self.layer == 'logic':
+            self._api.page(limit, None, start)
+        else:
+            self._api.list_range(start, date.max, None, limit)
+
+    def search(self, query: str):
+        if self.layer == 'app':
+            self._check(self._client.get('/api/v1/calendar/search', query_string={'q': query}))
+        else:
+            self._api.search(query, config.SEARCH_DEFAULT_LIMIT)
+
+    def close(self):
+        if self.layer in ('logic', 'app'):
+            self._event_db.close()
+        else:
+            self._api.close()
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)}")
+
+
+def _payload(event: Event) -> dict:
+    return {'date': event.date, 'title': event.title, 'text': event.text}
+
+
+def _app_client(event_db: db.EventDB, logic: EventLogic):
+    # The app module opens the configured storage on import, so it is pointed at a scratch file first and then
+    # rewired to the storage of the benchmark.
+    import cache
+    if 'app' not in sys.modules:
+        config.STORAGE_BACKEND = 'local'
+        config.STORAGE_PATH = os.path.join(tempfile.mkdtemp(prefix='calendar-bench-'), 'bootstrap.json')
+    import app as app_module
+    response_cache = cache.ResponseCache(config.RESPONSE_CACHE_MAX_ENTRIES)
+    logic.add_listener(response_cache.invalidate)
+    app_module.set_default_calendar(registry.Calendar(event_db, logic, response_cache))
+    return app_module.app.test_client()
+
+
+def check_eviction(backend: str, calendars: int = 6, max_open: int = 2) -> int:
+    """
+    <EN>
+    Open more calendars than the registry keeps open and count the storages of the evicted ones that are still
+    referenced once they have been closed.
+
+    Args:
+        backend (str): The storage backend of the calendars.
+        calendars (int): Number of calendars to open, one after another.
+        max_open (int): Number of calendars the registry keeps open.
+
+    Returns:
+        int: Number of evicted storages still in memory; 0 if all of them have been freed.
+    """
+    """
+    <RUS>
+    Открывает больше календарей, чем реестр держит открытыми, и считает хранилища вытесненных календарей,
+    на которые остались ссылки после их закрытия.
+
+    Аргументы:
+        backend (str): Бэкенд хранилища календарей.
+        calendars (int): Количество календарей, открываемых один за другим.
+        max_open (int): Количество календарей, которые реестр держит открытыми.
+
+    Возвращает:
+        int: Количество вытесненных хранилищ, оставшихся в памяти; 0, если все они освобождены.
+    """
+    with tempfile.TemporaryDirectory(prefix='calendar-bench-') as directory:
+        calendar_registry = registry.CalendarRegistry(directory, max_open, backend)
+        storages = []
+        try:
+            for number, event in enumerate(generate_events(calendars)):
+                calendar_id = f'calendar-{number}'
+                calendar = calendar_registry.acquire(calendar_id, create=True)
+                calendar.logic.create(event)
+                storages.append(weakref.ref(calendar.event_db._storage))
+                calendar_registry.release(calendar_id)
+            del calendar
+            gc.collect()
+            return sum(storage() is not None for storage in storages[:-max_open])
+        finally:
+            calendar_registry.close()
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _measure(operation: Callable[[int], None], iterations: int, memory_iterations: int, offset: int = 0) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        begin = time.perf_counter_ns()
+        operation(offset + i)
+        samples.append((time.perf_counter_ns() - begin) / 1e6)
+    elapsed = time.perf_counter() - started
+    result = {
+        'iterations': iterations,
+        'p50_ms': round(_percentile(samples, 0.50), 4),
+        'p99_ms': round(_percentile(samples, 0.99), 4),
+        'mean_ms': round(sum(samples) / len(samples), 4),
+        'throughput_ops': round(iterations / elapsed, 1) if elapsed > 0 else None,
+        'peak_memory_bytes': None,
+    }
+    if memory_iterations:
+        # Traced separately, since tracemalloc slows every allocation down and would distort the latencies.
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(memory_iterations):
+            operation(offset + iterations + i)
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+    return result
+
+
+def run_case(layer: str, backend: str, size: int, args) -> List[dict]:
+    """
+    <EN>
+    Measure every operation of one layer and backend at one dataset size.
+
+    Args:
+        layer (str): The layer to measure ('storage', 'db', 'logic' or 'app').
+        backend (str): The storage backend ('local', 'log', 'sharded', 'mapped' or 'sqlite').
+        size (int): Number of events the storage is preloaded with.
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        List[dict]: One result per operation.
+    """
+    """
+    <RUS>
+    Измеряет все операции одного уровня и бэкенда при одном размере данных.
+
+    Аргументы:
+        layer (str): Измеряемый уровень ('storage', 'db', 'logic' или 'app').
+        backend (str): Бэкенд хранилища ('local', 'log', 'sharded', 'mapped' или 'sqlite').
+        size (int): Количество событий, которыми предварительно заполняется хранилище.
+        args (argparse.Namespace): Разобранные аргументы командной строки.
+
+    Возвращает:
+        List[dict]: По одному результату на операцию.
+    """
+    single = args.iterations + args.memory_iterations
+    dataset = list(generate_events(size, args.seed))
+    extra = list(generate_events(2 * single, args.seed + 1))
+    rng = random.Random(args.seed)
+    existing = [event.id for event in dataset]
+    rng.shuffle(existing)
+    # Deleted events are taken from the end of the shuffled IDs, so reads and updates never hit a deleted event.
+    deleted, existing = existing[-single:], existing[:-single] or existing
+    days = [_FIRST_DAY + timedelta(days=rng.randrange(_DAYS)) for _ in range(single)]
+    queries = [rng.choice(_WORDS)[:rng.randint(3, 6)] for _ in range(single)]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='calendar-bench-') as directory:
+        path = os.path.join(directory, config.DEFAULT_STORAGE_PATHS[backend])
+        gc.collect()
+        if args.memory_iterations:
+            tracemalloc.start()
+        started = time.perf_counter()
+        target = _Target(layer, backend, path)
+        target.load(dataset)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if args.memory_iterations else None
+        tracemalloc.stop()
+        results.append({'operation': 'load', 'iterations': 1, 'p50_ms': round(elapsed * 1000, 4),
+                         'p99_ms': round(elapsed * 1000, 4), 'mean_ms': round(elapsed * 1000, 4),
+                         'throughput_ops': round(size / elapsed, 1) if elapsed > 0 else None,
+                         'peak_memory_bytes': peak})
+        del dataset
+        try:
+            operations = {
+                'create': lambda i: target.create(extra[i]),
+                'read': lambda i: target.read(existing[i % len(existing)]),
+                'update': lambda i: target.update(existing[i % len(existing)],
+                                                  Event(existing[i % len(existing)], extra[single + i].date,
+                                                        extra[single + i].title, extra[single + i].text)),
+                'list': lambda i: target.list(),
+                'list_range': lambda i: target.list_range(days[i % single], days[i % single] + timedelta(days=30)),
+                'page': lambda i: target.page(days[i % single], config.PAGE_DEFAULT_LIMIT),
+                'search': lambda i: target.search(queries[i % single]),
+                'delete': lambda i: target.delete(deleted[i]),
+            }
+            for name, operation in operations.items():
+                iterations = args.list_iterations if name in LIST_OPERATIONS else args.iterations
+                memory_iterations = min(args.memory_iterations, iterations) if name in LIST_OPERATIONS \
+                    else args.memory_iterations
+                results.append({'operation': name, **_measure(operation, iterations, memory_iterations)})
+        finally:
+            target.close()
+    for result in results:
+        result.update({'layer': layer, 'backend': backend, 'size': size})
+    return results
+
+
+def _key(result: dict) -> tuple:
+    return result['layer'], result['backend'], result['size'], result['operation']
+
+
+def compare(results: List[dict], baseline: List[dict]) -> List[dict]:
+    """
+    <EN>
+    Compare the p50 latencies of two runs.
+
+    Args:
+        results (List[dict]): Results of the current run.
+        baseline (List[dict]): Results of the previous run.
+
+    Returns:
+        List[dict]: For every measurement present in both runs, the baseline and current p50 and the change in percent.
+    """
+    """
+    <RUS>
+    Сравнивает задержки p50 двух запусков.
+
+    Аргументы:
+        results (List[dict]): Результаты текущего запуска.
+        baseline (List[dict]): Результаты предыдущего запуска.
+
+    Возвращает:
+        List[dict]: Для каждого измерения, присутствующего в обоих запусках, базовая и текущая p50 и изменение
+            в процентах.
+    """
+    previous = {_key(result): result for result in baseline}
+    changes = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None or not old['p50_ms']:
+            continue
+        change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        changes.append({'key': _key(result), 'baseline_p50_ms': old['p50_ms'], 'p50_ms': result['p50_ms'],
+                        'change_percent': round(change, 1)})
+    return changes
+
+
+def _format_memory(value: Optional[int]) -> str:
+    return '-' if value is None else f"{value / 1024:.0f}K"
+
+
+def _print_results(results: List[dict]):
+    print(f"{'layer':<8}{'backend':<8}{'size':>9}  {'operation':<11}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'ops/s':>11}{'peak mem':>10}")
+    for r in results:
+        print(f"{r['layer']:<8}{r['backend']:<8}{r['size']:>9}  {r['operation']:<11}{r['p50_ms']:>10.3f}"
+              f"{r['p99_ms']:>10.3f}{r['throughput_ops'] or 0:>11.0f}{_format_memory(r['peak_memory_bytes']):>10}")
+
+
+def _split(value: str, allowed=None) -> list:
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if allowed is not None:
+        unknown = set(items) - set(allowed)
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown values: {', '.join(sorted(unknown))}")
+    return items
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the calendar storage, database, logic and API layers")
+    parser.add_argument('--sizes', default='1000,10000', type=lambda value: [int(size) for size in _split(value)],
+                        help="comma-separated dataset sizes")
+    parser.add_argument('--layers', default=','.join(LAYERS), type=lambda value: _split(value, LAYERS),
+                        help="comma-separated layers")
+    parser.add_argument('--backends', default=config.STORAGE_BACKEND, type=lambda value: _split(value, BACKENDS),
+                        help="comma-separated storage backends")
+    parser.add_argument('--iterations', type=int, default=200, help="iterations of single-event operations")
+    parser.add_argument('--list-iterations', type=int, default=20, help="iterations of listing operations")
+    parser.add_argument('--memory-iterations', type=int, default=3, help="iterations traced for peak memory")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the event generator")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of a previous run")
+    parser.add_argument('--max-regression', type=float, help="largest allowed p50 growth in percent")
+    args = parser.parse_args(argv)
+    if args.iterations < 1 or args.list_iterations < 1 or args.memory_iterations < 0:
+        parser.error("iterations must be positive")
+    if any(size <= 2 * (args.iterations + args.memory_iterations) for size in args.sizes):
+        parser.error("every dataset size must exceed twice the number of single-event iterations")
+
+    for backend in args.backends:
+        leaked = check_eviction(backend)
+        if leaked:
+            print(f"{backend}: {leaked} calendars evicted from the registry are still in memory", file=sys.stderr)
+            return 1
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            for layer in args.layers:
+                print(f"running {layer}/{backend} with {size} events...", file=sys.stderr)
+                results.extend(run_case(layer, backend, size, args))
+    _print_results(results)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'write_behind': config.WRITE_BEHIND,
+            'durable_writes': config.DURABLE_WRITES,
+            'arguments': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            changes = compare(results, json.load(file)['results'])
+        regressions = []
+        for change in changes:
+            print(f"{'/'.join(map(str, change['key'])):<40}{change['baseline_p50_ms']:>10.3f}{change['p50_ms']:>10.3f}"
+                  f"{change['change_percent']:>+9.1f}%")
+            if args.max_regression is not None and change['change_percent'] > args.max_regression:
+                regressions.append(change)
+        if regressions:
+            print(f"{len(regressions)} measurements regressed by more than {args.max_regression}%", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+<EN>
+Live Change Broadcasting
+
+This module fans the changes of the calendar out to the subscribers of the Server-Sent Events stream of the ASGI
+application. A single task on the event loop follows the change log: it is woken by the storage listener after every
+mutation, and otherwise every SSE_HEARTBEAT_MS to pick up the changes of other processes, reads the new changes once
+and offers each of them to every subscriber. Subscribers are plain objects with a bounded queue, so thousands of idle
+connections cost no threads and no storage reads of their own.
+
+A subscriber that does not read fast enough has its queue dropped once it holds SSE_QUEUE_SIZE changes; it then
+catches up from the change log by itself, exactly like a client reconnecting with Last-Event-ID. The ID of every
+SSE event is the sequence number of its change in the change log.
+
+Constants:
+    CATCH_UP: Returned by Subscription.get() after the queue of the subscriber has overflowed.
+
+Functions:
+    in_range(event: Event, start: Optional[date], end: Optional[date]) -> bool: Check whether an event has an
+        occurrence within a date range.
+    format_change(seq: Optional[int], event_id: Optional[str], event: Optional[Event]) -> str: Format a change as an
+        SSE event.
+
+Classes:
+    Subscription: Bounded queue of the changes waiting to be sent to one subscriber.
+    ChangeBroadcaster: Follows the change log and offers every change to all subscriptions.
+
+Methods:
+    ChangeBroadcaster.subscribe(start: date = None, end: date = None) -> Subscription: Start receiving changes.
+    ChangeBroadcaster.unsubscribe(subscription: Subscription): Stop receiving changes.
+    ChangeBroadcaster.seq: The number of the last change offered to the subscriptions, or None without a change log.
+    ChangeBroadcaster.close(): Stop following the change log and end all subscriptions.
+    Subscription.get(): Wait for the next changes.
+    Subscription.matches(event: Event) -> bool: Check whether an event falls within the date range of the subscriber;
+        an event whose date or rule cannot be parsed always does.
+"""
+"""
+<RUS>
+Рассылка изменений в реальном времени
+
+Этот модуль рассылает изменения календаря подписчикам потока Server-Sent Events ASGI-приложения. Одна задача в цикле
+событий следит за журналом изменений: ее будит слушатель хранилища после каждого изменения, а в остальное время —
+каждые SSE_HEARTBEAT_MS, чтобы подхватить изменения других процессов; она один раз читает новые изменения
+и предлагает каждое из них всем подписчикам. Подписчики — простые объекты с ограниченной очередью, поэтому тысячи
+простаивающих соединений не требуют ни потоков, ни собственных чтений из хранилища.
+
+Очередь подписчика, который читает недостаточно быстро, сбрасывается, как только в ней набирается SSE_QUEUE_SIZE
+изменений; после этого он сам догоняет по журналу изменений, точно как клиент, переподключившийся с Last-Event-ID.
+ID каждого события SSE — номер его изменения в журнале изменений.
+
+Константы:
+    CATCH_UP: Возвращается Subscription.get() после переполнения очереди подписчика.
+
+Функции:
+    in_range(event: Event, start: Optional[date], end: Optional[date]) -> bool: Проверяет, есть ли у события
+        повторение в диапазоне дат.
+    format_change(seq: Optional[int], event_id: Optional[str], event: Optional[Event]) -> str: Форматирует изменение
+        как событие SSE.
+
+Классы:
+    Subscription: Ограниченная очередь изменений, ожидающих отправки одному подписчику.
+    ChangeBroadcaster: Следит за журналом изменений и предлагает каждое изменение всем подпискам.
+
+Методы:
+    ChangeBroadcaster.subscribe(start: date = None, end: date = None) -> Subscription: Начинает получение изменений.
+    ChangeBroadcaster.unsubscribe(subscription: Subscription): Прекращает получение изменений.
+    ChangeBroadcaster.seq: Номер последнего изменения, предложенного подпискам, или None без журнала изменений.
+    ChangeBroadcaster.close(): Прекращает следить за журналом изменений и завершает все подписки.
+    Subscription.get(): Ожидает следующие изменения.
+    Subscription.matches(event: Event) -> bool: Проверяет, попадает ли событие в диапазон дат подписчика;
+        событие, дату или правило которого не удается разобрать, попадает всегда.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import date
+from json.encoder import encode_basestring_ascii
+from typing import Optional
+from logic import AsyncEventLogic, LogicException
+from model import Event, parse_date
+from recurrence import occurrences, parse_rule
+import config
+
+CATCH_UP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def in_range(event: Event, start: Optional[date], end: Optional[date]) -> bool:
+    """
+    <EN>
+    Check whether an event, or any occurrence of a recurring event, falls within a date range.
+    Args:
+        event (Event): The event.
+        start (Optional[date]): First day of the range, inclusive, or None for no lower bound.
+        end (Optional[date]): Last day of the range, inclusive, or None for no upper bound.
+    Returns:
+        bool: True if the event has an occurrence within the range.
+    """
+    """
+    <RUS>
+    Проверяет, попадает ли событие или какое-либо повторение повторяющегося события в диапазон дат.
+    Аргументы:
+        event (Event): Событие.
+        start (Optional[date]): Первый день диапазона включительно или None без нижней границы.
+        end (Optional[date]): Последний день диапазона включительно или None без верхней границы.
+    Возвращает:
+        bool: True, если у события есть повторение в диапазоне.
+    """
+    if start is None and end is None:
+        return True
+    first = parse_date(event.date)
+    if event.rrule is None:
+        return (start is None or first >= start) and (end is None or first <= end)
+    exdates = {parse_date(day) for day in event.exdates}
+    days = occurrences(first, parse_rule(event.rrule), start or first, end or date.max, exdates)
+    return next(days, None) is not None
+
+
+def format_change(seq: Optional[int], event_id: Optional[str], event: Optional[Event]) -> str:
+    """
+    <EN>
+    Format a change as an SSE event: 'put' with the event as data, 'delete' with {"id": ...} as data, or 'resync'
+    when event_id is None, telling the client to reload the calendar.
+    Args:
+        seq (Optional[int]): Sequence number of the change, sent as the event ID; None to send no ID.
+        event_id (Optional[str]): ID of the changed event, or None for a resync.
+        event (Optional[Event]): The current state of the event, or None if it has been deleted.
+    Returns:
+        str: The SSE event, ending with an empty line.
+    """
+    """
+    <RUS>
+    Форматирует изменение как событие SSE: 'put' с событием в качестве данных, 'delete' с {"id": ...} в качестве
+    данных или 'resync', если event_id равен None, что говорит клиенту перезагрузить календарь.
+    Аргументы:
+        seq (Optional[int]): Номер изменения, отправляемый как ID события; None, чтобы не отправлять ID.
+        event_id (Optional[str]): ID измененного события или None для полной синхронизации.
+        event (Optional[Event]): Текущее состояние события или None, если оно удалено.
+    Возвращает:
+        str: Событие SSE, заканчивающееся пустой строкой.
+    """
+    prefix = '' if seq is None else f"id: {seq}\n"
+    if event_id is None:
+        return f"{prefix}event: resync\ndata: {{}}\n\n"
+    if event is None:
+        return f'{prefix}event: delete\ndata: {{"id": {encode_basestring_ascii(event_id)}}}\n\n'
+    return f"{prefix}event: put\ndata: {event.to_json()}\n\n"
+
+
+class Subscription:
+    __slots__ = ('start', 'end', '_size', '_queue', '_ready', '_overflowed', '_closed')
+
+    def __init__(self, start: Optional[date], end: Optional[date], size: int):
+        self.start = start
+        self.end = end
+        self._size = size
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._overflowed = False
+        self._closed = False
+
+    def matches(self, event: Event) -> bool:
+        try:
+            return in_range(event, self.start, self.end)
+        except (TypeError, ValueError):
+            # Events stored before validation may have no valid date or rule; they are sent unfiltered.
+            return True
+
+    def offer(self, seq: Optional[int], event_id: Optional[str], event: Optional[Event]):
+        """
+        <EN>
+        Queue a change for the subscriber. An event that does not fall within the date range of the subscriber is
+        queued as deleted, since it may have been moved out of the range. Once the queue is full, it is dropped and
+        further changes are ignored until the subscriber has read CATCH_UP.
+        Args:
+            seq (Optional[int]): Sequence number of the change.
+            event_id (Optional[str]): ID of the changed event, or None for a resync.
+            event (Optional[Event]): The current state of the event, or None if it has been deleted.
+        """
+        """
+        <RUS>
+        Ставит изменение в очередь подписчика. Событие, не попадающее в диапазон дат подписчика, ставится в очередь
+        как удаленное, поскольку его могли вынести из диапазона. Когда очередь заполнена, она сбрасывается,
+        а следующие изменения игнорируются, пока подписчик не прочитает CATCH_UP.
+        Аргументы:
+            seq (Optional[int]): Номер изменения.
+            event_id (Optional[str]): ID измененного события или None для полной синхронизации.
+            event (Optional[Event]): Текущее состояние события или None, если оно удалено.
+        """
+        if self._overflowed or self._closed:
+            return
+        if len(self._queue) >= self._size:
+            self._queue.clear()
+            self._overflowed = True
+        else:
+            if event is not None and not self.matches(event):
+                event = None
+            self._queue.append((seq, event_id, event))
+        self._ready.set()
+
+    async def get(self):
+        """
+        <EN>
+        Wait for the next changes and take all of them from the queue.
+        Returns:
+            List[Tuple[Optional[int], Optional[str], Optional[Event]]]: The queued (seq, event_id, event) changes;
+                CATCH_UP if the queue has overflowed, in which case the subscriber reads the missed changes from
+                the change log; or None once the subscription has been closed.
+        """
+        """
+        <RUS>
+        Ожидает следующие изменения и забирает их все из очереди.
+        Возвращает:
+            List[Tuple[Optional[int], Optional[str], Optional[Event]]]: Изменения (seq, event_id, event) из очереди;
+                CATCH_UP, если очередь переполнилась, и тогда подписчик читает пропущенные изменения из журнала
+                изменений; или None после закрытия подписки.
+        """
+        await self._ready.wait()
+        self._ready.clear()
+        if self._closed:
+            return None
+        if self._overflowed:
+            self._overflowed = False
+            return CATCH_UP
+        changes = list(self._queue)
+        self._queue.clear()
+        return changes
+
+    def close(self):
+        self._closed = True
+        self._queue.clear()
+        self._ready.set()
+
+
+class ChangeBroadcaster:
+    def __init__(self, logic: AsyncEventLogic, queue_size: Optional[int] = None,
+                 heartbeat_ms: Optional[int] = None):
+        """
+        <EN>
+        Initialize the broadcaster. It starts following the change log with the first subscription.
+        Args:
+            logic (AsyncEventLogic): The logic to read the changes from.
+            queue_size (int): Number of changes a subscription holds. Defaults to config.SSE_QUEUE_SIZE.
+            heartbeat_ms (int): Interval in milliseconds of the checks for changes of other processes.
+                Defaults to config.SSE_HEARTBEAT_MS.
+        """
+        """
+        <RUS>
+        Инициализирует рассыльщик. Он начинает следить за журналом изменений с первой подпиской.
+        Аргументы:
+            logic (AsyncEventLogic): Логика, из которой читаются изменения.
+            queue_size (int): Количество изменений, которое вмещает подписка. По умолчанию config.SSE_QUEUE_SIZE.
+            heartbeat_ms (int): Интервал в миллисекундах между проверками изменений других процессов.
+                По умолчанию config.SSE_HEARTBEAT_MS.
+        """
+        self._logic = logic
+        self._queue_size = queue_size or config.SSE_QUEUE_SIZE
+        self._interval = (heartbeat_ms or config.SSE_HEARTBEAT_MS) / 1000
+        self._subscriptions = set()
+        self._seq = None
+        self._loop = None
+        self._wake = None
+        self._started = None
+        self._changed = False
+        self._task = None
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    @property
+    def seq(self) -> Optional[int]:
+        return self._seq
+
+    async def subscribe(self, start: Optional[date] = None, end: Optional[date] = None) -> Subscription:
+        """
+        <EN>
+        Start receiving changes. Every change after the number seq has at the time of the call is offered to the
+        subscription.
+        Args:
+            start (Optional[date]): First day of the date range of the subscriber, or None for no lower bound.
+            end (Optional[date]): Last day of the date range of the subscriber, or None for no upper bound.
+        Returns:
+            Subscription: The subscription, to be passed to unsubscribe() when the client is gone.
+        """
+        """
+        <RUS>
+        Начинает получение изменений. Каждое изменение после номера, который seq имеет в момент вызова,
+        предлагается подписке.
+        Аргументы:
+            start (Optional[date]): Первый день диапазона дат подписчика или None без нижней границы.
+            end (Optional[date]): Последний день диапазона дат подписчика или None без верхней границы.
+        Возвращает:
+            Subscription: Подписка, которую нужно передать в unsubscribe(), когда клиент отключится.
+        """
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._started = asyncio.Event()
+            self._logic.add_listener(self._on_change)
+            self._task = asyncio.ensure_future(self._run())
+        await self._started.wait()
+        subscription = Subscription(start, end, self._queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def _on_change(self, event_ids):
+        # Storage listeners run in the thread of the mutation; the broadcaster only runs on its event loop.
+        try:
+            self._loop.call_soon_threadsafe(self._mark_changed)
+        except RuntimeError:
+            pass
+
+    def _mark_changed(self):
+        self._changed = True
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                self._seq = await self._logic.change_seq()
+                break
+            except LogicException:
+                await asyncio.sleep(self._interval)
+        self._started.set()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            changed, self._changed = self._changed, False
+            try:
+                await self._pump(changed)
+            except LogicException:
+                # The changes stay in the change log and are read again on the next wake-up.
+                self._changed = self._changed or changed
+            except Exception:
+                # The task serves every subscription, so it outlives any single failure.
+                logger.exception("Failed to broadcast calendar changes")
+                self._changed = self._changed or changed
+
+    async def _pump(self, changed: bool):
+        if self._seq is None:
+            # Without a change log the changed events are unknown, so the subscribers reload the calendar.
+            if changed:
+                self._publish(None, None, None)
+            return
+        if changed:
+            # With write-behind, changes are numbered only once they are saved.
+            await self._logic.flushed()
+        while True:
+            change_set = await self._logic.changes(self._seq, config.STREAM_CHUNK_SIZE)
+            if change_set.changes is None:
+                self._publish(change_set.seq, None, None)
+            else:
+                for seq, event_id, event in change_set.changes:
+                    self._publish(seq, event_id, event)
+            # seq is only advanced together with the offers, so a new subscription never misses a change.
+            self._seq = change_set.seq
+            if not change_set.more:
+                return
+
+    def _publish(self, seq: Optional[int], event_id: Optional[str], event: Optional[Event]):
+        for subscription in self._subscriptions:
+            subscription.offer(seq, event_id, event)
+
+    def close(self):
+        """
+        <EN>
+        Stop following the change log and close all subscriptions, which ends their streams.
+        """
+        """
+        <RUS>
+        Прекращает следить за журналом изменений и закрывает все подписки, что завершает их потоки.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._logic.remove_listener(self._on_change)
+        for subscription in self._subscriptions:
+            subscription.close()
+        self._subscriptions.clear()
@@ -0,0 +1,204 @@
+"""
+<EN>
+Response Cache for the Calendar API
+
+This module provides a cache of already encoded JSON response bodies. Entries are tagged with the storage version
+they were built from and are dropped by the storage mutation listeners, so repeated reads of unchanged data are
+served without reading events from storage or encoding them again. Compressed variants of a body are built on first
+use and live as long as the entry, so they are dropped on mutation as well.
+
+Classes:
+    CachedBody: An encoded response body together with its lazily built compressed variants.
+    ResponseCache: Bounded LRU cache of CachedBody entries keyed by resource.
+
+Constants:
+    LIST_KEY (tuple): Cache key of the full event list.
+
+Functions:
+    list_key(fields: Optional[Tuple[str, ...]] = None) -> tuple: Cache key of the event list with projected fields.
+    event_key(event_id: str) -> tuple: Cache key of a single event.
+
+Methods:
+    CachedBody.compressed(encoding: str) -> bytes: Get the body compressed with a content coding.
+    ResponseCache.get(key, tag) -> Optional[CachedBody]: Get an entry if it was built from the given version.
+    ResponseCache.put(key, tag, body: bytes) -> CachedBody: Store an encoded body.
+    ResponseCache.invalidate(event_ids=None): Drop the entries affected by a change of the given events.
+"""
+"""
+<RUS>
+Кэш ответов API календаря
+
+Этот модуль предоставляет кэш уже закодированных тел JSON-ответов. Записи помечаются версией хранилища, по которой
+они построены, и удаляются слушателями изменений хранилища, поэтому повторные чтения неизменных данных обслуживаются
+без чтения событий из хранилища и их повторного кодирования. Сжатые варианты тела создаются при первом использовании
+и живут столько же, сколько запись, поэтому тоже удаляются при изменении.
+
+Классы:
+    CachedBody: Закодированное тело ответа вместе с лениво создаваемыми сжатыми вариантами.
+    ResponseCache: Ограниченный LRU-кэш записей CachedBody по ключу ресурса.
+
+Константы:
+    LIST_KEY (tuple): Ключ кэша полного списка событий.
+
+Функции:
+    list_key(fields: Optional[Tuple[str, ...]] = None) -> tuple: Ключ кэша списка событий с выбранными полями.
+    event_key(event_id: str) -> tuple: Ключ кэша отдельного события.
+
+Методы:
+    CachedBody.compressed(encoding: str) -> bytes: Получает тело, сжатое указанным кодированием.
+    ResponseCache.get(key, tag) -> Optional[CachedBody]: Получает запись, если она построена по указанной версии.
+    ResponseCache.put(key, tag, body: bytes) -> CachedBody: Сохраняет закодированное тело.
+    ResponseCache.invalidate(event_ids=None): Удаляет записи, затронутые изменением указанных событий.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+import compression
+
+LIST_KEY = ('list',)
+
+
+def list_key(fields: Optional[Tuple[str, ...]] = None) -> tuple:
+    return LIST_KEY if fields is None else ('list', fields)
+
+
+def event_key(event_id: str) -> tuple:
+    return 'event', event_id
+
+
+class CachedBody:
+    __slots__ = ('tag', 'body', '_variants')
+
+    def __init__(self, tag: str, body: bytes):
+        self.tag = tag
+        self.body = body
+        self._variants = {}
+
+    def compressed(self, encoding: str) -> bytes:
+        """
+        <EN>
+        Get the body compressed with a content coding. It is compressed on first use and kept for later requests.
+        Args:
+            encoding (str): 'br' or 'gzip'.
+        Returns:
+            bytes: The compressed body.
+        """
+        """
+        <RUS>
+        Получает тело, сжатое указанным кодированием. Оно сжимается при первом использовании и сохраняется
+        для следующих запросов.
+        Аргументы:
+            encoding (str): 'br' или 'gzip'.
+        Возвращает:
+            bytes: Сжатое тело.
+        """
+        data = self._variants.get(encoding)
+        if data is None:
+            # Concurrent requests may compress the same body twice; either result is the same.
+            data = self._variants[encoding] = compression.compress(self.body, encoding)
+        return data
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 10000):
+        """
+        <EN>
+        Initialize an empty cache.
+        Args:
+            max_entries (int): Maximum number of entries; the least recently used ones are evicted first.
+        """
+        """
+        <RUS>
+        Инициализирует пустой кэш.
+        Аргументы:
+            max_entries (int): Максимальное количество записей; первыми вытесняются давно не использованные.
+        """
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        # Keys of the cached event lists, one per field projection, all of which any change invalidates.
+        self._list_keys = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, tag: str) -> Optional[CachedBody]:
+        """
+        <EN>
+        Get a cached body. An entry built from another storage version is treated as missing, which also covers
+        changes made by other processes that the mutation listeners do not see.
+        Args:
+            key (tuple): The cache key of the resource.
+            tag (str): The current version tag of the resource.
+        Returns:
+            Optional[CachedBody]: The cached body, or None on a miss.
+        """
+        """
+        <RUS>
+        Получает закэшированное тело. Запись, построенная по другой версии хранилища, считается отсутствующей,
+        что учитывает и изменения других процессов, которые не видят слушатели изменений.
+        Аргументы:
+            key (tuple): Ключ кэша ресурса.
+            tag (str): Текущий тег версии ресурса.
+        Возвращает:
+            Optional[CachedBody]: Закэшированное тело или None при промахе.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.tag != tag:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, tag: str, body: bytes) -> CachedBody:
+        """
+        <EN>
+        Store an encoded body.
+        Args:
+            key (tuple): The cache key of the resource.
+            tag (str): The version tag the body was built from.
+            body (bytes): The encoded response body.
+        Returns:
+            CachedBody: The stored entry.
+        """
+        """
+        <RUS>
+        Сохраняет закодированное тело.
+        Аргументы:
+            key (tuple): Ключ кэша ресурса.
+            tag (str): Тег версии, по которой построено тело.
+            body (bytes): Закодированное тело ответа.
+        Возвращает:
+            CachedBody: Сохраненная запись.
+        """
+        entry = CachedBody(tag, body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if key[0] == 'list':
+                self._list_keys.add(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, event_ids: Optional[Iterable[str]] = None):
+        """
+        <EN>
+        Drop the entries affected by a change. Used as a storage mutation listener.
+        Args:
+            event_ids (Iterable[str]): IDs of the changed events, or None if any event may have changed.
+        """
+        """
+        <RUS>
+        Удаляет записи, затронутые изменением. Используется как слушатель изменений хранилища.
+        Аргументы:
+            event_ids (Iterable[str]): ID измененных событий или None, если могло измениться любое событие.
+        """
+        with self._lock:
+            if event_ids is None:
+                self._entries.clear()
+                self._list_keys.clear()
+                return
+            for key in self._list_keys:
+                self._entries.pop(key, None)
+            self._list_keys.clear()
+            for event_id in event_ids:
+                self._entries.pop(event_key(event_id), None)
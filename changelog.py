@@ -0,0 +1,201 @@
+"""
+<EN>
+Change Log for Incremental Sync
+
+This module provides the sequence log behind the change feed of the file-based storages. Every persisted mutation
+gets the next number of a monotonic sequence, and the log remembers which event each number changed. A client that
+has seen the changes up to some number asks only for the events changed after it; the current state of those events
+is taken from the storage, so the log itself only needs the event IDs.
+
+The log is kept in memory and appended to a JSON lines file next to the storage, one {"seq", "id"} record per
+change, so the sequence survives restarts and is shared by every process using the storage. It is bounded: once it
+holds twice max_entries records, it is rewritten with the newest max_entries ones, and clients that fall further
+behind have to resync the whole calendar.
+
+Classes:
+    ChangeLog: Bounded, persisted log of the IDs of changed events numbered by a monotonic sequence.
+
+Methods:
+    __init__(path: str, max_entries: int = 10000): Open the log file, creating it on the first append.
+    seq: The number of the last change.
+    sync(): Read the records appended by other processes.
+    append(event_ids) -> int: Number and persist a group of changes.
+    since(seq: int) -> Optional[List[Tuple[int, str]]]: Get the changes made after a sequence number.
+"""
+"""
+<RUS>
+Журнал изменений для инкрементальной синхронизации
+
+Этот модуль предоставляет журнал последовательности, на котором построена лента изменений файловых хранилищ. Каждое
+сохраненное изменение получает следующий номер монотонной последовательности, а журнал запоминает, какое событие
+изменено под каждым номером. Клиент, видевший изменения до некоторого номера, запрашивает только события, измененные
+после него; текущее состояние этих событий берется из хранилища, поэтому самому журналу достаточно ID событий.
+
+Журнал хранится в памяти и дописывается в файл строк JSON рядом с хранилищем, по одной записи {"seq", "id"}
+на изменение, поэтому последовательность сохраняется между перезапусками и общая для всех процессов, использующих
+хранилище. Журнал ограничен: как только в нем набирается вдвое больше max_entries записей, он перезаписывается
+с max_entries самыми новыми, а клиентам, отставшим сильнее, приходится синхронизировать весь календарь заново.
+
+Классы:
+    ChangeLog: Ограниченный сохраняемый журнал ID измененных событий, пронумерованных монотонной последовательностью.
+
+Методы:
+    __init__(path: str, max_entries: int = 10000): Открывает файл журнала, создавая его при первом добавлении.
+    seq: Номер последнего изменения.
+    sync(): Читает записи, добавленные другими процессами.
+    append(event_ids) -> int: Нумерует и сохраняет группу изменений.
+    since(seq: int) -> Optional[List[Tuple[int, str]]]: Получает изменения, сделанные после номера последовательности.
+"""
+
+import json
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+
+def _encode(seq: int, event_id: str) -> bytes:
+    return (json.dumps({'seq': seq, 'id': event_id}, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class ChangeLog:
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        <EN>
+        Open the log file and read its records. A missing file is an empty log starting at sequence number 0.
+        Args:
+            path (str): Path to the log file.
+            max_entries (int): Number of changes the log retains at least.
+        """
+        """
+        <RUS>
+        Открывает файл журнала и читает его записи. Отсутствующий файл — пустой журнал, начинающийся с номера 0.
+        Аргументы:
+            path (str): Путь к файлу журнала.
+            max_entries (int): Количество изменений, которое журнал хранит как минимум.
+        """
+        self._path = path
+        self._max_entries = max_entries
+        # The event IDs of the retained changes; the change at position i has the number floor + 1 + i.
+        self._event_ids = []
+        self._floor = 0
+        self._inode = None
+        self._offset = 0
+        self.sync()
+
+    @property
+    def seq(self) -> int:
+        return self._floor + len(self._event_ids)
+
+    def sync(self):
+        """
+        <EN>
+        Read the records appended by other processes since the last call. After another process has compacted
+        or removed the file, it is read again from the start. Must be called with the storage lock held.
+        """
+        """
+        <RUS>
+        Читает записи, добавленные другими процессами после последнего вызова. Если другой процесс сжал или удалил
+        файл, он читается заново с начала. Должен вызываться при удерживаемой блокировке хранилища.
+        """
+        try:
+            file = open(self._path, 'rb')
+        except FileNotFoundError:
+            self._event_ids, self._floor, self._inode, self._offset = [], 0, None, 0
+            return
+        with file:
+            inode = os.fstat(file.fileno()).st_ino
+            if inode != self._inode:
+                self._event_ids, self._floor, self._inode, self._offset = [], None, inode, 0
+            file.seek(self._offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if self._floor is None:
+                    self._floor = record['seq'] - 1
+                elif record['seq'] != self.seq + 1:
+                    break
+                self._event_ids.append(record['id'])
+                self._offset += len(line)
+        if self._floor is None:
+            self._floor = 0
+
+    def append(self, event_ids: Iterable[str]) -> int:
+        """
+        <EN>
+        Number a group of changes and append them to the file, compacting it once it holds twice max_entries
+        records. Must be called with the exclusive storage file lock held, so that numbers are never issued twice.
+        Args:
+            event_ids (Iterable[str]): IDs of the changed events, in the order of the changes.
+        Returns:
+            int: The number of the last change.
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        """
+        <RUS>
+        Нумерует группу изменений и дописывает их в файл, сжимая его, когда в нем набирается вдвое больше max_entries
+        записей. Должен вызываться при удерживаемой исключительной блокировке файла хранилища, чтобы номера никогда
+        не выдавались дважды.
+        Аргументы:
+            event_ids (Iterable[str]): ID измененных событий в порядке изменений.
+        Возвращает:
+            int: Номер последнего изменения.
+        Вызывает:
+            OSError: Если файл не удается записать.
+        """
+        self.sync()
+        event_ids = list(event_ids)
+        data = b''.join(_encode(seq, event_id) for seq, event_id in enumerate(event_ids, self.seq + 1))
+        with open(self._path, 'ab') as file:
+            if file.tell() != self._offset:
+                # A record torn by a crashed process must not be followed by new records.
+                file.truncate(self._offset)
+                file.seek(self._offset)
+            file.write(data)
+            self._inode = os.fstat(file.fileno()).st_ino
+        self._offset += len(data)
+        self._event_ids.extend(event_ids)
+        if len(self._event_ids) >= 2 * self._max_entries:
+            self._compact()
+        return self.seq
+
+    def _compact(self):
+        kept = self._event_ids[-self._max_entries:]
+        floor = self.seq - len(kept)
+        data = b''.join(_encode(seq, event_id) for seq, event_id in enumerate(kept, floor + 1))
+        temp_path = f"{self._path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+            inode = os.fstat(file.fileno()).st_ino
+        os.replace(temp_path, self._path)
+        self._event_ids, self._floor, self._inode, self._offset = kept, floor, inode, len(data)
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, str]]]:
+        """
+        <EN>
+        Get the changes made after a sequence number.
+        Args:
+            seq (int): The number of the last change the client has seen.
+        Returns:
+            Optional[List[Tuple[int, str]]]: (seq, event_id) pairs in the order of the changes, or None if the log
+                no longer retains all of them or the number was never issued, in which case the client must resync.
+        """
+        """
+        <RUS>
+        Получает изменения, сделанные после номера последовательности.
+        Аргументы:
+            seq (int): Номер последнего изменения, которое видел клиент.
+        Возвращает:
+            Optional[List[Tuple[int, str]]]: Пары (seq, event_id) в порядке изменений или None, если журнал хранит
+                уже не все из них или такой номер никогда не выдавался; в этом случае клиент должен
+                синхронизироваться заново.
+        """
+        if seq < self._floor or seq > self.seq:
+            return None
+        return list(enumerate(self._event_ids[seq - self._floor:], seq + 1))
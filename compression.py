@@ -0,0 +1,159 @@
+"""
+<EN>
+Response Compression for the Calendar API
+
+This module negotiates the content coding of a response from the Accept-Encoding header of the request and
+compresses response bodies with it. Brotli is used when the optional 'brotli' package is installed and the client
+accepts it, gzip otherwise; responses smaller than COMPRESS_MIN_SIZE are sent as they are, since compressing them
+costs more time than it saves on the wire.
+
+Constants:
+    ENCODINGS (tuple): Content codings the service can produce, in order of preference.
+
+Functions:
+    negotiate(accept: Accept, size: Optional[int] = None) -> Optional[str]: Choose the content coding of a response.
+    compress(body: bytes, encoding: str) -> bytes: Compress a response body.
+    stream_compressor(encoding: str) -> Tuple[Callable, Callable]: Create an incremental compressor.
+    compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]: Compress a streamed response body.
+"""
+"""
+<RUS>
+Сжатие ответов API календаря
+
+Этот модуль выбирает кодирование содержимого ответа по заголовку Accept-Encoding запроса и сжимает им тела ответов.
+Brotli используется, если установлен необязательный пакет 'brotli' и клиент его принимает, иначе gzip; ответы
+меньше COMPRESS_MIN_SIZE отправляются как есть, поскольку их сжатие стоит больше времени, чем экономит при передаче.
+
+Константы:
+    ENCODINGS (tuple): Кодирования содержимого, которые может создавать сервис, в порядке предпочтения.
+
+Функции:
+    negotiate(accept: Accept, size: Optional[int] = None) -> Optional[str]: Выбирает кодирование содержимого ответа.
+    compress(body: bytes, encoding: str) -> bytes: Сжимает тело ответа.
+    stream_compressor(encoding: str) -> Tuple[Callable, Callable]: Создает пошаговый компрессор.
+    compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]: Сжимает тело потокового ответа.
+"""
+
+import gzip
+import zlib
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+from werkzeug.datastructures import Accept
+import config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli compression is optional
+    brotli = None
+
+# Brotli quality 5 compresses JSON better than gzip level 6 at about the same speed; higher qualities are far slower.
+_BROTLI_QUALITY = 5
+_GZIP_LEVEL = 6
+
+ENCODINGS = tuple(encoding for encoding in config.COMPRESS_ENCODINGS
+                  if encoding == 'gzip' or (encoding == 'br' and brotli is not None))
+
+
+def negotiate(accept: Accept, size: Optional[int] = None) -> Optional[str]:
+    """
+    <EN>
+    Choose the content coding of a response: the accepted coding with the highest quality, ties going to the
+    preferred one.
+    Args:
+        accept (Accept): The parsed Accept-Encoding header of the request.
+        size (Optional[int]): Size of the body in bytes, or None if it is streamed and not known in advance.
+    Returns:
+        Optional[str]: 'br' or 'gzip', or None if the body should be sent uncompressed.
+    """
+    """
+    <RUS>
+    Выбирает кодирование содержимого ответа: принимаемое кодирование с наибольшим качеством, а при равенстве —
+    предпочтительное.
+    Аргументы:
+        accept (Accept): Разобранный заголовок Accept-Encoding запроса.
+        size (Optional[int]): Размер тела в байтах или None, если оно передается потоком и заранее неизвестно.
+    Возвращает:
+        Optional[str]: 'br' или 'gzip' либо None, если тело нужно отправить без сжатия.
+    """
+    if size is not None and size < config.COMPRESS_MIN_SIZE:
+        return None
+    return accept.best_match(ENCODINGS)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    <EN>
+    Compress a response body.
+    Args:
+        body (bytes): The body.
+        encoding (str): 'br' or 'gzip'.
+    Returns:
+        bytes: The compressed body.
+    """
+    """
+    <RUS>
+    Сжимает тело ответа.
+    Аргументы:
+        body (bytes): Тело.
+        encoding (str): 'br' или 'gzip'.
+    Возвращает:
+        bytes: Сжатое тело.
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=_GZIP_LEVEL)
+
+
+def stream_compressor(encoding: str) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """
+    <EN>
+    Create an incremental compressor for a body that is sent in parts.
+    Args:
+        encoding (str): 'br' or 'gzip'.
+    Returns:
+        Tuple[Callable, Callable]: A function that compresses the next part and returns the compressed data that is
+            ready, possibly empty, and a function that returns the rest of the compressed body.
+    """
+    """
+    <RUS>
+    Создает пошаговый компрессор для тела, отправляемого по частям.
+    Аргументы:
+        encoding (str): 'br' или 'gzip'.
+    Возвращает:
+        Tuple[Callable, Callable]: Функция, которая сжимает следующую часть и возвращает готовые сжатые данные,
+            возможно пустые, и функция, которая возвращает остаток сжатого тела.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits 16 + MAX_WBITS writes the gzip header and trailer around the deflate stream.
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """
+    <EN>
+    Compress a streamed response body chunk by chunk. Compressed data is sent as soon as the compressor emits it,
+    so the memory used stays bounded by the compressor window whatever the size of the body.
+    Args:
+        chunks (Iterable): Chunks of the body, as str or bytes.
+        encoding (str): 'br' or 'gzip'.
+    Returns:
+        Iterator[bytes]: Chunks of the compressed body.
+    """
+    """
+    <RUS>
+    Сжимает тело потокового ответа по частям. Сжатые данные отправляются, как только их выдает компрессор, поэтому
+    используемая память ограничена окном компрессора при любом размере тела.
+    Аргументы:
+        chunks (Iterable): Части тела в виде str или bytes.
+        encoding (str): 'br' или 'gzip'.
+    Возвращает:
+        Iterator[bytes]: Части сжатого тела.
+    """
+    process, finish = stream_compressor(encoding)
+    for chunk in chunks:
+        data = process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,159 @@
+"""
+<EN>
+Application Configuration
+
+This module collects the settings of the calendar service. Every value can be overridden with an environment
+variable, so the same code can be deployed with different storage backends without modification.
+
+Constants:
+    STORAGE_BACKEND (str): Name of the storage backend used by EventDB ('local', 'log', 'sharded', 'mapped' or
+        'sqlite').
+    DEFAULT_STORAGE_PATHS (dict): Storage path used by each backend when CALENDAR_STORAGE_PATH is not set.
+    STORAGE_PATH (str): Path to the main storage file, or to the shard directory of the 'sharded' backend.
+    CALENDARS_PATH (str): Directory holding a storage directory for every calendar under /api/v1/calendars/.
+    CALENDARS_MAX_OPEN (int): Number of calendars kept open when idle; the least recently used ones are closed first.
+    STORAGE_CODEC (str): Codec of the 'local' storage file and of the 'log' snapshot: 'json', 'json-pretty' or
+        'binary'. Existing files are loaded whatever codec they were written with.
+    STORAGE_COMPRESSION (str): Compression of the same files: 'none', 'gzip' or 'zstd'.
+    LOG_COMPACT_THRESHOLD (int): Size of the write-ahead log in bytes after which it is compacted into a snapshot.
+    LOG_FSYNC (bool): Whether every appended log record is flushed to disk with fsync.
+    WRITE_BEHIND (bool): Whether the 'local' backend saves mutations from a background thread in groups.
+    WRITE_BEHIND_INTERVAL_MS (int): Time in milliseconds during which write-behind collects mutations into one save.
+    WRITE_BEHIND_MAX_OPERATIONS (int): Number of waiting operations after which write-behind saves without waiting.
+    DURABLE_WRITES (bool): Whether a mutation waits until it is persisted before a response is returned.
+    PAGE_DEFAULT_LIMIT (int): Page size used when a cursor is passed without a limit.
+    PAGE_MAX_LIMIT (int): Largest page size a client may request.
+    SEARCH_DEFAULT_LIMIT (int): Number of search results returned when no limit is given.
+    FREEBUSY_MAX_DAYS (int): Longest time window, in days, of a free/busy query.
+    STREAM_CHUNK_SIZE (int): Number of events fetched from storage at a time while streaming a list.
+    RECURRENCE_HORIZON_DAYS (int): Number of days after its first occurrence up to which a recurring series without
+        COUNT or UNTIL is expanded.
+    BATCH_MAX_OPERATIONS (int): Largest number of operations accepted in one batch request.
+    IMPORT_BATCH_SIZE (int): Number of imported events committed to storage together.
+    IMPORT_MAX_ERRORS (int): Number of failed events an import reports in detail.
+    CHANGE_LOG_MAX_ENTRIES (int): Number of changes the change log of the change feed retains at least; clients
+        that fall further behind resync the whole calendar.
+    SSE_QUEUE_SIZE (int): Number of changes waiting to be sent to one subscriber of the SSE stream; a subscriber that
+        falls further behind catches up from the change log instead.
+    SSE_HEARTBEAT_MS (int): Interval in milliseconds of the keep-alive comments sent to idle SSE subscribers, which
+        is also how often changes made by other processes are picked up.
+    RESPONSE_CACHE_MAX_ENTRIES (int): Maximum number of encoded responses kept in the response cache.
+    COMPRESS_MIN_SIZE (int): Smallest response body in bytes that is sent compressed to clients accepting compression.
+    COMPRESS_ENCODINGS (tuple): Content codings used for responses, in order of preference ('br' and 'gzip');
+        'br' is skipped when the brotli package is not installed.
+    ASYNC_READ_WORKERS (int): Number of threads the asynchronous mode uses for storage reads.
+    METRICS (bool): Whether operation timings and counters are collected and exposed on /metrics.
+    SERVER_TIMING (bool): Whether responses carry a Server-Timing header with the time spent in each layer.
+"""
+"""
+<RUS>
+Конфигурация приложения
+
+Этот модуль собирает настройки сервиса календаря. Каждое значение может быть переопределено переменной окружения,
+поэтому один и тот же код можно развернуть с разными бэкендами хранилища без изменений.
+
+Константы:
+    STORAGE_BACKEND (str): Имя бэкенда хранилища, используемого EventDB ('local', 'log', 'sharded', 'mapped'
+        или 'sqlite').
+    DEFAULT_STORAGE_PATHS (dict): Путь к хранилищу каждого бэкенда, если CALENDAR_STORAGE_PATH не задан.
+    STORAGE_PATH (str): Путь к основному файлу хранилища или к каталогу секций бэкенда 'sharded'.
+    CALENDARS_PATH (str): Каталог, содержащий каталог хранилища каждого календаря из /api/v1/calendars/.
+    CALENDARS_MAX_OPEN (int): Количество календарей, остающихся открытыми при простое; первыми закрываются давно
+        не использованные.
+    STORAGE_CODEC (str): Кодек файла хранилища 'local' и снимка 'log': 'json', 'json-pretty' или 'binary'.
+        Существующие файлы загружаются, каким бы кодеком они ни были записаны.
+    STORAGE_COMPRESSION (str): Сжатие тех же файлов: 'none', 'gzip' или 'zstd'.
+    LOG_COMPACT_THRESHOLD (int): Размер журнала упреждающей записи в байтах, после которого он сжимается в снимок.
+    LOG_FSYNC (bool): Сбрасывать ли каждую добавленную запись журнала на диск через fsync.
+    WRITE_BEHIND (bool): Сохраняет ли бэкенд 'local' изменения группами из фонового потока.
+    WRITE_BEHIND_INTERVAL_MS (int): Время в миллисекундах, за которое отложенная запись собирает изменения
+        в одно сохранение.
+    WRITE_BEHIND_MAX_OPERATIONS (int): Количество ожидающих операций, после которого отложенная запись сохраняет
+        без ожидания.
+    DURABLE_WRITES (bool): Ожидает ли изменение своего сохранения перед возвратом ответа.
+    PAGE_DEFAULT_LIMIT (int): Размер страницы, используемый, когда курсор передан без лимита.
+    PAGE_MAX_LIMIT (int): Наибольший размер страницы, который может запросить клиент.
+    SEARCH_DEFAULT_LIMIT (int): Количество результатов поиска, возвращаемых, если лимит не указан.
+    FREEBUSY_MAX_DAYS (int): Наибольшее окно времени запроса занятости в днях.
+    STREAM_CHUNK_SIZE (int): Количество событий, получаемых из хранилища за раз при потоковой выдаче списка.
+    RECURRENCE_HORIZON_DAYS (int): Количество дней после первого повторения, до которого разворачивается
+        повторяющаяся серия без COUNT и UNTIL.
+    BATCH_MAX_OPERATIONS (int): Наибольшее количество операций, принимаемых в одном пакетном запросе.
+    IMPORT_BATCH_SIZE (int): Количество импортируемых событий, сохраняемых в хранилище вместе.
+    IMPORT_MAX_ERRORS (int): Количество неудачных событий, о которых импорт сообщает подробно.
+    CHANGE_LOG_MAX_ENTRIES (int): Количество изменений, которое журнал ленты изменений хранит как минимум; клиенты,
+        отставшие сильнее, синхронизируют весь календарь заново.
+    SSE_QUEUE_SIZE (int): Количество изменений, ожидающих отправки одному подписчику потока SSE; подписчик,
+        отставший сильнее, вместо этого догоняет по журналу изменений.
+    SSE_HEARTBEAT_MS (int): Интервал в миллисекундах между комментариями поддержания соединения, отправляемыми
+        простаивающим подписчикам SSE; с той же частотой подхватываются изменения других процессов.
+    RESPONSE_CACHE_MAX_ENTRIES (int): Максимальное количество закодированных ответов в кэше ответов.
+    COMPRESS_MIN_SIZE (int): Наименьший размер тела ответа в байтах, который отправляется сжатым клиентам,
+        принимающим сжатие.
+    COMPRESS_ENCODINGS (tuple): Кодирования содержимого ответов в порядке предпочтения ('br' и 'gzip');
+        'br' пропускается, если пакет brotli не установлен.
+    ASYNC_READ_WORKERS (int): Количество потоков, которые асинхронный режим использует для чтения из хранилища.
+    METRICS (bool): Собираются ли время и счетчики операций и публикуются ли они на /metrics.
+    SERVER_TIMING (bool): Содержат ли ответы заголовок Server-Timing со временем, затраченным на каждом уровне.
+"""
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+STORAGE_BACKEND = os.environ.get('CALENDAR_STORAGE_BACKEND', 'local')
+DEFAULT_STORAGE_PATHS = {'local': 'storage.json', 'log': 'storage.json', 'sharded': 'storage_shards',
+                         'mapped': 'storage.map', 'sqlite': 'storage.db'}
+STORAGE_PATH = os.environ.get('CALENDAR_STORAGE_PATH', DEFAULT_STORAGE_PATHS.get(STORAGE_BACKEND, 'storage.json'))
+
+CALENDARS_PATH = os.environ.get('CALENDAR_CALENDARS_PATH', 'calendars')
+CALENDARS_MAX_OPEN = _env_int('CALENDAR_CALENDARS_MAX_OPEN', 64)
+
+STORAGE_CODEC = os.environ.get('CALENDAR_STORAGE_CODEC', 'json')
+STORAGE_COMPRESSION = os.environ.get('CALENDAR_STORAGE_COMPRESSION', 'none')
+
+LOG_COMPACT_THRESHOLD = _env_int('CALENDAR_LOG_COMPACT_THRESHOLD', 4 * 1024 * 1024)
+LOG_FSYNC = _env_bool('CALENDAR_LOG_FSYNC', False)
+
+WRITE_BEHIND = _env_bool('CALENDAR_WRITE_BEHIND', False)
+WRITE_BEHIND_INTERVAL_MS = _env_int('CALENDAR_WRITE_BEHIND_INTERVAL_MS', 20)
+WRITE_BEHIND_MAX_OPERATIONS = _env_int('CALENDAR_WRITE_BEHIND_MAX_OPERATIONS', 1000)
+DURABLE_WRITES = _env_bool('CALENDAR_DURABLE_WRITES', True)
+
+PAGE_DEFAULT_LIMIT = _env_int('CALENDAR_PAGE_DEFAULT_LIMIT', 100)
+PAGE_MAX_LIMIT = _env_int('CALENDAR_PAGE_MAX_LIMIT', 1000)
+STREAM_CHUNK_SIZE = _env_int('CALENDAR_STREAM_CHUNK_SIZE', 500)
+SEARCH_DEFAULT_LIMIT = _env_int('CALENDAR_SEARCH_DEFAULT_LIMIT', 50)
+FREEBUSY_MAX_DAYS = _env_int('CALENDAR_FREEBUSY_MAX_DAYS', 366)
+
+RECURRENCE_HORIZON_DAYS = _env_int('CALENDAR_RECURRENCE_HORIZON_DAYS', 10 * 366)
+
+BATCH_MAX_OPERATIONS = _env_int('CALENDAR_BATCH_MAX_OPERATIONS', 10000)
+IMPORT_BATCH_SIZE = _env_int('CALENDAR_IMPORT_BATCH_SIZE', 10000)
+IMPORT_MAX_ERRORS = _env_int('CALENDAR_IMPORT_MAX_ERRORS', 100)
+
+CHANGE_LOG_MAX_ENTRIES = _env_int('CALENDAR_CHANGE_LOG_MAX_ENTRIES', 10000)
+
+SSE_QUEUE_SIZE = _env_int('CALENDAR_SSE_QUEUE_SIZE', 1000)
+SSE_HEARTBEAT_MS = _env_int('CALENDAR_SSE_HEARTBEAT_MS', 15000)
+
+RESPONSE_CACHE_MAX_ENTRIES = _env_int('CALENDAR_RESPONSE_CACHE_MAX_ENTRIES', 10000)
+COMPRESS_MIN_SIZE = _env_int('CALENDAR_COMPRESS_MIN_SIZE', 1024)
+COMPRESS_ENCODINGS = tuple(encoding.strip() for encoding in
+                           os.environ.get('CALENDAR_COMPRESS_ENCODINGS', 'br,gzip').split(',') if encoding.strip())
+
+ASYNC_READ_WORKERS = _env_int('CALENDAR_ASYNC_READ_WORKERS', 8)
+
+METRICS = _env_bool('CALENDAR_METRICS', False)
+SERVER_TIMING = _env_bool('CALENDAR_SERVER_TIMING', False)
@@ -0,0 +1,71 @@
+"""
+<EN>
+Storage File Conversion Tool
+
+This script rewrites a storage file of the 'local' backend, or the snapshot of the 'log' backend, with another codec
+and compression. The current codec is detected from the content. The file is replaced atomically while the storage
+lock is held, so running services simply reload it.
+
+Usage:
+    python convert.py [--codec json|json-pretty|binary] [--compression none|gzip|zstd] [--output path] [source]
+Arguments:
+    --codec: Codec to write. Defaults to 'json'.
+    --compression: Compression to write. Defaults to 'none'.
+    --output: Path to write to instead of replacing the source file.
+    source: Path to the storage file. Defaults to 'storage.json'.
+"""
+"""
+<RUS>
+Инструмент преобразования файла хранилища
+
+Этот скрипт перезаписывает файл хранилища бэкенда 'local' или снимок бэкенда 'log' другим кодеком и сжатием.
+Текущий кодек определяется по содержимому. Файл заменяется атомарно при удерживаемой блокировке хранилища,
+поэтому работающие сервисы просто перезагружают его.
+
+Использование:
+    python convert.py [--codec json|json-pretty|binary] [--compression none|gzip|zstd] [--output path] [source]
+Аргументы:
+    --codec: Записываемый кодек. По умолчанию 'json'.
+    --compression: Записываемое сжатие. По умолчанию 'none'.
+    --output: Путь для записи вместо замены исходного файла.
+    source: Путь к файлу хранилища. По умолчанию 'storage.json'.
+"""
+
+import argparse
+import sys
+from codec import CODECS, COMPRESSIONS, check_format, decode_events, detect_format, encode_events
+from locks import FileLock
+from storage import _write_atomic
+
+
+def convert(source: str, target: str, codec: str, compression: str) -> int:
+    check_format(codec, compression)
+    with FileLock(f"{target}.lock").exclusive():
+        with open(source, 'rb') as file:
+            data = file.read()
+        events = decode_events(data)
+        encoded = encode_events(events, codec, compression)
+        _write_atomic(target, encoded)
+    print(f"{'/'.join(detect_format(data))} -> {codec}/{compression}: {len(data)} -> {len(encoded)} bytes")
+    return len(events)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rewrite a storage file with another codec and compression")
+    parser.add_argument('--codec', choices=CODECS, default='json', help="codec to write")
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='none', help="compression to write")
+    parser.add_argument('--output', help="path to write to instead of replacing the source file")
+    parser.add_argument('source', nargs='?', default='storage.json', help="storage file")
+    args = parser.parse_args(argv)
+    target = args.output or args.source
+    try:
+        count = convert(args.source, target, args.codec, args.compression)
+    except (OSError, ValueError) as ex:
+        print(f"Conversion failed: {ex}", file=sys.stderr)
+        return 1
+    print(f"Converted {count} events into {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,40 @@ The storage system is abstracted, and the specific implementation is provided by
 Classes:
     DBException: Custom exception class for database operation errors.
     EventDB: Class for managing events in the storage.
+    AsyncEventDB: Asynchronous variant of EventDB that runs storage calls in worker threads.
+
+Functions:
+    create_storage(backend: str, file_path: str): Create the storage instance for the configured backend.
 
 Methods:
-    __init__(): Initialize the EventDB with a storage instance.
-    create(event: Event) -> str: Create a new event in the storage.
+    __init__(backend: str = None, file_path: str = None): Initialize the EventDB with a storage instance.
+    create(event: Event, check_conflicts: bool = False) -> str: Create a new event in the storage, optionally only
+        if its time does not overlap other events; a conflict is raised as storage.ConflictException.
     list() -> List[Event]: List all events from the storage.
+    iter_stored(chunk_size: int) -> Iterator[Event]: Iterate over all stored events, series unexpanded, fetching
+        them from the storage a chunk at a time.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: List a page of events within a date
+        range, with the occurrences of series or, if expand is False, each series once.
     read(event_id: str) -> Event: Read a specific event from the storage.
+    exists(event_id: str) -> bool: Check whether an event exists without reading it.
     update(event_id: str, event: Event): Update an existing event in the storage.
+    add_exdate(event_id: str, day: str): Cancel one occurrence of a series atomically.
     delete(event_id: str): Delete a specific event from the storage.
+    search(query: str, limit: int) -> List[Event]: Find events by words of their title and text, best matches first.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Find the timed events overlapping a time window.
+    version() -> Version: Get the tag and modification time of the whole storage.
+    event_version(event_id: str) -> Optional[Version]: Get the tag and modification time of a single event.
+    changes(since: int, limit: int = None) -> ChangeSet: Get the events changed after a sequence number.
+    change_seq() -> Optional[int]: Get the number of the last change, or None if the storage keeps no change log.
+    add_listener(listener): Register a callback invoked with the IDs of changed events after every mutation.
+    remove_listener(listener): Unregister a callback registered with add_listener.
+    flush_future() -> Future: Get a future that completes once all changes made so far are persisted.
+    bulk_apply(operations) -> List[Optional[Exception]]: Apply many create/update/delete operations with one save.
+    bulk_create(events), bulk_update(events), bulk_delete(event_ids): Shortcuts for batches of a single operation.
+    stats() -> dict: Get the number of stored events and the size of the storage files in bytes.
+    close(): Persist pending changes and release the storage.
+    AsyncEventDB has the same methods as coroutines, flushed() to wait for flush_future() without blocking,
+    and close() to stop its worker threads.
 
 Exceptions:
     DBException: Raised for any errors occurring during database operations.
@@ -30,56 +56,317 @@ Exceptions:
 Классы:
     DBException: Пользовательский класс исключений для ошибок операций с базой данных.
     EventDB: Класс для управления событиями в хранилище.
+    AsyncEventDB: Асинхронный вариант EventDB, выполняющий обращения к хранилищу в рабочих потоках.
+
+Функции:
+    create_storage(backend: str, file_path: str): Создает экземпляр хранилища для настроенного бэкенда.
 
 Методы:
-    __init__(): Инициализирует EventDB с экземпляром хранилища.
-    create(event: Event) -> str: Создать новое событие в хранилище.
+    __init__(backend: str = None, file_path: str = None): Инициализирует EventDB с экземпляром хранилища.
+    create(event: Event, check_conflicts: bool = False) -> str: Создать новое событие в хранилище, при необходимости
+        только если его время не пересекается с другими событиями; конфликт передается как storage.ConflictException.
     list() -> List[Event]: Получить список всех событий из хранилища.
+    iter_stored(chunk_size: int) -> Iterator[Event]: Перебрать все сохраненные события, не разворачивая серии,
+        получая их из хранилища порциями.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: Получить страницу событий в диапазоне
+        дат с повторениями серий или, если expand равен False, каждой серией один раз.
     read(event_id: str) -> Event: Прочитать конкретное событие из хранилища.
+    exists(event_id: str) -> bool: Проверить существование события, не читая его.
     update(event_id: str, event: Event): Обновить существующее событие в хранилище.
+    add_exdate(event_id: str, day: str): Атомарно отменить одно повторение серии.
     delete(event_id: str): Удалить конкретное событие из хранилища.
+    search(query: str, limit: int) -> List[Event]: Найти события по словам заголовка и текста, лучшие совпадения первыми.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Найти события со временем, пересекающиеся с окном
+        времени.
+    version() -> Version: Получить тег и время изменения всего хранилища.
+    event_version(event_id: str) -> Optional[Version]: Получить тег и время изменения отдельного события.
+    changes(since: int, limit: int = None) -> ChangeSet: Получить события, измененные после номера последовательности.
+    change_seq() -> Optional[int]: Получить номер последнего изменения или None, если хранилище не ведет журнал
+        изменений.
+    add_listener(listener): Зарегистрировать функцию, вызываемую с ID измененных событий после каждого изменения.
+    remove_listener(listener): Отменить регистрацию функции, зарегистрированной через add_listener.
+    flush_future() -> Future: Получить future, который завершается, когда все сделанные изменения сохранены.
+    bulk_apply(operations) -> List[Optional[Exception]]: Применить множество операций создания/обновления/удаления
+        с одним сохранением.
+    bulk_create(events), bulk_update(events), bulk_delete(event_ids): Сокращения для пакетов из одной операции.
+    stats() -> dict: Получить количество сохраненных событий и размер файлов хранилища в байтах.
+    close(): Сохранить ожидающие изменения и освободить хранилище.
+    AsyncEventDB содержит те же методы в виде корутин, flushed() для ожидания flush_future() без блокировки
+    и close() для остановки своих рабочих потоков.
 
 Исключения:
     DBException: Возникает при любых ошибках операций с базой данных.
 """
 
-from typing import List
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Tuple
 from model import Event
+import config
+import metrics
+import mapped_storage
+import sharded_storage
+import sqlite_storage
 import storage
 
 class DBException(Exception):
     pass
 
+def create_storage(backend: str, file_path: str):
+    if backend == 'local':
+        return storage.LocalStorage(file_path, write_behind=config.WRITE_BEHIND,
+                                    flush_interval=config.WRITE_BEHIND_INTERVAL_MS / 1000,
+                                    flush_max_operations=config.WRITE_BEHIND_MAX_OPERATIONS,
+                                    codec=config.STORAGE_CODEC, compression=config.STORAGE_COMPRESSION,
+                                    change_log_entries=config.CHANGE_LOG_MAX_ENTRIES)
+    if backend == 'log':
+        return storage.LogStorage(file_path, compact_threshold=config.LOG_COMPACT_THRESHOLD, fsync=config.LOG_FSYNC,
+                                  codec=config.STORAGE_CODEC, compression=config.STORAGE_COMPRESSION,
+                                  change_log_entries=config.CHANGE_LOG_MAX_ENTRIES)
+    if backend == 'sharded':
+        return sharded_storage.ShardedStorage(file_path, change_log_entries=config.CHANGE_LOG_MAX_ENTRIES)
+    if backend == 'mapped':
+        return mapped_storage.MappedStorage(file_path, change_log_entries=config.CHANGE_LOG_MAX_ENTRIES)
+    if backend == 'sqlite':
+        return sqlite_storage.SQLiteStorage(file_path)
+    raise DBException(f"unknown storage backend: {backend}")
+
 class EventDB:
-    def __init__(self):
-        self._storage = storage.LocalStorage()
+    def __init__(self, backend: str = None, file_path: str = None):
+        self._storage = create_storage(backend or config.STORAGE_BACKEND, file_path or config.STORAGE_PATH)
 
-    def create(self, event: Event) -> str:
+    @metrics.timed('db', 'create')
+    def create(self, event: Event, check_conflicts: bool = False) -> str:
         try:
-            return self._storage.create(event)
+            return self._storage.create(event, check_conflicts)
+        except storage.ConflictException:
+            raise
         except Exception as ex:
             raise DBException(f"failed CREATE operation with: {ex}")
 
+    @metrics.timed('db', 'list')
     def list(self) -> List[Event]:
         try:
             return self._storage.list()
         except Exception as ex:
             raise DBException(f"failed LIST operation with: {ex}")
 
+    def iter_stored(self, chunk_size: int) -> Iterator[Event]:
+        try:
+            yield from self._storage.iter_stored(chunk_size)
+        except Exception as ex:
+            raise DBException(f"failed ITER operation with: {ex}")
+
+    @metrics.timed('db', 'list_range')
+    def list_range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+                   limit: Optional[int] = None, expand: bool = True) -> List[Event]:
+        try:
+            return self._storage.list_range(start, end, after, limit, expand)
+        except Exception as ex:
+            raise DBException(f"failed LIST RANGE operation with: {ex}")
+
+    @metrics.timed('db', 'read')
     def read(self, event_id: str) -> Event:
         try:
             return self._storage.read(event_id)
         except Exception as ex:
             raise DBException(f"failed READ operation with: {ex}")
 
+    @metrics.timed('db', 'exists')
+    def exists(self, event_id: str) -> bool:
+        try:
+            return self._storage.exists(event_id)
+        except Exception as ex:
+            raise DBException(f"failed EXISTS operation with: {ex}")
+
+    @metrics.timed('db', 'update')
     def update(self, event_id: str, event: Event):
         try:
             return self._storage.update(event_id, event)
         except Exception as ex:
             raise DBException(f"failed UPDATE operation with: {ex}")
 
+    @metrics.timed('db', 'add_exdate')
+    def add_exdate(self, event_id: str, day: str):
+        try:
+            return self._storage.add_exdate(event_id, day)
+        except Exception as ex:
+            raise DBException(f"failed ADD EXDATE operation with: {ex}")
+
+    @metrics.timed('db', 'delete')
     def delete(self, event_id: str):
         try:
             return self._storage.delete(event_id)
         except Exception as ex:
             raise DBException(f"failed DELETE operation with: {ex}")
+
+    @metrics.timed('db', 'search')
+    def search(self, query: str, limit: int) -> List[Event]:
+        try:
+            return self._storage.search(query, limit)
+        except Exception as ex:
+            raise DBException(f"failed SEARCH operation with: {ex}")
+
+    @metrics.timed('db', 'overlapping')
+    def overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        try:
+            return self._storage.overlapping(start, end)
+        except Exception as ex:
+            raise DBException(f"failed OVERLAPPING operation with: {ex}")
+
+    @metrics.timed('db', 'version')
+    def version(self) -> storage.Version:
+        try:
+            return self._storage.version()
+        except Exception as ex:
+            raise DBException(f"failed VERSION operation with: {ex}")
+
+    @metrics.timed('db', 'event_version')
+    def event_version(self, event_id: str) -> Optional[storage.Version]:
+        try:
+            return self._storage.event_version(event_id)
+        except Exception as ex:
+            raise DBException(f"failed VERSION operation with: {ex}")
+
+    @metrics.timed('db', 'changes')
+    def changes(self, since: int, limit: Optional[int] = None) -> storage.ChangeSet:
+        try:
+            return self._storage.changes(since, limit)
+        except Exception as ex:
+            raise DBException(f"failed CHANGES operation with: {ex}")
+
+    @metrics.timed('db', 'change_seq')
+    def change_seq(self) -> Optional[int]:
+        try:
+            return self._storage.change_seq()
+        except Exception as ex:
+            raise DBException(f"failed CHANGES operation with: {ex}")
+
+    def add_listener(self, listener):
+        self._storage.add_listener(listener)
+
+    def remove_listener(self, listener):
+        self._storage.remove_listener(listener)
+
+    def flush_future(self) -> Future:
+        return self._storage.flush_future()
+
+    @metrics.timed('db', 'bulk_apply')
+    def bulk_apply(self, operations: List[Tuple[str, str, Optional[Event]]]) -> List[Optional[Exception]]:
+        try:
+            return self._storage.apply_batch(operations)
+        except Exception as ex:
+            raise DBException(f"failed BULK operation with: {ex}")
+
+    def bulk_create(self, events: List[Event]) -> List[Optional[Exception]]:
+        return self.bulk_apply([('create', event.id, event) for event in events])
+
+    def bulk_update(self, events: List[Tuple[str, Event]]) -> List[Optional[Exception]]:
+        return self.bulk_apply([('update', event_id, event) for event_id, event in events])
+
+    def bulk_delete(self, event_ids: List[str]) -> List[Optional[Exception]]:
+        return self.bulk_apply([('delete', event_id, None) for event_id in event_ids])
+
+    def stats(self) -> dict:
+        try:
+            return self._storage.stats()
+        except Exception as ex:
+            raise DBException(f"failed STATS operation with: {ex}")
+
+    def close(self):
+        try:
+            self._storage.close()
+        except Exception as ex:
+            raise DBException(f"failed CLOSE operation with: {ex}")
+
+class AsyncEventDB:
+    def __init__(self, event_db: Optional[EventDB] = None, read_workers: Optional[int] = None):
+        """
+        <EN>
+        Initialize the AsyncEventDB on top of a synchronous EventDB. Reads run in a pool of threads, while all
+        mutations go through a single writer thread, so a slow save or fsync occupies only that thread and never
+        blocks the event loop.
+        Args:
+            event_db (EventDB): The database to use; a new one is created if not given.
+            read_workers (int): Number of reader threads. Defaults to config.ASYNC_READ_WORKERS.
+        """
+        """
+        <RUS>
+        Инициализирует AsyncEventDB поверх синхронного EventDB. Чтения выполняются в пуле потоков, а все изменения
+        проходят через один поток записи, поэтому медленное сохранение или fsync занимает только этот поток
+        и никогда не блокирует цикл событий.
+        Аргументы:
+            event_db (EventDB): Используемая база данных; если не передана, создается новая.
+            read_workers (int): Количество потоков чтения. По умолчанию config.ASYNC_READ_WORKERS.
+        """
+        self._event_db = event_db or EventDB()
+        self._reader = ThreadPoolExecutor(max_workers=read_workers or config.ASYNC_READ_WORKERS,
+                                          thread_name_prefix='calendar-read')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='calendar-write')
+
+    async def _read(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._reader, function, *args)
+
+    async def _write(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, function, *args)
+
+    async def create(self, event: Event, check_conflicts: bool = False) -> str:
+        return await self._write(self._event_db.create, event, check_conflicts)
+
+    async def list(self) -> List[Event]:
+        return await self._read(self._event_db.list)
+
+    async def list_range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+                         limit: Optional[int] = None, expand: bool = True) -> List[Event]:
+        return await self._read(self._event_db.list_range, start, end, after, limit, expand)
+
+    async def read(self, event_id: str) -> Event:
+        return await self._read(self._event_db.read, event_id)
+
+    async def exists(self, event_id: str) -> bool:
+        return await self._read(self._event_db.exists, event_id)
+
+    async def update(self, event_id: str, event: Event):
+        return await self._write(self._event_db.update, event_id, event)
+
+    async def delete(self, event_id: str):
+        return await self._write(self._event_db.delete, event_id)
+
+    async def version(self) -> storage.Version:
+        return await self._read(self._event_db.version)
+
+    async def event_version(self, event_id: str) -> Optional[storage.Version]:
+        return await self._read(self._event_db.event_version, event_id)
+
+    async def changes(self, since: int, limit: Optional[int] = None) -> storage.ChangeSet:
+        return await self._read(self._event_db.changes, since, limit)
+
+    async def change_seq(self) -> Optional[int]:
+        return await self._read(self._event_db.change_seq)
+
+    def add_listener(self, listener):
+        self._event_db.add_listener(listener)
+
+    def remove_listener(self, listener):
+        self._event_db.remove_listener(listener)
+
+    async def flushed(self):
+        # Waiting happens on the event loop, so the writer thread keeps applying mutations that join the same flush.
+        await asyncio.wrap_future(self._event_db.flush_future())
+
+    async def bulk_apply(self, operations: List[Tuple[str, str, Optional[Event]]]) -> List[Optional[Exception]]:
+        return await self._write(self._event_db.bulk_apply, operations)
+
+    async def bulk_create(self, events: List[Event]) -> List[Optional[Exception]]:
+        return await self.bulk_apply([('create', event.id, event) for event in events])
+
+    async def bulk_update(self, events: List[Tuple[str, Event]]) -> List[Optional[Exception]]:
+        return await self.bulk_apply([('update', event_id, event) for event_id, event in events])
+
+    async def bulk_delete(self, event_ids: List[str]) -> List[Optional[Exception]]:
+        return await self.bulk_apply([('delete', event_id, None) for event_id in event_ids])
+
+    def close(self):
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
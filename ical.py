@@ -0,0 +1,351 @@
+"""
+<EN>
+iCalendar Import and Export
+
+This module converts events to and from the iCalendar format (RFC 5545). Both directions stream: export renders one
+VEVENT at a time from an iterable of events, and import parses an iterable of byte chunks line by line and yields
+every VEVENT as soon as its END line is read, so neither side keeps a whole calendar in memory.
+
+Mapping:
+    UID - the event ID on export; imported events get new IDs.
+    DTSTART;VALUE=DATE - the date of an all-day event. DTSTART with DTEND or DURATION as date-times - the start and
+        end of a timed event, whose date is the date of its start. Times are taken as the local wall time of the
+        calendar: TZID and the UTC suffix Z are dropped. A date-time DTSTART without an end imports as a date only.
+    SUMMARY, DESCRIPTION - the title and text. RRULE, EXDATE - the recurrence rule and cancelled occurrences.
+    Components nested in a VEVENT (VALARM) and other top-level components (VTIMEZONE, VTODO) are skipped.
+    A VEVENT with RECURRENCE-ID, which overrides one occurrence of a series, is not supported and reported as an error.
+
+Classes:
+    ICalException: Custom exception class for iCalendar data that cannot be imported.
+
+Functions:
+    serialize_calendar(events: Iterable[Event]) -> Iterator[str]: Render events as an iCalendar stream.
+    parse_calendar(chunks: Iterable[bytes], make_id: Callable[[], str]) -> Iterator[Union[Event, ICalException]]:
+        Parse an iCalendar stream into events.
+"""
+"""
+<RUS>
+Импорт и экспорт iCalendar
+
+Этот модуль преобразует события в формат iCalendar (RFC 5545) и обратно. Оба направления потоковые: экспорт выводит
+по одному VEVENT из перебираемых событий, а импорт разбирает перебираемые порции байтов построчно и выдает каждый
+VEVENT сразу после чтения его строки END, поэтому ни одна из сторон не держит в памяти весь календарь.
+
+Соответствие:
+    UID - ID события при экспорте; импортированные события получают новые ID.
+    DTSTART;VALUE=DATE - дата события на весь день. DTSTART с DTEND или DURATION в виде даты и времени - начало
+        и окончание события со временем, дата которого - дата его начала. Время берется как местное время календаря:
+        TZID и суффикс UTC Z отбрасываются. DTSTART с датой и временем без окончания импортируется только как дата.
+    SUMMARY, DESCRIPTION - заголовок и текст. RRULE, EXDATE - правило повторения и отмененные повторения.
+    Вложенные в VEVENT компоненты (VALARM) и другие компоненты верхнего уровня (VTIMEZONE, VTODO) пропускаются.
+    VEVENT с RECURRENCE-ID, переопределяющий одно повторение серии, не поддерживается, и о нем сообщается как об ошибке.
+
+Классы:
+    ICalException: Пользовательский класс исключений для данных iCalendar, которые нельзя импортировать.
+
+Функции:
+    serialize_calendar(events: Iterable[Event]) -> Iterator[str]: Выводит события в виде потока iCalendar.
+    parse_calendar(chunks: Iterable[bytes], make_id: Callable[[], str]) -> Iterator[Union[Event, ICalException]]:
+        Разбирает поток iCalendar в события.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+from model import Event, parse_datetime
+
+_PRODID = '-//Calendar API//RU'
+_MOMENT_RE = re.compile(r'\d{8}(?:T\d{6}Z?)?')
+_DURATION_RE = re.compile(r'([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+_UNTIL_RE = re.compile(r'UNTIL=(\d{4})-?(\d{2})-?(\d{2})(?:T\d{6}Z?)?', re.IGNORECASE)
+_UNESCAPE_RE = re.compile(r'\\(.)')
+_UNESCAPED = {'n': '\n', 'N': '\n'}
+# Only the properties an event is built from are kept; repeated ones other than EXDATE keep their first value.
+_PROPERTIES = frozenset(('UID', 'DTSTART', 'DTEND', 'DURATION', 'SUMMARY', 'DESCRIPTION', 'RRULE', 'RECURRENCE-ID'))
+
+
+class ICalException(Exception):
+    pass
+
+
+def serialize_calendar(events: Iterable[Event]) -> Iterator[str]:
+    """
+    <EN>
+    Render events as an iCalendar stream: the VCALENDAR header, one VEVENT per event and the footer, each yielded
+    as soon as it is rendered. A series is rendered once with its RRULE and EXDATE. Lines are folded at 75 octets.
+
+    Args:
+        events (Iterable[Event]): The events, typically read from storage a chunk at a time.
+
+    Yields:
+        str: Parts of the stream with CRLF line endings.
+    """
+    """
+    <RUS>
+    Выводит события в виде потока iCalendar: заголовок VCALENDAR, по одному VEVENT на событие и завершение, каждую
+    часть сразу после ее формирования. Серия выводится один раз вместе с RRULE и EXDATE. Строки переносятся
+    по 75 октетов.
+
+    Аргументы:
+        events (Iterable[Event]): События, обычно читаемые из хранилища порциями.
+
+    Порождает:
+        str: Части потока с окончаниями строк CRLF.
+    """
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{_PRODID}\r\nCALSCALE:GREGORIAN\r\n"
+    for event in events:
+        yield _serialize_event(event, stamp)
+    yield "END:VCALENDAR\r\n"
+
+
+def _serialize_event(event: Event, stamp: str) -> str:
+    lines = ["BEGIN:VEVENT", f"UID:{_escape(event.id)}", f"DTSTAMP:{stamp}"]
+    if event.start is None:
+        lines.append(f"DTSTART;VALUE=DATE:{event.date.replace('-', '')}")
+    else:
+        lines.append(f"DTSTART:{_ics_datetime(event.start)}")
+        lines.append(f"DTEND:{_ics_datetime(event.end)}")
+    if event.rrule is not None:
+        rule = event.rrule[6:] if event.rrule[:6].upper() == 'RRULE:' else event.rrule
+        # The stored UNTIL is an inclusive date; a timed series needs a date-time UNTIL of the same kind as DTSTART.
+        until = 'T235959' if event.start is not None else ''
+        lines.append(f"RRULE:{_UNTIL_RE.sub(lambda match: f'UNTIL={match[1]}{match[2]}{match[3]}{until}', rule)}")
+    if event.exdates:
+        days = [day.replace('-', '') for day in event.exdates]
+        if event.start is None:
+            lines.append(f"EXDATE;VALUE=DATE:{','.join(days)}")
+        else:
+            time_of_day = _ics_datetime(event.start)[8:]
+            lines.append(f"EXDATE:{','.join(day + time_of_day for day in days)}")
+    lines.append(f"SUMMARY:{_escape(event.title)}")
+    if event.text:
+        lines.append(f"DESCRIPTION:{_escape(event.text)}")
+    lines.append("END:VEVENT")
+    return ''.join(_fold(line) for line in lines)
+
+
+def _ics_datetime(value: str) -> str:
+    digits = value.replace('-', '').replace(':', '')
+    return digits if len(digits) == 15 else digits + '00'
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def _fold(line: str) -> str:
+    if len(line) <= 75 and line.isascii():
+        return line + '\r\n'
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    position = 0
+    limit = 75
+    while position < len(data):
+        end = min(position + limit, len(data))
+        # A fold never splits a multi-byte character.
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[position:end].decode('utf-8'))
+        position = end
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def parse_calendar(chunks: Iterable[bytes], make_id: Callable[[], str]) -> Iterator[Union[Event, ICalException]]:
+    """
+    <EN>
+    Parse an iCalendar stream incrementally. Every VEVENT is yielded once its END line is read, either as an event
+    or, if it cannot be converted, as an ICalException describing why, so one bad component does not stop the import.
+    The events are not validated beyond their format; that is left to EventLogic.
+
+    Args:
+        chunks (Iterable[bytes]): The stream in chunks of any size, for example as read from a request body.
+        make_id (Callable[[], str]): Function returning the ID of every imported event.
+
+    Yields:
+        Union[Event, ICalException]: The events, or the errors of the VEVENTs that could not be converted, in the order
+            of the stream.
+
+    Raises:
+        ICalException: If the stream does not begin with BEGIN:VCALENDAR; nothing is yielded then.
+    """
+    """
+    <RUS>
+    Разбирает поток iCalendar по мере чтения. Каждый VEVENT выдается после чтения его строки END — как событие или,
+    если его нельзя преобразовать, как ICalException с описанием причины, поэтому один неверный компонент
+    не останавливает импорт. События проверяются только на формат; остальное оставлено EventLogic.
+
+    Аргументы:
+        chunks (Iterable[bytes]): Поток порциями любого размера, например в том виде, в котором он читается
+            из тела запроса.
+        make_id (Callable[[], str]): Функция, возвращающая ID каждого импортированного события.
+
+    Порождает:
+        Union[Event, ICalException]: События или ошибки VEVENT, которые не удалось преобразовать, в порядке потока.
+
+    Вызывает:
+        ICalException: Если поток не начинается с BEGIN:VCALENDAR; тогда ничего не выдается.
+    """
+    lines = _content_lines(chunks)
+    first = next(lines, None)
+    if first is None or first.strip().upper() != 'BEGIN:VCALENDAR':
+        raise ICalException("Данные не являются календарем iCalendar, ожидается BEGIN:VCALENDAR")
+    properties = None
+    exdates = []
+    error = None
+    nested = 0
+    for line in lines:
+        if line is None:
+            # An undecodable line spoils only the component it belongs to.
+            if properties is not None and error is None:
+                error = ICalException("Строка события не в кодировке UTF-8")
+            continue
+        colon = _value_start(line)
+        if colon == -1:
+            if properties is not None and error is None and line.strip():
+                error = ICalException("Неверная строка события, ожидается ИМЯ:ЗНАЧЕНИЕ")
+            continue
+        semicolon = line.find(';', 0, colon)
+        name = line[:colon if semicolon == -1 else semicolon].strip().upper()
+        value = line[colon + 1:]
+        if name == 'BEGIN':
+            if properties is None:
+                if value.strip().upper() == 'VEVENT':
+                    properties, exdates, error, nested = {}, [], None, 0
+            else:
+                nested += 1
+        elif name == 'END':
+            if properties is None:
+                if value.strip().upper() == 'VCALENDAR':
+                    return
+            elif nested:
+                nested -= 1
+            else:
+                if error is None:
+                    try:
+                        yield _to_event(properties, exdates, make_id)
+                    except ICalException as ex:
+                        yield ex
+                else:
+                    yield error
+                properties = None
+        elif properties is not None and not nested:
+            if name == 'EXDATE':
+                exdates.extend(value.split(','))
+            elif name in _PROPERTIES and name not in properties:
+                properties[name] = value
+    if properties is not None:
+        yield ICalException("Событие не завершено строкой END:VEVENT")
+
+
+def _content_lines(chunks: Iterable[bytes]) -> Iterator[Optional[str]]:
+    # Unfolds physical lines into content lines and decodes them; an undecodable line is yielded as None.
+    tail = b''
+    logical = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        physical = (tail + chunk).split(b'\n')
+        tail = physical.pop()
+        for line in physical:
+            if line[:1] in (b' ', b'\t'):
+                logical.append(line[1:].rstrip(b'\r'))
+                continue
+            if logical:
+                yield _decode(logical)
+            logical = [line.rstrip(b'\r')]
+    if tail:
+        if tail[:1] in (b' ', b'\t'):
+            logical.append(tail[1:].rstrip(b'\r'))
+        else:
+            if logical:
+                yield _decode(logical)
+            logical = [tail.rstrip(b'\r')]
+    if logical:
+        yield _decode(logical)
+
+
+def _decode(parts: List[bytes]) -> Optional[str]:
+    try:
+        return (parts[0] if len(parts) == 1 else b''.join(parts)).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+
+def _value_start(line: str) -> int:
+    # The value starts after the first colon outside the double-quoted parameter values.
+    colon = line.find(':')
+    quote = line.find('"', 0, colon) if colon != -1 else line.find('"')
+    if quote == -1:
+        return colon
+    quoted = False
+    for position in range(quote, len(line)):
+        character = line[position]
+        if character == '"':
+            quoted = not quoted
+        elif character == ':' and not quoted:
+            return position
+    return -1
+
+
+def _to_event(properties: Dict[str, str], exdates: List[str], make_id: Callable[[], str]) -> Event:
+    if 'RECURRENCE-ID' in properties:
+        raise ICalException("Измененные повторения серии (RECURRENCE-ID) не поддерживаются")
+    if 'DTSTART' not in properties:
+        raise ICalException("Событие без DTSTART")
+    day, start = _parse_moment(properties['DTSTART'], 'DTSTART')
+    end = None
+    if start is not None:
+        if 'DTEND' in properties:
+            end_day, end = _parse_moment(properties['DTEND'], 'DTEND')
+            if end is None:
+                end = f"{end_day}T00:00"
+        elif 'DURATION' in properties:
+            try:
+                moment = parse_datetime(start) + _parse_duration(properties['DURATION'])
+                end = moment.isoformat(timespec='minutes' if moment.second == 0 else 'seconds')
+            except (ValueError, OverflowError):
+                raise ICalException("Неверное значение DURATION")
+        if end is None:
+            start = None
+    rrule = properties.get('RRULE')
+    exdate_days = []
+    for value in exdates:
+        value = value.strip()
+        if not _MOMENT_RE.fullmatch(value):
+            raise ICalException("Неверное значение EXDATE")
+        exdate_days.append(f"{value[:4]}-{value[4:6]}-{value[6:8]}")
+    return Event(id=make_id(), date=day, title=_unescape(properties.get('SUMMARY', '')),
+                 text=_unescape(properties.get('DESCRIPTION', '')), rrule=rrule.strip() if rrule else None,
+                 exdates=tuple(exdate_days), start=start, end=end)
+
+
+def _parse_moment(value: str, name: str):
+    # Returns the date and, for a date-time, the start or end in the YYYY-MM-DDTHH:MM[:SS] format of the model.
+    value = value.strip()
+    if not _MOMENT_RE.fullmatch(value):
+        raise ICalException(f"Неверное значение {name}, ожидается дата или дата и время")
+    day = f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+    if len(value) == 8:
+        return day, None
+    seconds = value[13:15]
+    return day, f"{day}T{value[9:11]}:{value[11:13]}" + (f":{seconds}" if seconds != '00' else '')
+
+
+def _parse_duration(value: str) -> timedelta:
+    match = _DURATION_RE.fullmatch(value.strip().upper())
+    if match is None or not any(match.groups()[1:]):
+        raise ValueError(f"invalid duration {value!r}")
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups()[1:])
+    duration = timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+    return -duration if match[1] == '-' else duration
+
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return _UNESCAPE_RE.sub(lambda match: _UNESCAPED.get(match[1], match[1]), value)
@@ -0,0 +1,933 @@
+"""
+<EN>
+In-Memory Indexes for Event Storage
+
+This module provides secondary indexes that the storage layer maintains next to its main dictionary of events,
+so that queries other than a lookup by ID do not have to scan every stored event.
+
+Classes:
+    DateIndex: Sorted index of event IDs by event date, answering date range queries with binary search.
+    TextIndex: Inverted index of the words of event titles and texts, answering ranked prefix searches.
+    SeriesIndex: Index of recurring series, answering date range queries with their lazily expanded occurrences.
+    IntervalIndex: Interval tree of the start and end times of timed events, answering overlap queries.
+
+Functions:
+    tokenize(text: str) -> List[str]: Split a text into case-folded words.
+
+Methods:
+    DateIndex.add(event_id: str, day: date): Add an event to the index or move it to a new date.
+    DateIndex.add_many(entries): Add many (event_id, day) pairs, merging them into the index in one pass.
+    DateIndex.remove(event_id: str): Remove an event from the index.
+    DateIndex.range(start: date, end: date, after=None, limit=None) -> List[str]: IDs of events within the date range,
+        ordered by date, optionally starting after a given key and limited in number.
+    DateIndex.keys(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: Like range(), but returns
+        the (date, event_id) keys.
+    DateIndex.rebuild(entries): Replace the content of the index with the given (date, event_id) pairs.
+    DateIndex.clear(): Remove all events from the index.
+    TextIndex.add(event_id: str, title: str, text: str): Index the words of an event, replacing its previous words.
+    TextIndex.add_many(entries): Index the words of many (event_id, title, text) triples at once.
+    TextIndex.remove(event_id: str): Remove an event from the index.
+    TextIndex.search(query: str, limit: int) -> List[str]: IDs of events containing every query word as a word prefix,
+        best matches first.
+    TextIndex.rebuild(entries): Replace the content of the index with the given (event_id, title, text) triples.
+    SeriesIndex.add(event_id: str, first: date, rule: Rule, exdates): Add a series to the index or replace it.
+    SeriesIndex.remove(event_id: str): Remove a series from the index.
+    SeriesIndex.range(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: (date, event_id)
+        keys of the occurrences within the date range, ordered like DateIndex keys.
+    SeriesIndex.firsts(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: (first date,
+        event_id) keys of the series starting within the date range, ordered like DateIndex keys.
+    SeriesIndex.rebuild(entries): Replace the content of the index with the given (event_id, first, rule, exdates)
+        entries.
+    IntervalIndex.add(event_id: str, start: datetime, end: datetime): Add an event to the index or move it to a new
+        interval.
+    IntervalIndex.remove(event_id: str): Remove an event from the index.
+    IntervalIndex.overlapping(start: datetime, end: datetime) -> List[Tuple[datetime, str]]: (start, event_id) keys
+        of the events whose interval overlaps the given one, ordered by start.
+    IntervalIndex.rebuild(entries): Replace the content of the index with the given (event_id, start, end) entries.
+"""
+"""
+<RUS>
+Индексы в памяти для хранилища событий
+
+Этот модуль предоставляет вторичные индексы, которые слой хранения поддерживает рядом с основным словарем событий,
+чтобы запросам, отличным от поиска по ID, не приходилось просматривать все сохраненные события.
+
+Классы:
+    DateIndex: Отсортированный индекс ID событий по дате, отвечающий на запросы по диапазону дат двоичным поиском.
+    TextIndex: Инвертированный индекс слов заголовков и текстов событий, отвечающий на ранжированный поиск по префиксам.
+    SeriesIndex: Индекс повторяющихся серий, отвечающий на запросы по диапазону дат лениво развернутыми повторениями.
+    IntervalIndex: Дерево интервалов времени начала и окончания событий со временем, отвечающее на запросы пересечений.
+
+Функции:
+    tokenize(text: str) -> List[str]: Разбивает текст на слова, приведенные к одному регистру.
+
+Методы:
+    DateIndex.add(event_id: str, day: date): Добавляет событие в индекс или переносит его на новую дату.
+    DateIndex.add_many(entries): Добавляет много пар (event_id, дата), объединяя их с индексом за один проход.
+    DateIndex.remove(event_id: str): Удаляет событие из индекса.
+    DateIndex.range(start: date, end: date, after=None, limit=None) -> List[str]: ID событий в диапазоне дат,
+        упорядоченные по дате, при необходимости начиная после заданного ключа и с ограничением количества.
+    DateIndex.keys(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: Как range(), но возвращает
+        ключи (дата, event_id).
+    DateIndex.rebuild(entries): Заменяет содержимое индекса переданными парами (дата, event_id).
+    DateIndex.clear(): Удаляет все события из индекса.
+    TextIndex.add(event_id: str, title: str, text: str): Индексирует слова события, заменяя его прежние слова.
+    TextIndex.add_many(entries): Индексирует слова многих троек (event_id, заголовок, текст) сразу.
+    TextIndex.remove(event_id: str): Удаляет событие из индекса.
+    TextIndex.search(query: str, limit: int) -> List[str]: ID событий, содержащих каждое слово запроса как префикс слова,
+        лучшие совпадения первыми.
+    TextIndex.rebuild(entries): Заменяет содержимое индекса переданными тройками (event_id, заголовок, текст).
+    SeriesIndex.add(event_id: str, first: date, rule: Rule, exdates): Добавляет серию в индекс или заменяет ее.
+    SeriesIndex.remove(event_id: str): Удаляет серию из индекса.
+    SeriesIndex.range(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: Ключи (дата, event_id)
+        повторений в диапазоне дат, упорядоченные так же, как ключи DateIndex.
+    SeriesIndex.firsts(start: date, end: date, after=None, limit=None) -> List[Tuple[date, str]]: Ключи (первая дата,
+        event_id) серий, начинающихся в диапазоне дат, упорядоченные так же, как ключи DateIndex.
+    SeriesIndex.rebuild(entries): Заменяет содержимое индекса переданными записями (event_id, первая дата, правило,
+        исключения).
+    IntervalIndex.add(event_id: str, start: datetime, end: datetime): Добавляет событие в индекс или переносит его
+        на новый интервал.
+    IntervalIndex.remove(event_id: str): Удаляет событие из индекса.
+    IntervalIndex.overlapping(start: datetime, end: datetime) -> List[Tuple[datetime, str]]: Ключи (начало, event_id)
+        событий, интервал которых пересекается с заданным, упорядоченные по началу.
+    IntervalIndex.rebuild(entries): Заменяет содержимое индекса переданными записями (event_id, начало, окончание).
+"""
+
+import heapq
+import math
+import random
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import dropwhile, islice
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+from recurrence import Rule, last_occurrence, occurrences
+
+_WORD_RE = re.compile(r'\w+')
+# BM25 term frequency saturation and length normalization.
+_K1 = 1.2
+_B = 0.75
+# Largest number of vocabulary words a single query prefix expands to.
+_MAX_EXPANSIONS = 64
+# Keys per bucket of the date index; a bucket twice as large is split in two.
+_BUCKET_SIZE = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    # Case folding covers Cyrillic as well; 'ё' is folded to 'е' because Russian texts use them interchangeably.
+    return _WORD_RE.findall(text.casefold().replace('ё', 'е'))
+
+
+def _insert_sorted(items: list, new_items: list):
+    # Inserting shifts the items after the insertion point, so past a few new items it is cheaper to append them all
+    # and sort once: Timsort finds the existing items already in order and merges the sorted new ones into them.
+    if len(new_items) * 64 < len(items):
+        for item in new_items:
+            insort(items, item)
+    else:
+        items.extend(new_items)
+        items.sort()
+
+
+class _SortedKeys:
+    # Sorted keys kept in buckets of at most 2 * _BUCKET_SIZE keys, found by binary search over the largest key of
+    # every bucket. An insertion or deletion only shifts the keys of one bucket and, when a bucket is split or
+    # emptied, the short list of buckets, so writes stay fast however many keys there are.
+    __slots__ = ('_buckets', '_maxes', '_len')
+
+    def __init__(self, keys: Iterable = ()):
+        self._buckets = []
+        self._maxes = []
+        self._len = 0
+        self._fill(sorted(keys))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def _fill(self, keys: list):
+        self._buckets = [keys[start:start + _BUCKET_SIZE] for start in range(0, len(keys), _BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+
+    def add(self, key):
+        if not self._buckets:
+            self._fill([key])
+            return
+        index = bisect_left(self._maxes, key)
+        if index == len(self._buckets):
+            index -= 1
+            self._buckets[index].append(key)
+            self._maxes[index] = key
+        else:
+            insort(self._buckets[index], key)
+        self._len += 1
+        bucket = self._buckets[index]
+        if len(bucket) > 2 * _BUCKET_SIZE:
+            self._buckets[index:index + 1] = [bucket[:_BUCKET_SIZE], bucket[_BUCKET_SIZE:]]
+            self._maxes[index:index + 1] = [bucket[_BUCKET_SIZE - 1], bucket[-1]]
+
+    def update(self, keys: list):
+        # Past a few keys, all of them are merged at once, like _insert_sorted does for a flat list.
+        if len(keys) * 64 < self._len:
+            for key in keys:
+                self.add(key)
+        else:
+            merged = list(self)
+            merged.extend(keys)
+            merged.sort()
+            self._fill(merged)
+
+    def remove(self, key):
+        index = bisect_left(self._maxes, key)
+        bucket = self._buckets[index]
+        del bucket[bisect_left(bucket, key)]
+        self._len -= 1
+        if not bucket:
+            del self._buckets[index]
+            del self._maxes[index]
+        else:
+            self._maxes[index] = bucket[-1]
+
+    def _position(self, key, right: bool = False) -> Tuple[int, int]:
+        # (bucket, offset) of the first key not below the given one, or above it if right is True.
+        find = bisect_right if right else bisect_left
+        index = find(self._maxes, key)
+        if index == len(self._buckets):
+            return index, 0
+        return index, find(self._buckets[index], key)
+
+    def between(self, low, high, after=None, limit: Optional[int] = None) -> list:
+        # Keys from low inclusive to high exclusive, or to the end if high is None, that are above after.
+        start = self._position(low)
+        if after is not None:
+            start = max(start, self._position(after, right=True))
+        stop = self._position(high) if high is not None else (len(self._buckets), 0)
+        result = []
+        index, offset = start
+        while (index, offset) < stop and (limit is None or len(result) < limit):
+            bucket = self._buckets[index]
+            end = stop[1] if index == stop[0] else len(bucket)
+            if limit is not None:
+                end = min(end, offset + limit - len(result))
+            result.extend(bucket[offset:end])
+            index, offset = index + 1, 0
+        return result
+
+
+class DateIndex:
+    def __init__(self):
+        """
+        <EN>
+        Initialize an empty index. Entries are (date, event_id) tuples kept in sorted order,
+        so events of the same day are additionally ordered by ID. They are stored in bounded buckets, so adding
+        or removing an event costs O(log n) comparisons and moves at most a bucket of keys.
+        """
+        """
+        <RUS>
+        Инициализирует пустой индекс. Записи — кортежи (дата, event_id), хранящиеся в отсортированном порядке,
+        поэтому события одного дня дополнительно упорядочены по ID. Они хранятся в ограниченных блоках, поэтому
+        добавление или удаление события стоит O(log n) сравнений и сдвигает не больше одного блока ключей.
+        """
+        self._keys = _SortedKeys()
+        self._key_by_id = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, event_id: str, day: date):
+        """
+        <EN>
+        Add an event to the index. If the event is already indexed, it is moved to the new date.
+        Args:
+            event_id (str): The ID of the event.
+            day (date): The parsed date of the event.
+        """
+        """
+        <RUS>
+        Добавляет событие в индекс. Если событие уже проиндексировано, оно переносится на новую дату.
+        Аргументы:
+            event_id (str): ID события.
+            day (date): Разобранная дата события.
+        """
+        self.add_many(((event_id, day),))
+
+    def add_many(self, entries: Iterable[Tuple[str, date]]):
+        """
+        <EN>
+        Add many events to the index at once. A few keys are inserted one by one; more keys are sorted together
+        and merged into the index in one pass, so a large batch costs O(n + k log k).
+        Args:
+            entries (Iterable[Tuple[str, date]]): (event_id, day) pairs; of repeated IDs the last one is kept.
+        """
+        """
+        <RUS>
+        Добавляет в индекс сразу много событий. Немногие ключи вставляются по одному; большее число ключей
+        сортируется вместе и объединяется с индексом за один проход, поэтому большой пакет стоит O(n + k log k).
+        Аргументы:
+            entries (Iterable[Tuple[str, date]]): Пары (event_id, дата); из повторяющихся ID сохраняется последний.
+        """
+        keys = []
+        for event_id, day in dict(entries).items():
+            self.remove(event_id)
+            key = self._key_by_id[event_id] = (day, event_id)
+            keys.append(key)
+        self._keys.update(keys)
+
+    def remove(self, event_id: str):
+        """
+        <EN>
+        Remove an event from the index. Unknown IDs are ignored.
+        Args:
+            event_id (str): The ID of the event.
+        """
+        """
+        <RUS>
+        Удаляет событие из индекса. Неизвестные ID игнорируются.
+        Аргументы:
+            event_id (str): ID события.
+        """
+        key = self._key_by_id.pop(event_id, None)
+        if key is not None:
+            self._keys.remove(key)
+
+    def range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+              limit: Optional[int] = None) -> List[str]:
+        """
+        <EN>
+        Find events within a date range in O(log n + k).
+        Args:
+            start (date): First day of the range, inclusive.
+            end (date): Last day of the range, inclusive.
+            after (Tuple[date, str]): Optional (date, event_id) key; only events ordered after it are returned.
+            limit (int): Optional maximum number of IDs to return.
+        Returns:
+            List[str]: IDs of the matching events ordered by date and ID.
+        """
+        """
+        <RUS>
+        Находит события в диапазоне дат за O(log n + k).
+        Аргументы:
+            start (date): Первый день диапазона включительно.
+            end (date): Последний день диапазона включительно.
+            after (Tuple[date, str]): Необязательный ключ (дата, event_id); возвращаются только события после него.
+            limit (int): Необязательное максимальное количество возвращаемых ID.
+        Возвращает:
+            List[str]: ID подходящих событий, упорядоченные по дате и ID.
+        """
+        return [event_id for _, event_id in self.keys(start, end, after, limit)]
+
+    def keys(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+             limit: Optional[int] = None) -> List[Tuple[date, str]]:
+        """
+        <EN>
+        Find events within a date range like range(), returning their (date, event_id) keys, so the result can be
+        merged with other sources ordered the same way.
+        """
+        """
+        <RUS>
+        Находит события в диапазоне дат, как range(), возвращая их ключи (дата, event_id), чтобы результат можно было
+        объединить с другими источниками, упорядоченными так же.
+        """
+        return self._keys.between((start,), (end + timedelta(days=1),) if end < date.max else None, after, limit)
+
+    def rebuild(self, entries: Iterable[Tuple[date, str]]):
+        """
+        <EN>
+        Replace the content of the index with the given entries, sorting them once instead of inserting one by one.
+        Args:
+            entries (Iterable[Tuple[date, str]]): (date, event_id) pairs.
+        """
+        """
+        <RUS>
+        Заменяет содержимое индекса переданными записями, сортируя их один раз вместо вставки по одной.
+        Аргументы:
+            entries (Iterable[Tuple[date, str]]): Пары (дата, event_id).
+        """
+        self._keys = _SortedKeys(entries)
+        self._key_by_id = {key[1]: key for key in self._keys}
+
+    def clear(self):
+        """
+        <EN>
+        Remove all events from the index.
+        """
+        """
+        <RUS>
+        Удаляет все события из индекса.
+        """
+        self._keys = _SortedKeys()
+        self._key_by_id = {}
+
+
+class TextIndex:
+    def __init__(self, title_weight: float = 2.0, text_weight: float = 1.0):
+        """
+        <EN>
+        Initialize an empty index. Every word maps to the events containing it together with the weighted number of
+        occurrences, and the vocabulary is kept sorted, so the words starting with a prefix are found by binary search.
+        Args:
+            title_weight (float): Weight of an occurrence in the title.
+            text_weight (float): Weight of an occurrence in the text.
+        """
+        """
+        <RUS>
+        Инициализирует пустой индекс. Каждое слово указывает на содержащие его события вместе со взвешенным числом
+        вхождений, а словарь хранится отсортированным, поэтому слова, начинающиеся с префикса, находятся двоичным
+        поиском.
+        Аргументы:
+            title_weight (float): Вес вхождения в заголовке.
+            text_weight (float): Вес вхождения в тексте.
+        """
+        self._title_weight = title_weight
+        self._text_weight = text_weight
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._words_by_id: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._words_by_id)
+
+    def _frequencies(self, title: str, text: str) -> Counter:
+        frequencies = Counter()
+        for word in tokenize(title or ''):
+            frequencies[word] += self._title_weight
+        for word in tokenize(text or ''):
+            frequencies[word] += self._text_weight
+        return frequencies
+
+    def add(self, event_id: str, title: str, text: str):
+        """
+        <EN>
+        Index the words of an event. If the event is already indexed, its previous words are replaced.
+        Args:
+            event_id (str): The ID of the event.
+            title (str): The title of the event.
+            text (str): The text of the event.
+        """
+        """
+        <RUS>
+        Индексирует слова события. Если событие уже проиндексировано, его прежние слова заменяются.
+        Аргументы:
+            event_id (str): ID события.
+            title (str): Заголовок события.
+            text (str): Текст события.
+        """
+        self.add_many(((event_id, title, text),))
+
+    def add_many(self, entries: Iterable[Tuple[str, str, str]]):
+        """
+        <EN>
+        Index the words of many events at once, adding the new words to the sorted vocabulary together.
+        Args:
+            entries (Iterable[Tuple[str, str, str]]): (event_id, title, text) triples; of repeated IDs the last one
+                is kept.
+        """
+        """
+        <RUS>
+        Индексирует слова сразу многих событий, добавляя новые слова в отсортированный словарь вместе.
+        Аргументы:
+            entries (Iterable[Tuple[str, str, str]]): Тройки (event_id, заголовок, текст); из повторяющихся ID
+                сохраняется последняя.
+        """
+        new_words = []
+        for event_id, (title, text) in {event_id: (title, text) for event_id, title, text in entries}.items():
+            self.remove(event_id)
+            frequencies = self._frequencies(title, text)
+            for word, frequency in frequencies.items():
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    new_words.append(word)
+                postings[event_id] = frequency
+            self._words_by_id[event_id] = tuple(frequencies)
+            self._lengths[event_id] = length = sum(frequencies.values())
+            self._total_length += length
+        _insert_sorted(self._vocabulary, new_words)
+
+    def remove(self, event_id: str):
+        """
+        <EN>
+        Remove an event from the index. Unknown IDs are ignored.
+        Args:
+            event_id (str): The ID of the event.
+        """
+        """
+        <RUS>
+        Удаляет событие из индекса. Неизвестные ID игнорируются.
+        Аргументы:
+            event_id (str): ID события.
+        """
+        words = self._words_by_id.pop(event_id, None)
+        if words is None:
+            return
+        for word in words:
+            postings = self._postings[word]
+            del postings[event_id]
+            if not postings:
+                del self._postings[word]
+                del self._vocabulary[bisect_left(self._vocabulary, word)]
+        self._total_length -= self._lengths.pop(event_id)
+
+    def _expand(self, prefix: str) -> List[str]:
+        low = bisect_left(self._vocabulary, prefix)
+        high = bisect_left(self._vocabulary, prefix + chr(0x10FFFF), low)
+        words = self._vocabulary[low:high]
+        if len(words) > _MAX_EXPANSIONS:
+            # A very short prefix matches much of the vocabulary; only the word itself and the most common
+            # words starting with it are searched, so the cost of a query stays bounded.
+            words = heapq.nlargest(_MAX_EXPANSIONS, words, key=lambda word: (word == prefix, len(self._postings[word])))
+        return words
+
+    def search(self, query: str, limit: int = 50) -> List[str]:
+        """
+        <EN>
+        Find events containing every word of the query as a word prefix in the title or text.
+        Results are ranked with BM25 over the weighted occurrences, so matches in the title weigh more.
+        Args:
+            query (str): Words to search for.
+            limit (int): Maximum number of IDs to return.
+        Returns:
+            List[str]: IDs of the matching events, best matches first.
+        """
+        """
+        <RUS>
+        Находит события, содержащие каждое слово запроса как префикс слова в заголовке или тексте.
+        Результаты ранжируются по BM25 над взвешенными вхождениями, поэтому совпадения в заголовке весят больше.
+        Аргументы:
+            query (str): Слова для поиска.
+            limit (int): Максимальное количество возвращаемых ID.
+        Возвращает:
+            List[str]: ID подходящих событий, лучшие совпадения первыми.
+        """
+        prefixes = set(tokenize(query))
+        if not prefixes or not self._words_by_id:
+            return []
+        count = len(self._words_by_id)
+        average_length = self._total_length / count or 1.0
+        # The most selective prefix goes first, so the following ones only score the remaining candidates.
+        expansions = sorted((self._expand(prefix) for prefix in prefixes),
+                            key=lambda words: sum(len(self._postings[word]) for word in words))
+        scores = None
+        for words in expansions:
+            matches = {}
+            for word in words:
+                postings = self._postings[word]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                if scores is None:
+                    candidates = postings.items()
+                else:
+                    candidates = [(event_id, postings[event_id]) for event_id in scores if event_id in postings]
+                for event_id, frequency in candidates:
+                    norm = _K1 * (1 - _B + _B * self._lengths[event_id] / average_length)
+                    matches[event_id] = matches.get(event_id, 0.0) + idf * frequency * (_K1 + 1) / (frequency + norm)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {event_id: scores[event_id] + score for event_id, score in matches.items()}
+            if not scores:
+                return []
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [event_id for event_id, _ in best]
+
+    def rebuild(self, entries: Iterable[Tuple[str, str, str]]):
+        """
+        <EN>
+        Replace the content of the index with the given entries, sorting the vocabulary once.
+        Args:
+            entries (Iterable[Tuple[str, str, str]]): (event_id, title, text) triples.
+        """
+        """
+        <RUS>
+        Заменяет содержимое индекса переданными записями, сортируя словарь один раз.
+        Аргументы:
+            entries (Iterable[Tuple[str, str, str]]): Тройки (event_id, заголовок, текст).
+        """
+        self._postings = {}
+        self._words_by_id = {}
+        self._lengths = {}
+        self._total_length = 0.0
+        for event_id, title, text in entries:
+            frequencies = self._frequencies(title, text)
+            for word, frequency in frequencies.items():
+                self._postings.setdefault(word, {})[event_id] = frequency
+            self._words_by_id[event_id] = tuple(frequencies)
+            self._lengths[event_id] = length = sum(frequencies.values())
+            self._total_length += length
+        self._vocabulary = sorted(self._postings)
+
+
+class SeriesIndex:
+    def __init__(self):
+        """
+        <EN>
+        Initialize an empty index. Every series is kept once with its parsed rule and the last date its occurrences
+        may fall on, so series that cannot reach a queried range are skipped without expanding them.
+        """
+        """
+        <RUS>
+        Инициализирует пустой индекс. Каждая серия хранится один раз вместе с разобранным правилом и последней датой,
+        на которую могут прийтись ее повторения, поэтому серии, не достигающие запрошенного диапазона, пропускаются
+        без развертывания.
+        """
+        self._series: Dict[str, Tuple[date, Rule, Optional[date], frozenset]] = {}
+
+    def __len__(self):
+        return len(self._series)
+
+    def add(self, event_id: str, first: date, rule: Rule, exdates: Collection[date] = ()):
+        """
+        <EN>
+        Add a series to the index. If the series is already indexed, it is replaced.
+        Args:
+            event_id (str): The ID of the series.
+            first (date): The date of the first occurrence.
+            rule (Rule): The parsed recurrence rule.
+            exdates (Collection[date]): Dates of cancelled occurrences.
+        """
+        """
+        <RUS>
+        Добавляет серию в индекс. Если серия уже проиндексирована, она заменяется.
+        Аргументы:
+            event_id (str): ID серии.
+            first (date): Дата первого повторения.
+            rule (Rule): Разобранное правило повторения.
+            exdates (Collection[date]): Даты отмененных повторений.
+        """
+        self._series[event_id] = (first, rule, last_occurrence(first, rule), frozenset(exdates))
+
+    def remove(self, event_id: str):
+        """
+        <EN>
+        Remove a series from the index. Unknown IDs are ignored.
+        Args:
+            event_id (str): The ID of the series.
+        """
+        """
+        <RUS>
+        Удаляет серию из индекса. Неизвестные ID игнорируются.
+        Аргументы:
+            event_id (str): ID серии.
+        """
+        self._series.pop(event_id, None)
+
+    def range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+              limit: Optional[int] = None) -> List[Tuple[date, str]]:
+        """
+        <EN>
+        Find the occurrences of all series within a date range. Each series is expanded lazily from the start of the
+        range and the expansions are merged, so only as many occurrences are generated as the limit requires.
+        Args:
+            start (date): First day of the range, inclusive.
+            end (date): Last day of the range, inclusive.
+            after (Tuple[date, str]): Optional (date, event_id) key; only occurrences ordered after it are returned.
+            limit (int): Optional maximum number of keys to return.
+        Returns:
+            List[Tuple[date, str]]: (date, event_id) keys of the occurrences ordered by date and ID.
+        """
+        """
+        <RUS>
+        Находит повторения всех серий в диапазоне дат. Каждая серия лениво разворачивается с начала диапазона,
+        а развертывания объединяются, поэтому порождается ровно столько повторений, сколько требует лимит.
+        Аргументы:
+            start (date): Первый день диапазона включительно.
+            end (date): Последний день диапазона включительно.
+            after (Tuple[date, str]): Необязательный ключ (дата, event_id); возвращаются только повторения после него.
+            limit (int): Необязательное максимальное количество возвращаемых ключей.
+        Возвращает:
+            List[Tuple[date, str]]: Ключи (дата, event_id) повторений, упорядоченные по дате и ID.
+        """
+        low = start if after is None else max(start, after[0])
+        expansions = []
+        for event_id, (first, rule, last, exdates) in self._series.items():
+            if first > end or last is None or last < low:
+                continue
+            expansions.append(_keyed(occurrences(first, rule, low, end, exdates), event_id))
+        keys = heapq.merge(*expansions)
+        if after is not None:
+            keys = dropwhile(lambda key: key <= after, keys)
+        return list(islice(keys, limit))
+
+    def firsts(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+               limit: Optional[int] = None) -> List[Tuple[date, str]]:
+        """
+        <EN>
+        Find the series whose first occurrence lies within a date range, each once, without expanding them.
+        Args:
+            start (date): First day of the range, inclusive.
+            end (date): Last day of the range, inclusive.
+            after (Tuple[date, str]): Optional (date, event_id) key; only series ordered after it are returned.
+            limit (int): Optional maximum number of keys to return.
+        Returns:
+            List[Tuple[date, str]]: (first date, event_id) keys of the series ordered by date and ID.
+        """
+        """
+        <RUS>
+        Находит серии, первое повторение которых лежит в диапазоне дат, каждую один раз, не разворачивая их.
+        Аргументы:
+            start (date): Первый день диапазона включительно.
+            end (date): Последний день диапазона включительно.
+            after (Tuple[date, str]): Необязательный ключ (дата, event_id); возвращаются только серии после него.
+            limit (int): Необязательное максимальное количество возвращаемых ключей.
+        Возвращает:
+            List[Tuple[date, str]]: Ключи (первая дата, event_id) серий, упорядоченные по дате и ID.
+        """
+        keys = ((first, event_id) for event_id, (first, _, _, _) in self._series.items()
+                if start <= first <= end and (after is None or (first, event_id) > after))
+        return sorted(keys) if limit is None else heapq.nsmallest(limit, keys)
+
+    def rebuild(self, entries: Iterable[Tuple[str, date, Rule, Collection[date]]]):
+        """
+        <EN>
+        Replace the content of the index with the given entries.
+        Args:
+            entries (Iterable[Tuple[str, date, Rule, Collection[date]]]): (event_id, first, rule, exdates) entries.
+        """
+        """
+        <RUS>
+        Заменяет содержимое индекса переданными записями.
+        Аргументы:
+            entries (Iterable[Tuple[str, date, Rule, Collection[date]]]): Записи (event_id, первая дата, правило,
+                исключения).
+        """
+        self._series = {}
+        for event_id, first, rule, exdates in entries:
+            self.add(event_id, first, rule, exdates)
+
+
+class _IntervalNode:
+    __slots__ = ('key', 'end', 'max_end', 'priority', 'left', 'right')
+
+    def __init__(self, key: Tuple[datetime, str], end: datetime):
+        self.key = key
+        self.end = end
+        self.max_end = end
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+
+class IntervalIndex:
+    def __init__(self):
+        """
+        <EN>
+        Initialize an empty index. The intervals are kept in a treap ordered by (start, event_id), a binary search tree
+        balanced by random priorities, where every node also stores the latest end within its subtree. A subtree
+        whose latest end is not after the start of a query cannot contain an overlap and is skipped as a whole.
+        """
+        """
+        <RUS>
+        Инициализирует пустой индекс. Интервалы хранятся в декартовом дереве, упорядоченном по (начало, event_id), —
+        двоичном дереве поиска, сбалансированном случайными приоритетами, где каждый узел также хранит самое позднее
+        окончание в своем поддереве. Поддерево, самое позднее окончание которого не позже начала запроса, не может
+        содержать пересечений и пропускается целиком.
+        """
+        self._root = None
+        self._key_by_id = {}
+
+    def __len__(self):
+        return len(self._key_by_id)
+
+    def add(self, event_id: str, start: datetime, end: datetime):
+        """
+        <EN>
+        Add an event to the index in O(log n). If the event is already indexed, it is moved to the new interval.
+        Args:
+            event_id (str): The ID of the event.
+            start (datetime): The start of the event, inclusive.
+            end (datetime): The end of the event, exclusive.
+        """
+        """
+        <RUS>
+        Добавляет событие в индекс за O(log n). Если событие уже проиндексировано, оно переносится на новый интервал.
+        Аргументы:
+            event_id (str): ID события.
+            start (datetime): Начало события включительно.
+            end (datetime): Окончание события не включительно.
+        """
+        self.remove(event_id)
+        key = (start, event_id)
+        node = _IntervalNode(key, end)
+        parent = None
+        current = self._root
+        # Descends to the depth the random priority of the new node places it at, raising the latest ends on the way;
+        # only the subtree found there is split, and it is small on average.
+        while current is not None and current.priority > node.priority:
+            if end > current.max_end:
+                current.max_end = end
+            parent = current
+            current = current.left if key < current.key else current.right
+        node.left, node.right = _split(current, key)
+        _update(node)
+        if parent is None:
+            self._root = node
+        elif key < parent.key:
+            parent.left = node
+        else:
+            parent.right = node
+        self._key_by_id[event_id] = key
+
+    def remove(self, event_id: str):
+        """
+        <EN>
+        Remove an event from the index in O(log n). Unknown IDs are ignored.
+        Args:
+            event_id (str): The ID of the event.
+        """
+        """
+        <RUS>
+        Удаляет событие из индекса за O(log n). Неизвестные ID игнорируются.
+        Аргументы:
+            event_id (str): ID события.
+        """
+        key = self._key_by_id.pop(event_id, None)
+        if key is not None:
+            self._root = _delete(self._root, key)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, str]]:
+        """
+        <EN>
+        Find the events whose interval overlaps [start, end), that is, which start before the end and end after
+        the start. Only the subtrees that can contain an overlap are visited, so the cost grows with the number of
+        overlapping events and the height of the tree instead of the number of indexed events.
+        Args:
+            start (datetime): Start of the queried interval, inclusive.
+            end (datetime): End of the queried interval, exclusive.
+        Returns:
+            List[Tuple[datetime, str]]: (start, event_id) keys of the overlapping events ordered by start and ID.
+        """
+        """
+        <RUS>
+        Находит события, интервал которых пересекается с [start, end), то есть начинающиеся до конца и
+        заканчивающиеся после начала. Посещаются только поддеревья, которые могут содержать пересечения, поэтому
+        стоимость растет с количеством пересекающихся событий и высотой дерева, а не с количеством
+        проиндексированных событий.
+        Аргументы:
+            start (datetime): Начало запрошенного интервала включительно.
+            end (datetime): Конец запрошенного интервала не включительно.
+        Возвращает:
+            List[Tuple[datetime, str]]: Ключи (начало, event_id) пересекающихся событий, упорядоченные по началу и ID.
+        """
+        keys = []
+        stack = []
+        node = self._root
+        while True:
+            # In-order walk that descends only into subtrees ending after the start.
+            while node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return keys
+            node = stack.pop()
+            if node.key[0] >= end:
+                # Every node that follows starts at or after the end as well.
+                return keys
+            if node.end > start:
+                keys.append(node.key)
+            node = node.right
+
+    def rebuild(self, entries: Iterable[Tuple[str, datetime, datetime]]):
+        """
+        <EN>
+        Replace the content of the index with the given entries. They are sorted once and the tree is built from
+        the sorted entries in linear time instead of inserting them one by one.
+        Args:
+            entries (Iterable[Tuple[str, datetime, datetime]]): (event_id, start, end) entries.
+        """
+        """
+        <RUS>
+        Заменяет содержимое индекса переданными записями. Они сортируются один раз, и дерево строится
+        по отсортированным записям за линейное время вместо вставки по одной.
+        Аргументы:
+            entries (Iterable[Tuple[str, datetime, datetime]]): Записи (event_id, начало, окончание).
+        """
+        self._key_by_id = {}
+        spine = []
+        for start, event_id, end in sorted((start, event_id, end) for event_id, start, end in entries):
+            node = _IntervalNode((start, event_id), end)
+            self._key_by_id[event_id] = node.key
+            # The right spine holds the nodes that may still get a right child; those of lower priority
+            # than the new node become its left subtree and are complete from now on.
+            child = None
+            while spine and spine[-1].priority < node.priority:
+                child = spine.pop()
+                _update(child)
+            node.left = child
+            if spine:
+                spine[-1].right = node
+            spine.append(node)
+        for node in reversed(spine):
+            _update(node)
+        self._root = spine[0] if spine else None
+
+    def clear(self):
+        """
+        <EN>
+        Remove all events from the index.
+        """
+        """
+        <RUS>
+        Удаляет все события из индекса.
+        """
+        self._root = None
+        self._key_by_id = {}
+
+
+def _update(node: _IntervalNode):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _split(node: Optional[_IntervalNode], key) -> Tuple[Optional[_IntervalNode], Optional[_IntervalNode]]:
+    # Splits a tree into the nodes ordered before the key and the others.
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left: Optional[_IntervalNode], right: Optional[_IntervalNode]) -> Optional[_IntervalNode]:
+    # Merges two trees where every node of the left one is ordered before every node of the right one.
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _delete(node: Optional[_IntervalNode], key) -> Optional[_IntervalNode]:
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    else:
+        node.right = _delete(node.right, key)
+    _update(node)
+    return node
+
+
+def _keyed(days: Iterator[date], event_id: str) -> Iterator[Tuple[date, str]]:
+    for day in days:
+        yield day, event_id
@@ -0,0 +1,143 @@
+"""
+<EN>
+Locks for Concurrent Storage Access
+
+This module provides the locks used by the storage layer when it is shared between threads of one process and
+between several processes, for example gunicorn workers serving the same storage file.
+
+Classes:
+    RWLock: Reader/writer lock: many threads may read at once, a writer gets exclusive access.
+    FileLock: Advisory inter-process lock on a lock file based on fcntl.flock.
+
+Methods:
+    RWLock.read(): Context manager holding the lock for reading.
+    RWLock.write(): Context manager holding the lock for writing.
+    FileLock.shared(): Context manager holding a shared lock on the file.
+    FileLock.exclusive(): Context manager holding an exclusive lock on the file.
+"""
+"""
+<RUS>
+Блокировки для конкурентного доступа к хранилищу
+
+Этот модуль предоставляет блокировки, которые использует слой хранения, когда он разделяется между потоками одного
+процесса и между несколькими процессами, например воркерами gunicorn, обслуживающими один файл хранилища.
+
+Классы:
+    RWLock: Блокировка читателей/писателей: читать могут многие потоки одновременно, писатель получает
+        исключительный доступ.
+    FileLock: Рекомендательная межпроцессная блокировка файла-замка на основе fcntl.flock.
+
+Методы:
+    RWLock.read(): Контекстный менеджер, удерживающий блокировку для чтения.
+    RWLock.write(): Контекстный менеджер, удерживающий блокировку для записи.
+    FileLock.shared(): Контекстный менеджер, удерживающий разделяемую блокировку файла.
+    FileLock.exclusive(): Контекстный менеджер, удерживающий исключительную блокировку файла.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - fcntl is not available on Windows
+    fcntl = None
+
+
+class RWLock:
+    def __init__(self):
+        """
+        <EN>
+        Initialize the lock. Waiting writers have priority over new readers, so a stream of reads cannot starve
+        a write. The thread holding the write lock may acquire it again and may also read.
+        """
+        """
+        <RUS>
+        Инициализирует блокировку. Ожидающие писатели имеют приоритет над новыми читателями, поэтому поток чтений
+        не может бесконечно откладывать запись. Поток, удерживающий блокировку записи, может захватить ее повторно
+        и может читать.
+        """
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                owned = True
+            else:
+                owned = False
+                while self._writer is not None or self._writers_waiting:
+                    self._condition.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            if not owned:
+                with self._condition:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._writer = None
+                    self._condition.notify_all()
+
+
+class FileLock:
+    def __init__(self, path: str):
+        """
+        <EN>
+        Initialize the lock for the given lock file. Every acquisition opens its own file descriptor, so the lock
+        also excludes other threads of the same process. Without fcntl the lock does nothing.
+        Args:
+            path (str): Path to the lock file. It is created if it does not exist.
+        """
+        """
+        <RUS>
+        Инициализирует блокировку для указанного файла-замка. Каждый захват открывает собственный файловый
+        дескриптор, поэтому блокировка исключает и другие потоки того же процесса. Без fcntl блокировка ничего не делает.
+        Аргументы:
+            path (str): Путь к файлу-замку. Создается, если не существует.
+        """
+        self._path = path
+
+    @contextmanager
+    def _locked(self, operation):
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH if fcntl else None)
+
+    def exclusive(self):
+        return self._locked(fcntl.LOCK_EX if fcntl else None)
@@ -7,23 +7,62 @@ with the underlying database through the EventDB class.
 
 Classes:
     LogicException: Custom exception class for logic operation errors.
+    ConflictException: LogicException raised when an event created with a conflict check overlaps other events,
+        which it lists.
     EventLogic: Class for managing the business logic of events.
+    AsyncEventLogic: Asynchronous variant of EventLogic for the ASGI mode, backed by AsyncEventDB.
+    ImportResult: Named tuple (imported, failed, errors) reporting the outcome of an import.
 
 Constants:
     TITLE_LIMIT (int): Maximum allowed length for the event title.
     TEXT_LIMIT (int): Maximum allowed length for the event text.
 
+Functions:
+    encode_cursor(event: model.Event) -> str: Build an opaque pagination cursor pointing after the event.
+    decode_cursor(cursor: str) -> Tuple[date, str]: Decode a pagination cursor into a (date, event_id) key.
+    parse_event(payload, event_id: str) -> model.Event: Build an event from a request body, given either as
+        {"data": "date|title|text"} or as {"date": ..., "title": ..., "text": ...}, optionally with "rrule" and
+        "exdates" for a recurring event and "start" and "end" for a timed one, whose date then defaults to the date
+        of its start. The event is validated by the EventLogic method it is passed to.
+    free_busy(events, start: datetime, end: datetime): Merge the times of events overlapping a window into its busy
+        and free intervals.
+
 Methods:
-    __init__(): Initialize the EventLogic with a database instance.
+    __init__(event_db: db.EventDB = None, durable: bool = None): Initialize the EventLogic with a database instance;
+        a durable EventLogic returns from mutations only after they are persisted.
     _validate_event(event: model.Event): Validate the event object to ensure it meets business rules.
-    create(event: model.Event) -> str: Create a new event after validation.
-    list() -> List[model.Event]: List all events.
+    create(event: model.Event, check_conflicts: bool = False) -> str: Create a new event after validation,
+        optionally refusing a timed event that overlaps other events.
+    list(start: date = None, end: date = None) -> List[model.Event]: List all events or events within a date range.
+    page(limit: int, cursor: str = None, start: date = None, end: date = None): Get one page of events ordered by
+        date together with the cursor of the next page. As with list(), series are expanded into their occurrences
+        only within a date range; without one, each series is listed once, at its first date.
+    iter_events(start: date = None, end: date = None, cursor: str = None): Lazily iterate over events page by page.
+    export_events() -> Iterator[model.Event]: Lazily iterate over all stored events, each series once, unexpanded.
     read(event_id: str) -> model.Event: Read a specific event by ID.
+    search(query: str, limit: int = None) -> List[model.Event]: Find events by words of their title and text.
+    overlapping(start: datetime, end: datetime) -> List[model.Event]: Find the timed events overlapping a time window.
     update(event_id: str, event: model.Event): Update an existing event after validation.
     delete(event_id: str): Delete a specific event by ID.
+    cancel_occurrence(event_id: str, day: date): Cancel a single occurrence of a recurring event.
+    version(): Get the tag and modification time of the whole storage, used for conditional requests.
+    event_version(event_id: str): Get the tag and modification time of a single event, or None if it does not exist.
+    changes(since: int, limit: int = None) -> ChangeSet: Get the events changed after a sequence number.
+    change_seq() -> Optional[int]: Get the number of the last change, or None if the storage keeps no change log.
+    add_listener(listener): Register a callback invoked with the IDs of changed events after every mutation.
+    remove_listener(listener): Unregister a callback registered with add_listener.
+    bulk_apply(operations) -> List[Optional[LogicException]]: Validate a batch of operations and apply the valid
+        ones with a single save, reporting the outcome of each.
+    bulk_create(events), bulk_update(events), bulk_delete(event_ids): Shortcuts for batches of a single operation.
+    import_events(events, batch_size: int = None) -> ImportResult: Validate and create events read lazily from
+        a source, such as an iCalendar parser, committing them batch_size at a time; an invalid event is reported
+        without stopping the import.
+    AsyncEventLogic has the same methods as coroutines (iter_events is an asynchronous generator) and applies the
+    same validation, and flushed() to wait until all changes made so far are persisted.
 
 Exceptions:
     LogicException: Raised for any errors occurring during logic operations.
+    ConflictException: Raised by create() with check_conflicts when the event overlaps other events.
 """
 """
 <RUS>
@@ -34,28 +73,77 @@ Exceptions:
 
 Классы:
     LogicException: Пользовательский класс исключений для ошибок логических операций.
+    ConflictException: LogicException, возникающее, когда событие, создаваемое с проверкой конфликтов, пересекается
+        с другими событиями, которые оно перечисляет.
     EventLogic: Класс для управления бизнес-логикой событий.
+    AsyncEventLogic: Асинхронный вариант EventLogic для режима ASGI, работающий через AsyncEventDB.
+    ImportResult: Именованный кортеж (imported, failed, errors) с результатом импорта.
 
 Константы:
     TITLE_LIMIT (int): Максимально допустимая длина заголовка события.
     TEXT_LIMIT (int): Максимально допустимая длина текста события.
 
+Функции:
+    encode_cursor(event: model.Event) -> str: Строит непрозрачный курсор страниц, указывающий на позицию после события.
+    decode_cursor(cursor: str) -> Tuple[date, str]: Декодирует курсор страниц в ключ (дата, event_id).
+    parse_event(payload, event_id: str) -> model.Event: Строит событие из тела запроса, заданного как
+        {"data": "дата|заголовок|текст"} или как {"date": ..., "title": ..., "text": ...}, при необходимости
+        с "rrule" и "exdates" для повторяющегося события и "start" и "end" для события со временем, дата которого
+        тогда по умолчанию равна дате его начала. Событие проверяется методом EventLogic, которому оно передается.
+    free_busy(events, start: datetime, end: datetime): Объединяет время событий, пересекающихся с окном, в занятые
+        и свободные интервалы окна.
+
 Методы:
-    __init__(): Инициализирует EventLogic с экземпляром базы данных.
+    __init__(event_db: db.EventDB = None, durable: bool = None): Инициализирует EventLogic с экземпляром базы данных;
+        надежный EventLogic возвращается из изменений только после их сохранения.
     _validate_event(event: model.Event): Проверяет объект события на соответствие бизнес-правилам.
-    create(event: model.Event) -> str: Создает новое событие после проверки.
-    list() -> List[model.Event]: Получает список всех событий.
+    create(event: model.Event, check_conflicts: bool = False) -> str: Создает новое событие после проверки,
+        при необходимости отклоняя событие со временем, которое пересекается с другими событиями.
+    list(start: date = None, end: date = None) -> List[model.Event]: Получает список всех событий или событий в диапазоне дат.
+    page(limit: int, cursor: str = None, start: date = None, end: date = None): Получает одну страницу событий,
+        упорядоченных по дате, вместе с курсором следующей страницы. Как и в list(), серии разворачиваются
+        в повторения только в диапазоне дат; без него каждая серия выводится один раз, на дату первого повторения.
+    iter_events(start: date = None, end: date = None, cursor: str = None): Лениво перебирает события по страницам.
+    export_events() -> Iterator[model.Event]: Лениво перебирает все сохраненные события, каждую серию один раз,
+        без развертывания.
     read(event_id: str) -> model.Event: Считывает конкретное событие по ID.
+    search(query: str, limit: int = None) -> List[model.Event]: Находит события по словам заголовка и текста.
+    overlapping(start: datetime, end: datetime) -> List[model.Event]: Находит события со временем, пересекающиеся
+        с окном времени.
     update(event_id: str, event: model.Event): Обновляет существующее событие после проверки.
     delete(event_id: str): Удаляет конкретное событие по ID.
+    cancel_occurrence(event_id: str, day: date): Отменяет одно повторение повторяющегося события.
+    version(): Получает тег и время изменения всего хранилища, используемые для условных запросов.
+    event_version(event_id: str): Получает тег и время изменения отдельного события или None, если его нет.
+    changes(since: int, limit: int = None) -> ChangeSet: Получает события, измененные после номера последовательности.
+    change_seq() -> Optional[int]: Получает номер последнего изменения или None, если хранилище не ведет журнал
+        изменений.
+    add_listener(listener): Регистрирует функцию, вызываемую с ID измененных событий после каждого изменения.
+    remove_listener(listener): Отменяет регистрацию функции, зарегистрированной через add_listener.
+    bulk_apply(operations) -> List[Optional[LogicException]]: Проверяет пакет операций и применяет корректные
+        с одним сохранением, сообщая результат каждой.
+    bulk_create(events), bulk_update(events), bulk_delete(event_ids): Сокращения для пакетов из одной операции.
+    import_events(events, batch_size: int = None) -> ImportResult: Проверяет и создает события, лениво читаемые
+        из источника, например парсера iCalendar, сохраняя их пакетами по batch_size; о некорректном событии
+        сообщается без остановки импорта.
+    AsyncEventLogic содержит те же методы в виде корутин (iter_events — асинхронный генератор) и выполняет
+    ту же проверку, а также flushed() для ожидания сохранения всех сделанных изменений.
 
 Исключения:
     LogicException: Возникает при любых ошибках логических операций.
+    ConflictException: Возникает в create() с check_conflicts, когда событие пересекается с другими событиями.
 """
 
-from typing import List
+import base64
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
 import model
+import config
 import db
+import metrics
+import recurrence
+import storage
 
 TITLE_LIMIT = 30
 TEXT_LIMIT = 200
@@ -63,32 +151,186 @@ TEXT_LIMIT = 200
 class LogicException(Exception):
     pass
 
+class ConflictException(LogicException):
+    def __init__(self, conflicts: List[model.Event]):
+        super().__init__("Время события занято другими событиями")
+        self.conflicts = conflicts
+
+# The number of imported events, the number of events that failed, and the (position, error) pairs of the first
+# IMPORT_MAX_ERRORS of them, positions counting every event of the source from zero.
+ImportResult = namedtuple('ImportResult', ['imported', 'failed', 'errors'])
+
+def encode_cursor(event: model.Event) -> str:
+    try:
+        day = model.parse_date(event.date)
+    except ValueError:
+        day = date.min
+    return base64.urlsafe_b64encode(f"{day.isoformat()}|{event.id}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[date, str]:
+    try:
+        day, event_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return model.parse_date(day), event_id
+    except ValueError:
+        raise LogicException("Invalid cursor")
+
+def parse_event(payload, event_id: str) -> model.Event:
+    fields = payload.get('data', payload) if isinstance(payload, dict) else None
+    if isinstance(fields, str):
+        parts = fields.split('|')
+        if len(parts) == 3:
+            return model.Event(id=event_id, date=parts[0], title=parts[1], text=parts[2])
+    elif isinstance(fields, dict):
+        date_value, title, text = fields.get('date'), fields.get('title'), fields.get('text')
+        rrule, exdates = fields.get('rrule'), fields.get('exdates', [])
+        start, end = fields.get('start'), fields.get('end')
+        if date_value is None and isinstance(start, str):
+            date_value = start[:10]
+        if (isinstance(date_value, str) and isinstance(title, str) and isinstance(text, str)
+                and (rrule is None or isinstance(rrule, str)) and isinstance(exdates, list)
+                and (start is None or isinstance(start, str)) and (end is None or isinstance(end, str))):
+            return model.Event(id=event_id, date=date_value, title=title, text=text, rrule=rrule, exdates=exdates,
+                               start=start, end=end)
+    raise LogicException("Неверный JSON или отсутствует поле данных")
+
+def _check_range(start: Optional[date], end: Optional[date]):
+    if start is not None and end is not None and start > end:
+        raise LogicException("Start date is after end date")
+
+def _check_limit(limit: int):
+    if limit < 1 or limit > config.PAGE_MAX_LIMIT:
+        raise LogicException(f"Limit must be between 1 and {config.PAGE_MAX_LIMIT}")
+
+def _check_window(start: datetime, end: datetime):
+    if start >= end:
+        raise LogicException("Начало окна должно быть раньше его конца")
+    if end - start > timedelta(days=config.FREEBUSY_MAX_DAYS):
+        raise LogicException(f"Окно не должно превышать {config.FREEBUSY_MAX_DAYS} дней")
+
+def free_busy(events: List[model.Event], start: datetime,
+              end: datetime) -> Tuple[List[Tuple[datetime, datetime]], List[Tuple[datetime, datetime]]]:
+    # Events come ordered by start, so overlapping and adjacent times merge in one pass.
+    busy = []
+    for event in events:
+        event_start = max(model.parse_datetime(event.start), start)
+        event_end = min(model.parse_datetime(event.end), end)
+        if busy and event_start <= busy[-1][1]:
+            busy[-1] = (busy[-1][0], max(busy[-1][1], event_end))
+        else:
+            busy.append((event_start, event_end))
+    free = []
+    position = start
+    for busy_start, busy_end in busy:
+        if position < busy_start:
+            free.append((position, busy_start))
+        position = busy_end
+    if position < end:
+        free.append((position, end))
+    return busy, free
+
 class EventLogic:
-    def __init__(self):
-        self._event_db = db.EventDB()
+    def __init__(self, event_db: Optional[db.EventDB] = None, durable: Optional[bool] = None):
+        self._event_db = event_db or db.EventDB()
+        self._durable = config.DURABLE_WRITES if durable is None else durable
+
+    def _wait_durable(self):
+        if self._durable:
+            self._event_db.flush_future().result()
 
     @staticmethod
+    @metrics.timed('logic', 'validate')
     def _validate_event(event: model.Event):
         if event is None:
             raise LogicException("Event is None")
-        if event.title is None or len(event.title) > TITLE_LIMIT:
-            raise LogicException(f"Title length exceeds maximum limit of {TITLE_LIMIT} characters")
-        if event.text is None or len(event.text) > TEXT_LIMIT:
-            raise LogicException(f"Text length exceeds maximum limit of {TEXT_LIMIT} characters")
+        try:
+            model.parse_date(event.date)
+        except ValueError:
+            raise LogicException("Неверный формат даты, ожидается YYYY-MM-DD")
+        if not isinstance(event.title, str) or len(event.title) > TITLE_LIMIT:
+            raise LogicException(f"Заголовок превышает {TITLE_LIMIT} символов")
+        if not isinstance(event.text, str) or len(event.text) > TEXT_LIMIT:
+            raise LogicException(f"Текст превышает {TEXT_LIMIT} символов")
+        if event.rrule is not None:
+            try:
+                rule = recurrence.parse_rule(event.rrule)
+            except ValueError:
+                raise LogicException("Неверное правило повторения RRULE")
+            if rule.count is not None and rule.count > recurrence.max_count(rule):
+                raise LogicException(f"COUNT превышает число повторений за {config.RECURRENCE_HORIZON_DAYS} дней "
+                                     f"от первого повторения")
+        elif event.exdates:
+            raise LogicException("Исключения допустимы только для повторяющегося события")
+        for value in event.exdates:
+            try:
+                model.parse_date(value)
+            except ValueError:
+                raise LogicException("Неверный формат даты исключения, ожидается YYYY-MM-DD")
+        if event.start is None and event.end is None:
+            return
+        if event.start is None or event.end is None:
+            raise LogicException("Начало и окончание события задаются вместе")
+        try:
+            start, end = model.parse_datetime(event.start), model.parse_datetime(event.end)
+        except ValueError:
+            raise LogicException("Неверный формат времени, ожидается YYYY-MM-DDTHH:MM")
+        if start.date().isoformat() != event.date:
+            raise LogicException("Начало события должно приходиться на его дату")
+        if end <= start:
+            raise LogicException("Окончание события должно быть позже его начала")
 
-    def create(self, event: model.Event) -> str:
+    @metrics.timed('logic', 'create')
+    def create(self, event: model.Event, check_conflicts: bool = False) -> str:
         self._validate_event(event)
         try:
-            return self._event_db.create(event)
+            event_id = self._event_db.create(event, check_conflicts)
+            self._wait_durable()
+            return event_id
+        except storage.ConflictException as ex:
+            raise ConflictException(ex.conflicts)
         except Exception as ex:
             raise LogicException(f"Failed to create event: {ex}")
 
-    def list(self) -> List[model.Event]:
+    @metrics.timed('logic', 'list')
+    def list(self, start: Optional[date] = None, end: Optional[date] = None) -> List[model.Event]:
+        _check_range(start, end)
         try:
-            return self._event_db.list()
+            if start is None and end is None:
+                return self._event_db.list()
+            return self._event_db.list_range(start or date.min, end or date.max)
         except Exception as ex:
             raise LogicException(f"Failed to list events: {ex}")
 
+    @metrics.timed('logic', 'page')
+    def page(self, limit: int, cursor: Optional[str] = None, start: Optional[date] = None,
+             end: Optional[date] = None) -> Tuple[List[model.Event], Optional[str]]:
+        _check_limit(limit)
+        _check_range(start, end)
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            # Like list(), the whole calendar lists each series once; only a date range expands the occurrences.
+            events = self._event_db.list_range(start or date.min, end or date.max, after, limit + 1,
+                                               start is not None or end is not None)
+        except Exception as ex:
+            raise LogicException(f"Failed to list events: {ex}")
+        if len(events) > limit:
+            return events[:limit], encode_cursor(events[limit - 1])
+        return events, None
+
+    def iter_events(self, start: Optional[date] = None, end: Optional[date] = None,
+                    cursor: Optional[str] = None) -> Iterator[model.Event]:
+        events, cursor = self.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+        yield from events
+        while cursor is not None:
+            events, cursor = self.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+            yield from events
+
+    def export_events(self) -> Iterator[model.Event]:
+        try:
+            yield from self._event_db.iter_stored(config.STREAM_CHUNK_SIZE)
+        except Exception as ex:
+            raise LogicException(f"Failed to export events: {ex}")
+
+    @metrics.timed('logic', 'read')
     def read(self, event_id: str) -> model.Event:
         try:
             event = self._event_db.read(event_id)
@@ -98,19 +340,326 @@ class EventLogic:
         except Exception as ex:
             raise LogicException(f"Failed to read event: {ex}")
 
+    @metrics.timed('logic', 'search')
+    def search(self, query: str, limit: Optional[int] = None) -> List[model.Event]:
+        if query is None or not query.strip():
+            raise LogicException("Search query is empty")
+        limit = config.SEARCH_DEFAULT_LIMIT if limit is None else limit
+        _check_limit(limit)
+        try:
+            return self._event_db.search(query, limit)
+        except Exception as ex:
+            raise LogicException(f"Failed to search events: {ex}")
+
+    @metrics.timed('logic', 'overlapping')
+    def overlapping(self, start: datetime, end: datetime) -> List[model.Event]:
+        _check_window(start, end)
+        try:
+            return self._event_db.overlapping(start, end)
+        except Exception as ex:
+            raise LogicException(f"Failed to find overlapping events: {ex}")
+
+    @metrics.timed('logic', 'update')
     def update(self, event_id: str, event: model.Event):
         self._validate_event(event)
         try:
-            if self._event_db.read(event_id) is None:
+            if not self._event_db.exists(event_id):
                 raise LogicException(f"Event with ID {event_id} not found")
-            return self._event_db.update(event_id, event)
+            self._event_db.update(event_id, event)
+            self._wait_durable()
         except Exception as ex:
             raise LogicException(f"Failed to update event: {ex}")
 
+    @metrics.timed('logic', 'delete')
     def delete(self, event_id: str):
         try:
-            if self._event_db.read(event_id) is None:
+            if not self._event_db.exists(event_id):
+                raise LogicException(f"Event with ID {event_id} not found")
+            self._event_db.delete(event_id)
+            self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to delete event: {ex}")
+
+    @metrics.timed('logic', 'cancel_occurrence')
+    def cancel_occurrence(self, event_id: str, day: date):
+        event = self.read(event_id)
+        if event.rrule is None:
+            raise LogicException(f"Event with ID {event_id} is not recurring")
+        if day.isoformat() in event.exdates:
+            return
+        first = model.parse_date(event.date)
+        if next(recurrence.occurrences(first, recurrence.parse_rule(event.rrule), day, day), None) is None:
+            raise LogicException(f"Event with ID {event_id} has no occurrence on {day.isoformat()}")
+        # Only the date of the cancelled occurrence is added, in one storage write, so concurrent cancellations of
+        # the series keep all their dates; the series itself stays a single stored event.
+        try:
+            self._event_db.add_exdate(event_id, day.isoformat())
+            self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to cancel occurrence: {ex}")
+
+    @metrics.timed('logic', 'version')
+    def version(self):
+        try:
+            return self._event_db.version()
+        except Exception as ex:
+            raise LogicException(f"Failed to get storage version: {ex}")
+
+    @metrics.timed('logic', 'event_version')
+    def event_version(self, event_id: str):
+        try:
+            return self._event_db.event_version(event_id)
+        except Exception as ex:
+            raise LogicException(f"Failed to get event version: {ex}")
+
+    @metrics.timed('logic', 'changes')
+    def changes(self, since: int, limit: Optional[int] = None):
+        if since < 0:
+            raise LogicException("Sequence number must not be negative")
+        limit = config.PAGE_DEFAULT_LIMIT if limit is None else limit
+        _check_limit(limit)
+        try:
+            return self._event_db.changes(since, limit)
+        except Exception as ex:
+            raise LogicException(f"Failed to get changes: {ex}")
+
+    @metrics.timed('logic', 'change_seq')
+    def change_seq(self) -> Optional[int]:
+        try:
+            return self._event_db.change_seq()
+        except Exception as ex:
+            raise LogicException(f"Failed to get changes: {ex}")
+
+    def add_listener(self, listener):
+        self._event_db.add_listener(listener)
+
+    def remove_listener(self, listener):
+        self._event_db.remove_listener(listener)
+
+    @metrics.timed('logic', 'bulk_apply')
+    def bulk_apply(self, operations: List[Tuple[str, str, Optional[model.Event]]]) -> List[Optional[LogicException]]:
+        results, valid = self._validate_operations(operations)
+        try:
+            applied = self._event_db.bulk_apply([operations[position] for position in valid])
+            self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to apply batch: {ex}")
+        for position, error in zip(valid, applied):
+            if error is not None:
+                results[position] = LogicException(str(error))
+        return results
+
+    @metrics.timed('logic', 'import_events')
+    def import_events(self, events: Iterable[Union[model.Event, Exception]],
+                      batch_size: Optional[int] = None) -> ImportResult:
+        batch_size = batch_size or config.IMPORT_BATCH_SIZE
+        imported = 0
+        count = 0
+        errors = []
+        batch = []
+        # The source position of every event of the pending batch, against which its storage error is reported.
+        positions = []
+        for position, event in enumerate(events):
+            count += 1
+            if not isinstance(event, Exception):
+                try:
+                    self._validate_event(event)
+                except LogicException as ex:
+                    event = ex
+            if isinstance(event, Exception):
+                if len(errors) < config.IMPORT_MAX_ERRORS:
+                    errors.append((position, event))
+                continue
+            batch.append(('create', event.id, event))
+            positions.append(position)
+            if len(batch) >= batch_size:
+                imported += self._import_batch(batch, positions, errors, imported)
+                batch, positions = [], []
+        if batch:
+            imported += self._import_batch(batch, positions, errors, imported)
+        try:
+            self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to import events: {ex}")
+        return ImportResult(imported, count - imported, sorted(errors, key=lambda error: error[0]))
+
+    def _import_batch(self, batch, positions, errors, imported: int) -> int:
+        try:
+            applied = self._event_db.bulk_apply(batch)
+        except Exception as ex:
+            raise LogicException(f"Failed to import events after {imported} imported: {ex}")
+        for position, error in zip(positions, applied):
+            if error is not None and len(errors) < config.IMPORT_MAX_ERRORS:
+                errors.append((position, LogicException(str(error))))
+        return applied.count(None)
+
+    @classmethod
+    def _validate_operations(cls, operations) -> Tuple[List[Optional[LogicException]], List[int]]:
+        if len(operations) > config.BATCH_MAX_OPERATIONS:
+            raise LogicException(f"Batch exceeds maximum of {config.BATCH_MAX_OPERATIONS} operations")
+        results = [None] * len(operations)
+        valid = []
+        for position, (operation, event_id, event) in enumerate(operations):
+            try:
+                if operation not in ('create', 'update', 'delete'):
+                    raise LogicException(f"Unknown operation {operation}")
+                if operation != 'delete':
+                    cls._validate_event(event)
+                valid.append(position)
+            except LogicException as ex:
+                results[position] = ex
+        return results, valid
+
+    def bulk_create(self, events: List[model.Event]) -> List[Optional[LogicException]]:
+        return self.bulk_apply([('create', event.id, event) for event in events])
+
+    def bulk_update(self, events: List[Tuple[str, model.Event]]) -> List[Optional[LogicException]]:
+        return self.bulk_apply([('update', event_id, event) for event_id, event in events])
+
+    def bulk_delete(self, event_ids: List[str]) -> List[Optional[LogicException]]:
+        return self.bulk_apply([('delete', event_id, None) for event_id in event_ids])
+
+class AsyncEventLogic:
+    def __init__(self, event_db: Optional[db.EventDB] = None, durable: Optional[bool] = None):
+        self._event_db = db.AsyncEventDB(event_db)
+        self._durable = config.DURABLE_WRITES if durable is None else durable
+
+    async def _wait_durable(self):
+        if self._durable:
+            await self._event_db.flushed()
+
+    async def create(self, event: model.Event, check_conflicts: bool = False) -> str:
+        EventLogic._validate_event(event)
+        try:
+            event_id = await self._event_db.create(event, check_conflicts)
+            await self._wait_durable()
+            return event_id
+        except storage.ConflictException as ex:
+            raise ConflictException(ex.conflicts)
+        except Exception as ex:
+            raise LogicException(f"Failed to create event: {ex}")
+
+    async def list(self, start: Optional[date] = None, end: Optional[date] = None) -> List[model.Event]:
+        _check_range(start, end)
+        try:
+            if start is None and end is None:
+                return await self._event_db.list()
+            return await self._event_db.list_range(start or date.min, end or date.max)
+        except Exception as ex:
+            raise LogicException(f"Failed to list events: {ex}")
+
+    async def page(self, limit: int, cursor: Optional[str] = None, start: Optional[date] = None,
+                   end: Optional[date] = None) -> Tuple[List[model.Event], Optional[str]]:
+        _check_limit(limit)
+        _check_range(start, end)
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            events = await self._event_db.list_range(start or date.min, end or date.max, after, limit + 1,
+                                                     start is not None or end is not None)
+        except Exception as ex:
+            raise LogicException(f"Failed to list events: {ex}")
+        if len(events) > limit:
+            return events[:limit], encode_cursor(events[limit - 1])
+        return events, None
+
+    async def iter_events(self, start: Optional[date] = None, end: Optional[date] = None,
+                          cursor: Optional[str] = None) -> AsyncIterator[model.Event]:
+        events, cursor = await self.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+        for event in events:
+            yield event
+        while cursor is not None:
+            events, cursor = await self.page(config.STREAM_CHUNK_SIZE, cursor, start, end)
+            for event in events:
+                yield event
+
+    async def read(self, event_id: str) -> model.Event:
+        try:
+            event = await self._event_db.read(event_id)
+            if event is None:
                 raise LogicException(f"Event with ID {event_id} not found")
-            return self._event_db.delete(event_id)
+            return event
+        except Exception as ex:
+            raise LogicException(f"Failed to read event: {ex}")
+
+    async def update(self, event_id: str, event: model.Event):
+        EventLogic._validate_event(event)
+        try:
+            if not await self._event_db.exists(event_id):
+                raise LogicException(f"Event with ID {event_id} not found")
+            await self._event_db.update(event_id, event)
+            await self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to update event: {ex}")
+
+    async def delete(self, event_id: str):
+        try:
+            if not await self._event_db.exists(event_id):
+                raise LogicException(f"Event with ID {event_id} not found")
+            await self._event_db.delete(event_id)
+            await self._wait_durable()
         except Exception as ex:
             raise LogicException(f"Failed to delete event: {ex}")
+
+    async def version(self):
+        try:
+            return await self._event_db.version()
+        except Exception as ex:
+            raise LogicException(f"Failed to get storage version: {ex}")
+
+    async def event_version(self, event_id: str):
+        try:
+            return await self._event_db.event_version(event_id)
+        except Exception as ex:
+            raise LogicException(f"Failed to get event version: {ex}")
+
+    async def changes(self, since: int, limit: Optional[int] = None):
+        if since < 0:
+            raise LogicException("Sequence number must not be negative")
+        limit = config.PAGE_DEFAULT_LIMIT if limit is None else limit
+        _check_limit(limit)
+        try:
+            return await self._event_db.changes(since, limit)
+        except Exception as ex:
+            raise LogicException(f"Failed to get changes: {ex}")
+
+    async def change_seq(self) -> Optional[int]:
+        try:
+            return await self._event_db.change_seq()
+        except Exception as ex:
+            raise LogicException(f"Failed to get changes: {ex}")
+
+    async def flushed(self):
+        try:
+            await self._event_db.flushed()
+        except Exception as ex:
+            raise LogicException(f"Failed to save changes: {ex}")
+
+    def add_listener(self, listener):
+        self._event_db.add_listener(listener)
+
+    def remove_listener(self, listener):
+        self._event_db.remove_listener(listener)
+
+    async def bulk_apply(self, operations: List[Tuple[str, str, Optional[model.Event]]]) -> List[Optional[LogicException]]:
+        results, valid = EventLogic._validate_operations(operations)
+        try:
+            applied = await self._event_db.bulk_apply([operations[position] for position in valid])
+            await self._wait_durable()
+        except Exception as ex:
+            raise LogicException(f"Failed to apply batch: {ex}")
+        for position, error in zip(valid, applied):
+            if error is not None:
+                results[position] = LogicException(str(error))
+        return results
+
+    async def bulk_create(self, events: List[model.Event]) -> List[Optional[LogicException]]:
+        return await self.bulk_apply([('create', event.id, event) for event in events])
+
+    async def bulk_update(self, events: List[Tuple[str, model.Event]]) -> List[Optional[LogicException]]:
+        return await self.bulk_apply([('update', event_id, event) for event_id, event in events])
+
+    async def bulk_delete(self, event_ids: List[str]) -> List[Optional[LogicException]]:
+        return await self.bulk_apply([('delete', event_id, None) for event_id in event_ids])
+
+    def close(self):
+        self._event_db.close()
@@ -0,0 +1,282 @@
+"""
+<EN>
+Memory-Mapped Storage for Event Management
+
+This module provides a LocalStorage variant that keeps events in a compact file with an ID offset index and maps
+the file into memory instead of decoding it at load time. Startup only parses the index, so workers are ready to
+serve at once, all processes share the same page cache, and an event is decoded the first time it is read.
+
+File layout:
+    b'CALMAP1\n', one compact JSON record per event, a JSON index line {"ids", "dates", "offsets", "series"},
+    and a 16-byte footer with the offset of the index followed by the magic again. A record spans from its offset
+    to the offset of the next record. The dates of the index are enough to build the date index; only recurring
+    series, listed by position in "series", are decoded at load time.
+
+Classes:
+    MappedStorage: LocalStorage variant that keeps events in a memory-mapped file decoded on demand.
+
+Methods:
+    __init__(file_path='storage.map', change_log_entries=10000): Initialize the MappedStorage with the specified file path.
+    _load_storage(): Map the storage file and read its index.
+    _save_storage(): Write a new storage file, copying the records of unchanged events without decoding them.
+    search(query: str, limit: int) -> List[Event]: Find events by word prefixes of the title and text. The first
+        search decodes every event to build the text index.
+    close(): Unmap the storage file.
+
+Exceptions:
+    StorageException: Raised for any errors occurring during storage operations.
+"""
+"""
+<RUS>
+Хранилище с отображением в память для управления событиями
+
+Этот модуль предоставляет вариант LocalStorage, который хранит события в компактном файле с индексом смещений по ID
+и отображает файл в память вместо декодирования при загрузке. При запуске разбирается только индекс, поэтому воркеры
+сразу готовы обслуживать запросы, все процессы разделяют один страничный кэш, а событие декодируется при первом
+чтении.
+
+Формат файла:
+    b'CALMAP1\n', по одной компактной JSON-записи на событие, строка JSON-индекса {"ids", "dates", "offsets",
+    "series"} и 16-байтовый хвост со смещением индекса, за которым снова следует сигнатура. Запись занимает байты от
+    своего смещения до смещения следующей записи. Дат индекса достаточно для построения индекса по дате; при загрузке
+    декодируются только повторяющиеся серии, перечисленные по позициям в "series".
+
+Классы:
+    MappedStorage: Вариант LocalStorage, хранящий события в отображенном в память файле с декодированием
+        по требованию.
+
+Методы:
+    __init__(file_path='storage.map', change_log_entries=10000): Инициализирует MappedStorage с указанным путем к файлу.
+    _load_storage(): Отображает файл хранилища в память и читает его индекс.
+    _save_storage(): Записывает новый файл хранилища, копируя записи неизмененных событий без декодирования.
+    search(query: str, limit: int) -> List[Event]: Находит события по префиксам слов заголовка и текста. Первый
+        поиск декодирует все события, чтобы построить текстовый индекс.
+    close(): Снимает отображение файла хранилища.
+
+Исключения:
+    StorageException: Возникает при любых ошибках операций с хранилищем.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import MutableMapping
+from operator import itemgetter
+from typing import Optional
+from model import Event
+from storage import LazyLocalStorage, StorageException
+import metrics
+
+MAGIC = b'CALMAP1\n'
+_FOOTER = struct.Struct('<Q8s')
+
+
+def _encode(event: Event) -> bytes:
+    return (json.dumps(event.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class _MappedEvents(MutableMapping):
+    # The event mapping of MappedStorage: dates and record positions of all events are in memory, events are
+    # decoded from the mapped file when first read. Changed events live in the cache until the next save.
+
+    def __init__(self, path: Optional[str] = None):
+        self._mm = None
+        self._dates = {}
+        self._records = {}
+        self._cache = {}
+        self.series = {}
+        if path is not None:
+            self._map(path)
+
+    def _map(self, path: str):
+        with open(path, 'rb') as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < len(MAGIC) + _FOOTER.size or mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+            mm.close()
+            raise StorageException(f"{path} is not a mapped storage file")
+        index_offset = _FOOTER.unpack(mm[-_FOOTER.size:])[0]
+        index = json.loads(mm[index_offset:-_FOOTER.size])
+        self._attach(mm, index['ids'], index['dates'], index['offsets'], index_offset)
+        self._cache = {}
+        self.series = {}
+        for position in index['series']:
+            event_id = index['ids'][position]
+            self.series[event_id] = self[event_id]
+
+    def _attach(self, mm, ids, dates, offsets, index_offset):
+        self._mm = mm
+        self._dates = dict(zip(ids, dates))
+        self._records = dict(zip(ids, zip(offsets, offsets[1:] + [index_offset])))
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def index_items(self):
+        return self._dates.items()
+
+    def __contains__(self, event_id) -> bool:
+        return event_id in self._dates
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __iter__(self):
+        return iter(self._dates)
+
+    def __getitem__(self, event_id: str) -> Event:
+        event = self._cache.get(event_id)
+        if event is None:
+            start, end = self._records[event_id]
+            # Readers may decode the same event concurrently; either result is the same immutable event.
+            event = self._cache[event_id] = Event.from_dict(json.loads(self._mm[start:end]))
+        return event
+
+    def __setitem__(self, event_id: str, event: Event):
+        self._dates[event_id] = event.date
+        self._cache[event_id] = event
+        self._records.pop(event_id, None)
+        if event.rrule is None:
+            self.series.pop(event_id, None)
+        else:
+            self.series[event_id] = event
+
+    def __delitem__(self, event_id: str):
+        del self._dates[event_id]
+        self._cache.pop(event_id, None)
+        self._records.pop(event_id, None)
+        self.series.pop(event_id, None)
+
+    def save(self, path: str) -> int:
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Records are kept in date order, so that sorting the date index on load is close to linear; the order of
+        # a loaded file is only disturbed by the events changed since, and sorting it again is cheap as well.
+        ordered = sorted(self._dates.items(), key=itemgetter(1, 0))
+        ids = [event_id for event_id, _ in ordered]
+        offsets = []
+        series = []
+        with open(temp_path, 'w+b') as file:
+            file.write(MAGIC)
+            position = len(MAGIC)
+            # Unchanged events are copied from the mapped file as they are, adjacent ones with a single write.
+            run = None
+            for number, event_id in enumerate(ids):
+                offsets.append(position)
+                record = self._records.get(event_id)
+                if record is not None:
+                    if run is not None and run[1] == record[0]:
+                        run[1] = record[1]
+                    else:
+                        if run is not None:
+                            file.write(self._mm[run[0]:run[1]])
+                        run = list(record)
+                    position += record[1] - record[0]
+                else:
+                    if run is not None:
+                        file.write(self._mm[run[0]:run[1]])
+                        run = None
+                    data = _encode(self._cache[event_id])
+                    file.write(data)
+                    position += len(data)
+                if event_id in self.series:
+                    series.append(number)
+            if run is not None:
+                file.write(self._mm[run[0]:run[1]])
+            index = {'ids': ids, 'dates': [value for _, value in ordered], 'offsets': offsets, 'series': series}
+            file.write(json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            file.write(_FOOTER.pack(position, MAGIC))
+            file.flush()
+            os.fsync(file.fileno())
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        os.replace(temp_path, path)
+        self.close()
+        # Decoded events are still valid and stay cached.
+        self._attach(mm, ids, index['dates'], offsets, position)
+        return len(mm)
+
+
+class MappedStorage(LazyLocalStorage):
+    def __init__(self, file_path='storage.map', change_log_entries=10000):
+        """
+        <EN>
+        Initialize the MappedStorage with the specified file path. The file is mapped read-only; a save writes
+        a new file, which replaces the old one atomically, and maps it instead, so readers in other processes keep
+        a consistent view of the old file until they notice the change.
+        Args:
+            file_path (str): Path to the storage file. Defaults to 'storage.map'.
+            change_log_entries (int): Number of changes the change log '<file_path>.changes' retains at least.
+        """
+        """
+        <RUS>
+        Инициализирует MappedStorage с указанным путем к файлу. Файл отображается только для чтения; сохранение
+        записывает новый файл, который атомарно заменяет старый, и отображает его вместо старого, поэтому читатели
+        в других процессах видят согласованное состояние старого файла, пока не заметят изменение.
+        Аргументы:
+            file_path (str): Путь к файлу хранилища. По умолчанию 'storage.map'.
+            change_log_entries (int): Количество изменений, которое журнал изменений '<file_path>.changes' хранит
+                как минимум.
+        """
+        self._storage = None
+        super().__init__(file_path, change_log_entries=change_log_entries)
+
+    @metrics.timed('storage', 'load')
+    def _load_storage(self):
+        """
+        <EN>
+        Map the storage file and read its index. If the file does not exist, create an empty storage.
+        Raises:
+            StorageException: If the file is not a mapped storage file.
+        """
+        """
+        <RUS>
+        Отображает файл хранилища в память и читает его индекс. Если файл не существует, создается пустое хранилище.
+        Вызывает:
+            StorageException: Если файл не является файлом отображаемого хранилища.
+        """
+        if self._storage is not None:
+            self._storage.close()
+        if not os.path.exists(self._file_path):
+            self._storage = _MappedEvents()
+            self._save_storage()
+        else:
+            self._storage = _MappedEvents(self._file_path)
+            self._signature = self._file_signature()
+
+    @metrics.timed('storage', 'save')
+    def _save_storage(self):
+        """
+        <EN>
+        Write a new storage file and map it. Records of events not changed since the last save are copied from the
+        old mapping without being decoded and encoded again.
+        Raises:
+            StorageException: If there is an error saving the storage.
+        """
+        """
+        <RUS>
+        Записывает новый файл хранилища и отображает его в память. Записи событий, не изменявшихся после последнего
+        сохранения, копируются из старого отображения без повторного декодирования и кодирования.
+        Вызывает:
+            StorageException: Если возникает ошибка при сохранении хранилища.
+        """
+        try:
+            written = self._storage.save(self._file_path)
+        except Exception as ex:
+            raise StorageException(f"Failed to save storage: {ex}")
+        self._signature = self._file_signature()
+        metrics.record_written('mapped', written)
+
+    def close(self):
+        """
+        <EN>
+        Unmap the storage file.
+        """
+        """
+        <RUS>
+        Снимает отображение файла хранилища.
+        """
+        with self._lock.write():
+            if self._storage is not None:
+                self._storage.close()
@@ -0,0 +1,361 @@
+"""
+<EN>
+Metrics and Timing Instrumentation
+
+This module collects operation timings and counters of every layer of the service (app routes, EventLogic, EventDB
+and the storage backends) and renders them in the Prometheus text exposition format. Timings recorded while a request
+is being handled are also collected per request, so they can be returned in a Server-Timing header.
+
+Instrumentation is enabled by config.METRICS or config.SERVER_TIMING. When both are disabled, timed() returns the
+decorated function unchanged, so instrumented code runs exactly as without instrumentation.
+
+Constants:
+    ENABLED (bool): Whether any instrumentation is active.
+    REGISTRY (Registry): The registry holding all metrics of the process.
+    OPERATION_SECONDS (Histogram): Duration of operations by layer and operation.
+    OPERATION_ERRORS (Counter): Number of operations that raised an exception, by layer and operation.
+    BYTES_WRITTEN (Counter): Number of bytes written to storage files, by backend.
+
+Classes:
+    Counter: A monotonically increasing counter with labels.
+    Histogram: A histogram of observed values with labels and fixed buckets.
+    Registry: A set of metrics and gauge callbacks rendered together.
+
+Functions:
+    timed(layer: str, operation: str): Decorator recording the duration of every call of the decorated function.
+    observe(layer: str, operation: str, seconds: float): Record the duration of an operation.
+    record_written(backend: str, size: int): Count bytes written to a storage file.
+    start_request(): Start collecting the timings of the current request.
+    finish_request(endpoint: str) -> Optional[str]: Record the duration of the current request and build its
+        Server-Timing header value.
+"""
+"""
+<RUS>
+Метрики и измерение времени
+
+Этот модуль собирает время выполнения операций и счетчики всех уровней сервиса (маршруты приложения, EventLogic,
+EventDB и бэкенды хранилища) и выводит их в текстовом формате Prometheus. Время, измеренное во время обработки
+запроса, дополнительно собирается для этого запроса, чтобы его можно было вернуть в заголовке Server-Timing.
+
+Измерения включаются настройками config.METRICS или config.SERVER_TIMING. Когда обе выключены, timed() возвращает
+декорируемую функцию без изменений, поэтому код выполняется точно так же, как без измерений.
+
+Константы:
+    ENABLED (bool): Включены ли какие-либо измерения.
+    REGISTRY (Registry): Реестр всех метрик процесса.
+    OPERATION_SECONDS (Histogram): Длительность операций по уровню и операции.
+    OPERATION_ERRORS (Counter): Количество операций, вызвавших исключение, по уровню и операции.
+    BYTES_WRITTEN (Counter): Количество байтов, записанных в файлы хранилища, по бэкенду.
+
+Классы:
+    Counter: Монотонно растущий счетчик с метками.
+    Histogram: Гистограмма наблюдаемых значений с метками и фиксированными интервалами.
+    Registry: Набор метрик и функций-датчиков, выводимых вместе.
+
+Функции:
+    timed(layer: str, operation: str): Декоратор, измеряющий длительность каждого вызова декорируемой функции.
+    observe(layer: str, operation: str, seconds: float): Записывает длительность операции.
+    record_written(backend: str, size: int): Учитывает байты, записанные в файл хранилища.
+    start_request(): Начинает сбор времени текущего запроса.
+    finish_request(endpoint: str) -> Optional[str]: Записывает длительность текущего запроса и строит значение его
+        заголовка Server-Timing.
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import config
+
+ENABLED = config.METRICS or config.SERVER_TIMING
+
+_DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                     5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        """
+        <EN>
+        Initialize a counter without samples.
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labels (Tuple[str, ...]): Names of the labels.
+        """
+        """
+        <RUS>
+        Инициализирует счетчик без значений.
+        Аргументы:
+            name (str): Имя метрики.
+            documentation (str): Текст справки.
+            labels (Tuple[str, ...]): Имена меток.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = _DURATION_BUCKETS):
+        """
+        <EN>
+        Initialize a histogram without samples. Every label combination keeps one count per bucket, the sum and the
+        number of observations; cumulative bucket counts are only computed when rendering.
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labels (Tuple[str, ...]): Names of the labels.
+            buckets (Tuple[float, ...]): Ascending upper bounds of the buckets.
+        """
+        """
+        <RUS>
+        Инициализирует гистограмму без значений. Каждая комбинация меток хранит по одному счетчику на интервал, сумму
+        и количество наблюдений; накопленные значения интервалов вычисляются только при выводе.
+        Аргументы:
+            name (str): Имя метрики.
+            documentation (str): Текст справки.
+            labels (Tuple[str, ...]): Имена меток.
+            buckets (Tuple[float, ...]): Возрастающие верхние границы интервалов.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][position] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count)
+                            in self._values.items())
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        """
+        <EN>
+        Initialize an empty registry.
+        """
+        """
+        <RUS>
+        Инициализирует пустой реестр.
+        """
+        self._metrics = []
+        self._gauges: Dict[str, Tuple[str, Callable[[], Optional[float]]]] = {}
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], Optional[float]]):
+        """
+        <EN>
+        Register a gauge whose value is read from the callback when the metrics are rendered, so the measured
+        component does nothing between scrapes. Registering a name again replaces its callback.
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            callback (Callable[[], Optional[float]]): Returns the current value, or None to omit the gauge.
+        """
+        """
+        <RUS>
+        Регистрирует датчик, значение которого считывается из функции при выводе метрик, поэтому измеряемый
+        компонент ничего не делает между опросами. Повторная регистрация имени заменяет функцию.
+        Аргументы:
+            name (str): Имя метрики.
+            documentation (str): Текст справки.
+            callback (Callable[[], Optional[float]]): Возвращает текущее значение или None, чтобы пропустить датчик.
+        """
+        self._gauges[name] = (documentation, callback)
+
+    def render(self) -> str:
+        """
+        <EN>
+        Render all metrics in the Prometheus text exposition format.
+        Returns:
+            str: The rendered metrics.
+        """
+        """
+        <RUS>
+        Выводит все метрики в текстовом формате Prometheus.
+        Возвращает:
+            str: Выведенные метрики.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, (documentation, callback) in self._gauges.items():
+            value = callback()
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+OPERATION_SECONDS = REGISTRY.histogram('calendar_operation_duration_seconds',
+                                       'Duration of calendar operations by layer.', ('layer', 'operation'))
+OPERATION_ERRORS = REGISTRY.counter('calendar_operation_errors_total',
+                                    'Calendar operations that raised an exception.', ('layer', 'operation'))
+BYTES_WRITTEN = REGISTRY.counter('calendar_storage_written_bytes_total',
+                                 'Bytes written to storage files.', ('backend',))
+
+
+class _RequestTimings:
+    __slots__ = ('start', 'entries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.entries: List[Tuple[str, float]] = []
+
+
+_request_timings: ContextVar[Optional[_RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def observe(layer: str, operation: str, seconds: float):
+    OPERATION_SECONDS.observe((layer, operation), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.entries.append((f"{layer}.{operation}", seconds))
+
+
+def timed(layer: str, operation: str):
+    """
+    <EN>
+    Decorator recording the duration of every call of the decorated function as an operation of the layer,
+    and counting the calls that raise. With instrumentation disabled, the function is returned unchanged.
+    Args:
+        layer (str): The layer the operation belongs to ('app', 'logic', 'db' or 'storage').
+        operation (str): The name of the operation.
+    """
+    """
+    <RUS>
+    Декоратор, записывающий длительность каждого вызова декорируемой функции как операции уровня и считающий
+    вызовы, завершившиеся исключением. При выключенных измерениях функция возвращается без изменений.
+    Аргументы:
+        layer (str): Уровень, к которому относится операция ('app', 'logic', 'db' или 'storage').
+        operation (str): Имя операции.
+    """
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                OPERATION_ERRORS.inc((layer, operation))
+                raise
+            finally:
+                observe(layer, operation, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def record_written(backend: str, size: int):
+    if ENABLED:
+        BYTES_WRITTEN.inc((backend,), size)
+
+
+def start_request():
+    _request_timings.set(_RequestTimings())
+
+
+def finish_request(endpoint: str) -> Optional[str]:
+    """
+    <EN>
+    Record the duration of the current request as an 'app' operation named after its endpoint and stop collecting
+    its timings.
+    Args:
+        endpoint (str): The name of the route that handled the request.
+    Returns:
+        Optional[str]: The Server-Timing header value listing the total time of every operation performed during the
+            request in milliseconds, or None if Server-Timing is disabled or start_request() was not called.
+    """
+    """
+    <RUS>
+    Записывает длительность текущего запроса как операцию уровня 'app' с именем его маршрута и прекращает сбор его
+    времени.
+    Аргументы:
+        endpoint (str): Имя маршрута, обработавшего запрос.
+    Возвращает:
+        Optional[str]: Значение заголовка Server-Timing с суммарным временем каждой операции, выполненной во время
+            запроса, в миллисекундах, или None, если Server-Timing выключен или start_request() не вызывался.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    _request_timings.set(None)
+    elapsed = time.perf_counter() - timings.start
+    OPERATION_SECONDS.observe(('app', endpoint), elapsed)
+    if not config.SERVER_TIMING:
+        return None
+    totals: Dict[str, float] = {}
+    for name, seconds in timings.entries:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in totals.items()]
+    parts.append(f"total;dur={elapsed * 1000:.3f}")
+    return ', '.join(parts)
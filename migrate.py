@@ -0,0 +1,81 @@
+"""
+<EN>
+Storage Migration Tool
+
+This script imports the events of an existing JSON storage file into an SQLite database in a single transaction,
+or into the storage of the 'sharded' or 'mapped' backend with a single save.
+
+Usage:
+    python migrate.py [--backend sqlite|sharded|mapped] [source] [target]
+Arguments:
+    --backend: Target backend. Defaults to 'sqlite'.
+    source: Path to the JSON storage file. Defaults to 'storage.json'.
+    target: Path to the target storage. Defaults to the default path of the backend, for example 'storage.db'.
+"""
+"""
+<RUS>
+Инструмент миграции хранилища
+
+Этот скрипт импортирует события существующего JSON-файла хранилища в базу данных SQLite в одной транзакции
+или в хранилище бэкенда 'sharded' или 'mapped' одним сохранением.
+
+Использование:
+    python migrate.py [--backend sqlite|sharded|mapped] [source] [target]
+Аргументы:
+    --backend: Целевой бэкенд. По умолчанию 'sqlite'.
+    source: Путь к JSON-файлу хранилища. По умолчанию 'storage.json'.
+    target: Путь к целевому хранилищу. По умолчанию путь бэкенда по умолчанию, например 'storage.db'.
+"""
+
+import argparse
+import json
+import sys
+from db import create_storage
+from model import Event
+from sqlite_storage import SQLiteStorage
+from storage import StorageException
+import config
+
+
+def migrate_json_to_sqlite(source: str, target: str) -> int:
+    with open(source, 'r', encoding='utf-8') as file:
+        events = json.load(file)
+    storage = SQLiteStorage(target)
+    try:
+        return storage.bulk_import(events.values())
+    finally:
+        storage.close()
+
+
+def migrate_json_to_storage(source: str, target: str, backend: str) -> int:
+    with open(source, 'r', encoding='utf-8') as file:
+        events = [Event.from_dict(data) for data in json.load(file).values()]
+    storage = create_storage(backend, target)
+    try:
+        errors = storage.apply_batch([('create', event.id, event) for event in events])
+    finally:
+        storage.close()
+    return errors.count(None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import a JSON event storage into another storage backend")
+    parser.add_argument('--backend', choices=('sqlite', 'sharded', 'mapped'), default='sqlite', help="target backend")
+    parser.add_argument('source', nargs='?', default='storage.json', help="JSON storage file")
+    parser.add_argument('target', nargs='?', help="target storage path")
+    args = parser.parse_args(argv)
+    target = args.target or config.DEFAULT_STORAGE_PATHS[args.backend]
+    try:
+        if args.backend == 'sqlite':
+            count = migrate_json_to_sqlite(args.source, target)
+        else:
+            count = migrate_json_to_storage(args.source, target, args.backend)
+    except (OSError, ValueError, StorageException) as ex:
+        print(f"Migration failed: {ex}", file=sys.stderr)
+        return 1
+    print(f"Imported {count} events into {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
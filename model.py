@@ -3,13 +3,28 @@
 Event Data Model
 
 This module defines a data model for an event using the dataclass decorator. It includes methods for converting
-an event instance to a dictionary and creating an event instance from a dictionary.
+an event instance to a dictionary and creating an event instance from a dictionary. Events are immutable and slotted,
+so the storage keeps them as they are and hands the same instances to every reader.
 
 Classes:
-    Event: A dataclass representing an event with attributes for ID, date, title, and text.
+    Event: A frozen, slotted dataclass representing an event with attributes for ID, date, title, and text.
+        A recurring event (a series) additionally has an RRULE recurrence rule and the dates of its cancelled
+        occurrences; its date is the date of the first occurrence. A timed event additionally has start and end
+        datetimes in the YYYY-MM-DDTHH:MM format, in the local time of the calendar; the start lies on its date.
+
+Constants:
+    EVENT_FIELDS (tuple): Names of the fields of an event in its JSON representation.
+
+Functions:
+    parse_date(value: str) -> date: Parses an event date in the YYYY-MM-DD format.
+    parse_datetime(value: str) -> datetime: Parses an event start or end in the YYYY-MM-DDTHH:MM[:SS] format.
+    parse_fields(value: str) -> Optional[Tuple[str, ...]]: Parses a comma-separated field projection.
+    events_to_json(events, fields=None) -> str: Serializes a sequence of events to a JSON array.
 
 Methods:
     to_dict() -> dict: Converts the Event instance to a dictionary.
+    to_json(fields=None) -> str: Serializes the Event instance, or some of its fields, directly to JSON.
+    occurrence(day: date) -> Event: Creates the occurrence of a series on the given day.
     from_dict(data: dict) -> Event: Creates an Event instance from a dictionary.
 """
 """
@@ -17,46 +32,235 @@ Methods:
 Модель данных события
 
 Этот модуль определяет модель данных для события, используя декоратор dataclass. Он включает методы для преобразования
-экземпляра события в словарь и создания экземпляра события из словаря.
+экземпляра события в словарь и создания экземпляра события из словаря. События неизменяемы и используют слоты, поэтому
+хранилище держит их как есть и отдает одни и те же экземпляры всем читателям.
 
 Классы:
-    Event: Dataclass, представляющий событие с атрибутами для ID, даты, заголовка и текста.
+    Event: Неизменяемый dataclass со слотами, представляющий событие с атрибутами для ID, даты, заголовка и текста.
+        Повторяющееся событие (серия) дополнительно содержит правило повторения RRULE и даты отмененных повторений;
+        его дата — дата первого повторения. Событие со временем дополнительно содержит время начала и окончания
+        в формате YYYY-MM-DDTHH:MM по местному времени календаря; начало приходится на его дату.
+
+Константы:
+    EVENT_FIELDS (tuple): Имена полей события в его JSON-представлении.
+
+Функции:
+    parse_date(value: str) -> date: Разбирает дату события в формате YYYY-MM-DD.
+    parse_datetime(value: str) -> datetime: Разбирает начало или окончание события в формате YYYY-MM-DDTHH:MM[:SS].
+    parse_fields(value: str) -> Optional[Tuple[str, ...]]: Разбирает список выбираемых полей через запятую.
+    events_to_json(events, fields=None) -> str: Сериализует последовательность событий в JSON-массив.
 
 Методы:
     to_dict() -> dict: Преобразует экземпляр Event в словарь.
+    to_json(fields=None) -> str: Сериализует экземпляр Event или часть его полей непосредственно в JSON.
+    occurrence(day: date) -> Event: Создает повторение серии в указанный день.
     from_dict(data: dict) -> Event: Создает экземпляр Event из словаря.
 """
 
+import re
+import sys
 from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from json.encoder import encode_basestring_ascii
+
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2})?')
+EVENT_FIELDS = ('date', 'end', 'exdates', 'id', 'rrule', 'start', 'text', 'title')
+
+def parse_date(value: str) -> date:
+    """
+    <EN>
+    Parse an event date in the YYYY-MM-DD format.
+
+    Args:
+        value (str): The date string.
+
+    Returns:
+        date: The parsed date.
+
+    Raises:
+        ValueError: If the string is not a valid date in the YYYY-MM-DD format.
+    """
+    """
+    <RUS>
+    Разбирает дату события в формате YYYY-MM-DD.
+
+    Аргументы:
+        value (str): Строка с датой.
+
+    Возвращает:
+        date: Разобранная дата.
+
+    Вызывает:
+        ValueError: Если строка не является корректной датой в формате YYYY-MM-DD.
+    """
+    if not isinstance(value, str) or not _DATE_RE.fullmatch(value):
+        raise ValueError(f"invalid date {value!r}, expected YYYY-MM-DD")
+    return date.fromisoformat(value)
+
+def parse_datetime(value: str) -> datetime:
+    """
+    <EN>
+    Parse an event start or end in the YYYY-MM-DDTHH:MM or YYYY-MM-DDTHH:MM:SS format. Times carry no time zone:
+    they are in the local time of the calendar.
+
+    Args:
+        value (str): The datetime string.
+
+    Returns:
+        datetime: The parsed naive datetime.
+
+    Raises:
+        ValueError: If the string is not a valid datetime in the expected format.
+    """
+    """
+    <RUS>
+    Разбирает начало или окончание события в формате YYYY-MM-DDTHH:MM или YYYY-MM-DDTHH:MM:SS. Время указывается
+    без часового пояса — по местному времени календаря.
 
-@dataclass
+    Аргументы:
+        value (str): Строка с датой и временем.
+
+    Возвращает:
+        datetime: Разобранные дата и время без часового пояса.
+
+    Вызывает:
+        ValueError: Если строка не является корректными датой и временем в ожидаемом формате.
+    """
+    if not isinstance(value, str) or not _DATETIME_RE.fullmatch(value):
+        raise ValueError(f"invalid datetime {value!r}, expected YYYY-MM-DDTHH:MM")
+    return datetime.fromisoformat(value)
+
+@dataclass(frozen=True, slots=True)
 class Event:
     id: str
     date: str
     title: str
     text: str
+    rrule: Optional[str] = None
+    exdates: Tuple[str, ...] = ()
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    def __post_init__(self):
+        # Many events share a date, so equal date strings are stored once.
+        if isinstance(self.date, str):
+            object.__setattr__(self, 'date', sys.intern(self.date))
+        if not isinstance(self.exdates, tuple):
+            object.__setattr__(self, 'exdates', tuple(self.exdates))
 
     def to_dict(self):
         """
         <EN>
-        Convert the Event instance to a dictionary.
+        Convert the Event instance to a dictionary. The recurrence fields are only present for a series
+        and the start and end only for a timed event, so other events are stored exactly as before.
 
         Returns:
             dict: A dictionary representation of the Event instance.
         """
         """
         <RUS>
-        Преобразует экземпляр Event в словарь.
+        Преобразует экземпляр Event в словарь. Поля повторения присутствуют только у серии, а начало и окончание —
+        только у события со временем, поэтому остальные события сохраняются точно так же, как раньше.
 
         Возвращает:
             dict: Словарное представление экземпляра Event.
         """
-        return {
+        data = {
             'id': self.id,
             'date': self.date,
             'title': self.title,
             'text': self.text
         }
+        if self.rrule is not None:
+            data['rrule'] = self.rrule
+        if self.exdates:
+            data['exdates'] = list(self.exdates)
+        if self.start is not None:
+            data['start'] = self.start
+            data['end'] = self.end
+        return data
+
+    def to_json(self, fields: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        <EN>
+        Serialize the Event instance directly to JSON without building an intermediate dictionary.
+        The output is identical to json.dumps(self.to_dict(), sort_keys=True), the format used by the API.
+
+        Args:
+            fields (Optional[Tuple[str, ...]]): Sorted names of the fields to include, as returned by parse_fields,
+                or None for all fields. Recurrence fields are omitted for events that do not recur and the start
+                and end for events without a time, as usual.
+
+        Returns:
+            str: The JSON representation of the Event instance.
+        """
+        """
+        <RUS>
+        Сериализует экземпляр Event непосредственно в JSON без построения промежуточного словаря.
+        Результат совпадает с json.dumps(self.to_dict(), sort_keys=True) — форматом, используемым API.
+
+        Аргументы:
+            fields (Optional[Tuple[str, ...]]): Отсортированные имена включаемых полей, как их возвращает
+                parse_fields, или None для всех полей. Поля повторения, как обычно, опускаются у неповторяющихся
+                событий, а начало и окончание — у событий без времени.
+
+        Возвращает:
+            str: JSON-представление экземпляра Event.
+        """
+        if fields is not None:
+            parts = []
+            for name in fields:
+                value = getattr(self, name)
+                if name == 'exdates':
+                    if value:
+                        parts.append(f'"exdates": [{", ".join(map(encode_basestring_ascii, value))}]')
+                elif value is not None:
+                    parts.append(f'"{name}": {encode_basestring_ascii(value)}')
+            return f"{{{', '.join(parts)}}}"
+        if self.rrule is None and not self.exdates and self.start is None:
+            return (f'{{"date": {encode_basestring_ascii(self.date)}, "id": {encode_basestring_ascii(self.id)}, '
+                    f'"text": {encode_basestring_ascii(self.text)}, "title": {encode_basestring_ascii(self.title)}}}')
+        end = f'"end": {encode_basestring_ascii(self.end)}, ' if self.end is not None else ''
+        exdates = f'"exdates": [{", ".join(map(encode_basestring_ascii, self.exdates))}], ' if self.exdates else ''
+        rrule = f'"rrule": {encode_basestring_ascii(self.rrule)}, ' if self.rrule is not None else ''
+        start = f'"start": {encode_basestring_ascii(self.start)}, ' if self.start is not None else ''
+        return (f'{{"date": {encode_basestring_ascii(self.date)}, {end}{exdates}'
+                f'"id": {encode_basestring_ascii(self.id)}, {rrule}{start}'
+                f'"text": {encode_basestring_ascii(self.text)}, "title": {encode_basestring_ascii(self.title)}}}')
+
+    def occurrence(self, day: date) -> 'Event':
+        """
+        <EN>
+        Create the occurrence of a series on the given day. The occurrence keeps the ID and the rule of its series,
+        so clients can tell it apart from a single event and address the series with it. The start and end of a
+        timed series are moved to the day of the occurrence.
+
+        Args:
+            day (date): The date of the occurrence.
+
+        Returns:
+            Event: The occurrence.
+        """
+        """
+        <RUS>
+        Создает повторение серии в указанный день. Повторение сохраняет ID и правило своей серии, поэтому клиенты
+        могут отличить его от одиночного события и обратиться через него к серии. Начало и окончание серии
+        со временем переносятся на день повторения.
+
+        Аргументы:
+            day (date): Дата повторения.
+
+        Возвращает:
+            Event: Повторение.
+        """
+        if self.start is None:
+            return Event(id=self.id, date=day.isoformat(), title=self.title, text=self.text, rrule=self.rrule)
+        # Only the date parts move, so an occurrence keeps the time of day and the duration of its series.
+        shift = day - date.fromisoformat(self.date)
+        return Event(id=self.id, date=day.isoformat(), title=self.title, text=self.text, rrule=self.rrule,
+                     start=_shift(self.start, shift), end=_shift(self.end, shift))
 
     @staticmethod
     def from_dict(data):
@@ -81,5 +285,70 @@ class Event:
             id=data['id'],
             date=data['date'],
             title=data['title'],
-            text=data['text']
+            text=data['text'],
+            rrule=data.get('rrule'),
+            exdates=data.get('exdates', ()),
+            start=data.get('start'),
+            end=data.get('end')
         )
+
+def _shift(value: str, shift: timedelta) -> str:
+    return (date.fromisoformat(value[:10]) + shift).isoformat() + value[10:]
+
+def parse_fields(value: str) -> Optional[Tuple[str, ...]]:
+    """
+    <EN>
+    Parse a comma-separated field projection such as 'id,date,title'.
+
+    Args:
+        value (str): The field names.
+
+    Returns:
+        Optional[Tuple[str, ...]]: The distinct field names in sorted order, or None if every field is requested.
+
+    Raises:
+        ValueError: If a name is not a field of an event or no field is given.
+    """
+    """
+    <RUS>
+    Разбирает список выбираемых полей через запятую, например 'id,date,title'.
+
+    Аргументы:
+        value (str): Имена полей.
+
+    Возвращает:
+        Optional[Tuple[str, ...]]: Различные имена полей в отсортированном порядке или None, если запрошены все поля.
+
+    Вызывает:
+        ValueError: Если имя не является полем события или не указано ни одного поля.
+    """
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    if not fields or not fields.issubset(EVENT_FIELDS):
+        raise ValueError(f"Invalid fields: {value}")
+    # Sorted names keep the keys in the order of the full representation and give equal projections one cache key.
+    return None if len(fields) == len(EVENT_FIELDS) else tuple(sorted(fields))
+
+def events_to_json(events, fields: Optional[Tuple[str, ...]] = None) -> str:
+    """
+    <EN>
+    Serialize a sequence of events to a JSON array using Event.to_json().
+
+    Args:
+        events (Iterable[Event]): The events to serialize.
+        fields (Optional[Tuple[str, ...]]): Fields to include, as returned by parse_fields, or None for all fields.
+
+    Returns:
+        str: The JSON array.
+    """
+    """
+    <RUS>
+    Сериализует последовательность событий в JSON-массив с помощью Event.to_json().
+
+    Аргументы:
+        events (Iterable[Event]): События для сериализации.
+        fields (Optional[Tuple[str, ...]]): Включаемые поля, как их возвращает parse_fields, или None для всех полей.
+
+    Возвращает:
+        str: JSON-массив.
+    """
+    return f"[{', '.join(event.to_json(fields) for event in events)}]"
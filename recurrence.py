@@ -0,0 +1,313 @@
+"""
+<EN>
+Recurrence Rules
+
+This module parses the subset of iCalendar (RFC 5545) RRULE recurrence rules supported by the calendar and expands
+a recurring series into the dates of its occurrences. Expansion is lazy and starts at the requested window instead of
+at the first occurrence whenever the rule allows it, so the cost of a query depends on the size of the window and not
+on the age of the series.
+
+Supported rule parts:
+    FREQ (DAILY, WEEKLY, MONTHLY or YEARLY), INTERVAL, COUNT, UNTIL (YYYYMMDD or YYYY-MM-DD) and, for weekly rules,
+    BYDAY (MO, TU, WE, TH, FR, SA, SU). Monthly and yearly occurrences fall on the day of the month of the first
+    occurrence; months without that day are skipped, as RFC 5545 requires.
+
+Classes:
+    Rule: A parsed recurrence rule.
+
+Functions:
+    parse_rule(text: str) -> Rule: Parse an RRULE string.
+    occurrences(first: date, rule: Rule, start: date, end: date, exdates=()) -> Iterator[date]: Dates of the
+        occurrences of a series within a window.
+    last_occurrence(first: date, rule: Rule) -> Optional[date]: Upper bound of the occurrence dates of a series.
+    max_count(rule: Rule) -> int: Upper bound of the number of occurrences of a rule within the expansion horizon.
+"""
+"""
+<RUS>
+Правила повторения
+
+Этот модуль разбирает поддерживаемое календарем подмножество правил повторения RRULE из iCalendar (RFC 5545)
+и разворачивает повторяющуюся серию в даты ее повторений. Развертывание ленивое и, когда правило это позволяет,
+начинается с запрошенного окна, а не с первого повторения, поэтому стоимость запроса зависит от размера окна,
+а не от возраста серии.
+
+Поддерживаемые части правила:
+    FREQ (DAILY, WEEKLY, MONTHLY или YEARLY), INTERVAL, COUNT, UNTIL (YYYYMMDD или YYYY-MM-DD) и, для еженедельных
+    правил, BYDAY (MO, TU, WE, TH, FR, SA, SU). Ежемесячные и ежегодные повторения приходятся на число месяца первого
+    повторения; месяцы без такого числа пропускаются, как требует RFC 5545.
+
+Классы:
+    Rule: Разобранное правило повторения.
+
+Функции:
+    parse_rule(text: str) -> Rule: Разбирает строку RRULE.
+    occurrences(first: date, rule: Rule, start: date, end: date, exdates=()) -> Iterator[date]: Даты повторений
+        серии в окне.
+    last_occurrence(first: date, rule: Rule) -> Optional[date]: Верхняя граница дат повторений серии.
+    max_count(rule: Rule) -> int: Верхняя граница количества повторений правила в пределах горизонта развертывания.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Collection, Iterator, List, Optional, Tuple
+import config
+
+_FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+_WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[date] = None
+    byday: Tuple[int, ...] = ()
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text: str) -> Rule:
+    """
+    <EN>
+    Parse an RRULE string such as 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20241231'.
+    An optional 'RRULE:' prefix is accepted. Parsed rules are cached, since series share a few common rules.
+
+    Args:
+        text (str): The recurrence rule.
+
+    Returns:
+        Rule: The parsed rule.
+
+    Raises:
+        ValueError: If the rule is malformed or uses an unsupported part.
+    """
+    """
+    <RUS>
+    Разбирает строку RRULE, например 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20241231'.
+    Допускается необязательный префикс 'RRULE:'. Разобранные правила кэшируются, так как серии используют
+    немногие распространенные правила.
+
+    Аргументы:
+        text (str): Правило повторения.
+
+    Возвращает:
+        Rule: Разобранное правило.
+
+    Вызывает:
+        ValueError: Если правило некорректно или использует неподдерживаемую часть.
+    """
+    if not isinstance(text, str):
+        raise ValueError("recurrence rule must be a string")
+    body = text.strip()
+    if body.upper().startswith('RRULE:'):
+        body = body[6:]
+    parts = {}
+    for part in body.split(';'):
+        name, separator, value = part.partition('=')
+        name = name.strip().upper()
+        if not separator or not value or name in parts:
+            raise ValueError(f"invalid rule part {part!r}")
+        parts[name] = value.strip().upper()
+    freq = parts.pop('FREQ', None)
+    if freq not in _FREQUENCIES:
+        raise ValueError(f"unsupported frequency {freq!r}")
+    interval = _positive(parts.pop('INTERVAL', '1'), 'INTERVAL')
+    count = parts.pop('COUNT', None)
+    count = _positive(count, 'COUNT') if count is not None else None
+    until = parts.pop('UNTIL', None)
+    if until is not None:
+        until = date.fromisoformat(until[:10] if '-' in until else f"{until[:4]}-{until[4:6]}-{until[6:8]}")
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL are mutually exclusive")
+    byday = parts.pop('BYDAY', None)
+    if byday is not None:
+        if freq != 'WEEKLY':
+            raise ValueError("BYDAY is supported for weekly rules only")
+        try:
+            byday = tuple(sorted({_WEEKDAYS.index(day.strip()) for day in byday.split(',')}))
+        except ValueError:
+            raise ValueError(f"invalid BYDAY value {byday!r}")
+    if parts:
+        raise ValueError(f"unsupported rule parts {', '.join(sorted(parts))}")
+    return Rule(freq=freq, interval=interval, count=count, until=until, byday=byday or ())
+
+
+def _positive(value: str, name: str) -> int:
+    if not value.isdigit() or int(value) == 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return int(value)
+
+
+def _months_between(first: date, day: date) -> int:
+    return (day.year - first.year) * 12 + day.month - first.month
+
+
+def _first_period(first: date, rule: Rule, start: date) -> int:
+    # Index of the first period that can contain an occurrence on or after 'start'.
+    if start <= first:
+        return 0
+    if rule.freq == 'DAILY':
+        return (start - first).days // rule.interval
+    if rule.freq == 'WEEKLY':
+        week = first - timedelta(days=first.weekday())
+        return (start - week).days // (7 * rule.interval)
+    if rule.freq == 'MONTHLY':
+        return _months_between(first, start) // rule.interval
+    return (start.year - first.year) // rule.interval
+
+
+def _period(first: date, rule: Rule, index: int) -> List[date]:
+    # Occurrence candidates of one period in ascending order; empty if the day does not exist in that period.
+    step = index * rule.interval
+    if rule.freq == 'DAILY':
+        return [first + timedelta(days=step)]
+    if rule.freq == 'WEEKLY':
+        week = first - timedelta(days=first.weekday() - 7 * step)
+        return [week + timedelta(days=weekday) for weekday in rule.byday or (first.weekday(),)]
+    if rule.freq == 'MONTHLY':
+        year, month = divmod(first.month - 1 + step, 12)
+        year, month = first.year + year, month + 1
+    else:
+        year, month = first.year + step, first.month
+    try:
+        return [date(year, month, first.day)]
+    except ValueError:
+        if year > date.max.year:
+            raise OverflowError("date value out of range")
+        return []
+
+
+def last_occurrence(first: date, rule: Rule) -> Optional[date]:
+    """
+    <EN>
+    Get an upper bound of the occurrence dates of a series: the UNTIL date, the date of the last counted occurrence,
+    or the end of the expansion horizon of a series without an end (config.RECURRENCE_HORIZON_DAYS after the first
+    occurrence).
+
+    Args:
+        first (date): Date of the first occurrence.
+        rule (Rule): The recurrence rule of the series.
+
+    Returns:
+        Optional[date]: The last date an occurrence may fall on, or None if the series has no occurrences at all.
+    """
+    """
+    <RUS>
+    Получает верхнюю границу дат повторений серии: дату UNTIL, дату последнего отсчитанного повторения или конец
+    горизонта развертывания серии без окончания (config.RECURRENCE_HORIZON_DAYS после первого повторения).
+
+    Аргументы:
+        first (date): Дата первого повторения.
+        rule (Rule): Правило повторения серии.
+
+    Возвращает:
+        Optional[date]: Последняя дата, на которую может прийтись повторение, или None, если у серии нет повторений.
+    """
+    try:
+        horizon = first + timedelta(days=config.RECURRENCE_HORIZON_DAYS)
+    except OverflowError:
+        horizon = date.max
+    if rule.count is not None:
+        last = None
+        for last in occurrences(first, rule, first, horizon):
+            pass
+        return last
+    if rule.until is not None:
+        return min(rule.until, horizon) if rule.until >= first else None
+    return horizon
+
+
+def occurrences(first: date, rule: Rule, start: date, end: date,
+                exdates: Collection[date] = ()) -> Iterator[date]:
+    """
+    <EN>
+    Lazily generate the dates of the occurrences of a series that fall within a window, in ascending order.
+    The first occurrence is always the date of the series itself. Rules without COUNT jump straight to the window;
+    rules with COUNT are counted from the first occurrence, which is bounded by COUNT. Like last_occurrence(), every
+    series, whatever its COUNT or UNTIL, is expanded no further than config.RECURRENCE_HORIZON_DAYS after its first
+    occurrence.
+
+    Args:
+        first (date): Date of the first occurrence.
+        rule (Rule): The recurrence rule of the series.
+        start (date): First day of the window, inclusive.
+        end (date): Last day of the window, inclusive.
+        exdates (Collection[date]): Dates of cancelled occurrences, which are skipped.
+
+    Yields:
+        date: Dates of the occurrences within the window.
+    """
+    """
+    <RUS>
+    Лениво порождает даты повторений серии, попадающие в окно, в порядке возрастания.
+    Первое повторение — всегда дата самой серии. Правила без COUNT сразу переходят к окну; правила с COUNT
+    отсчитываются от первого повторения, что ограничено значением COUNT. Как и в last_occurrence(), любая серия,
+    каковы бы ни были ее COUNT и UNTIL, разворачивается не дальше чем на config.RECURRENCE_HORIZON_DAYS после
+    первого повторения.
+
+    Аргументы:
+        first (date): Дата первого повторения.
+        rule (Rule): Правило повторения серии.
+        start (date): Первый день окна включительно.
+        end (date): Последний день окна включительно.
+        exdates (Collection[date]): Даты отмененных повторений, которые пропускаются.
+
+    Порождает:
+        date: Даты повторений в окне.
+    """
+    if rule.until is not None:
+        end = min(end, rule.until)
+    try:
+        end = min(end, first + timedelta(days=config.RECURRENCE_HORIZON_DAYS))
+    except OverflowError:
+        pass
+    if end < first or end < start:
+        return
+    remaining = rule.count
+    index = 0 if remaining is not None else _first_period(first, rule, start)
+    try:
+        while True:
+            for day in _period(first, rule, index):
+                if day < first:
+                    continue
+                if day > end:
+                    return
+                if remaining is not None:
+                    if remaining == 0:
+                        return
+                    remaining -= 1
+                if day >= start and day not in exdates:
+                    yield day
+            index += 1
+    except OverflowError:
+        return
+
+
+def max_count(rule: Rule) -> int:
+    """
+    <EN>
+    Get an upper bound of the number of occurrences a rule can have within config.RECURRENCE_HORIZON_DAYS of its first
+    occurrence, whatever that date is. A larger COUNT could never be reached, since a series is expanded no further.
+
+    Args:
+        rule (Rule): The recurrence rule.
+
+    Returns:
+        int: The largest number of occurrences within the horizon.
+    """
+    """
+    <RUS>
+    Получает верхнюю границу количества повторений, которое правило может иметь в пределах
+    config.RECURRENCE_HORIZON_DAYS от первого повторения, какой бы ни была его дата. Большее значение COUNT никогда
+    не было бы достигнуто, так как серия дальше не разворачивается.
+
+    Аргументы:
+        rule (Rule): Правило повторения.
+
+    Возвращает:
+        int: Наибольшее количество повторений в пределах горизонта.
+    """
+    # The shortest month and year make the bound safe for every first date.
+    period_days = {'DAILY': 1, 'WEEKLY': 7, 'MONTHLY': 28, 'YEARLY': 365}[rule.freq] * rule.interval
+    return (config.RECURRENCE_HORIZON_DAYS // period_days + 1) * max(len(rule.byday), 1)
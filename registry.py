@@ -0,0 +1,282 @@
+"""
+<EN>
+Calendar Registry
+
+This module keeps the storages of the calendar namespaces served under /api/v1/calendars/<calendar_id>/. Every
+calendar has its own storage in a directory of its own under CALENDARS_PATH, with the configured backend, so writes
+to different calendars never contend on the same file, lock or in-memory index. A calendar is opened on its first
+request and kept open while it is used; once more than CALENDARS_MAX_OPEN calendars are open, the least recently
+used idle ones are closed, so hot calendars stay in memory while cold ones cost nothing but their files.
+
+Classes:
+    RegistryException: Custom exception class for errors opening a calendar.
+    Calendar: Named tuple (event_db, logic, response_cache) of an open calendar.
+    CalendarRegistry: LRU registry of open calendars.
+
+Functions:
+    check_calendar_id(calendar_id: str): Check that a calendar ID is safe to use as a directory name.
+    calendar_path(calendar_id: str, root: str = None, backend: str = None) -> str: Get the storage path of a calendar.
+
+Methods:
+    __init__(root: str = None, max_open: int = None, backend: str = None): Initialize an empty registry.
+    acquire(calendar_id: str, create: bool = False) -> Optional[Calendar]: Open a calendar, or get it if it is open.
+    release(calendar_id: str): Finish using a calendar acquired before.
+    close(): Close all open calendars.
+"""
+"""
+<RUS>
+Реестр календарей
+
+Этот модуль хранит хранилища пространств календарей, обслуживаемых по адресам /api/v1/calendars/<calendar_id>/.
+У каждого календаря свое хранилище в собственном каталоге внутри CALENDARS_PATH с настроенным бэкендом, поэтому
+записи в разные календари никогда не конкурируют за один файл, блокировку или индекс в памяти. Календарь открывается
+при первом запросе и остается открытым, пока используется; как только открыто больше CALENDARS_MAX_OPEN календарей,
+давно не использованные простаивающие закрываются, поэтому активные календари остаются в памяти, а неактивные
+не стоят ничего, кроме своих файлов.
+
+Классы:
+    RegistryException: Пользовательский класс исключений для ошибок открытия календаря.
+    Calendar: Именованный кортеж (event_db, logic, response_cache) открытого календаря.
+    CalendarRegistry: LRU-реестр открытых календарей.
+
+Функции:
+    check_calendar_id(calendar_id: str): Проверяет, что ID календаря можно безопасно использовать как имя каталога.
+    calendar_path(calendar_id: str, root: str = None, backend: str = None) -> str: Получает путь к хранилищу
+        календаря.
+
+Методы:
+    __init__(root: str = None, max_open: int = None, backend: str = None): Инициализирует пустой реестр.
+    acquire(calendar_id: str, create: bool = False) -> Optional[Calendar]: Открывает календарь или получает его,
+        если он открыт.
+    release(calendar_id: str): Завершает использование полученного ранее календаря.
+    close(): Закрывает все открытые календари.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional
+from logic import EventLogic
+import cache
+import config
+import db
+
+class RegistryException(Exception):
+    pass
+
+Calendar = namedtuple('Calendar', ['event_db', 'logic', 'response_cache'])
+
+_CALENDAR_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+def check_calendar_id(calendar_id: str):
+    """
+    <EN>
+    Check that a calendar ID consists of 1 to 64 Latin letters, digits, '-' and '_', so that it can be used as
+    a directory name and never points outside CALENDARS_PATH.
+    Args:
+        calendar_id (str): The calendar ID.
+    Raises:
+        ValueError: If the ID is not valid.
+    """
+    """
+    <RUS>
+    Проверяет, что ID календаря состоит из 1–64 латинских букв, цифр, '-' и '_', чтобы его можно было использовать
+    как имя каталога и он никогда не указывал за пределы CALENDARS_PATH.
+    Аргументы:
+        calendar_id (str): ID календаря.
+    Вызывает:
+        ValueError: Если ID недопустим.
+    """
+    if not _CALENDAR_ID.fullmatch(calendar_id):
+        raise ValueError(f"Invalid calendar ID: {calendar_id!r}")
+
+def calendar_path(calendar_id: str, root: Optional[str] = None, backend: Optional[str] = None) -> str:
+    """
+    <EN>
+    Get the storage path of a calendar: the default storage file name of the backend inside the calendar directory,
+    for example calendars/<calendar_id>/storage.json.
+    Args:
+        calendar_id (str): The calendar ID, already checked with check_calendar_id.
+        root (str): Directory of all calendars. Defaults to config.CALENDARS_PATH.
+        backend (str): Storage backend. Defaults to config.STORAGE_BACKEND.
+    Returns:
+        str: The storage path.
+    """
+    """
+    <RUS>
+    Получает путь к хранилищу календаря: имя файла хранилища бэкенда по умолчанию внутри каталога календаря,
+    например calendars/<calendar_id>/storage.json.
+    Аргументы:
+        calendar_id (str): ID календаря, уже проверенный check_calendar_id.
+        root (str): Каталог всех календарей. По умолчанию config.CALENDARS_PATH.
+        backend (str): Бэкенд хранилища. По умолчанию config.STORAGE_BACKEND.
+    Возвращает:
+        str: Путь к хранилищу.
+    """
+    backend = backend or config.STORAGE_BACKEND
+    name = os.path.basename(config.DEFAULT_STORAGE_PATHS.get(backend, 'storage.json'))
+    return os.path.join(root or config.CALENDARS_PATH, calendar_id, name)
+
+class _Entry:
+    __slots__ = ('calendar', 'users', 'ready', 'error')
+
+    def __init__(self):
+        self.calendar = None
+        self.users = 1
+        self.ready = threading.Event()
+        self.error = None
+
+class CalendarRegistry:
+    def __init__(self, root: Optional[str] = None, max_open: Optional[int] = None, backend: Optional[str] = None):
+        """
+        <EN>
+        Initialize an empty registry. No calendar is opened until it is acquired.
+        Args:
+            root (str): Directory of all calendars. Defaults to config.CALENDARS_PATH.
+            max_open (int): Number of calendars kept open when idle. Defaults to config.CALENDARS_MAX_OPEN.
+            backend (str): Storage backend of the calendars. Defaults to config.STORAGE_BACKEND.
+        """
+        """
+        <RUS>
+        Инициализирует пустой реестр. Ни один календарь не открывается, пока его не запросят.
+        Аргументы:
+            root (str): Каталог всех календарей. По умолчанию config.CALENDARS_PATH.
+            max_open (int): Количество календарей, остающихся открытыми при простое.
+                По умолчанию config.CALENDARS_MAX_OPEN.
+            backend (str): Бэкенд хранилища календарей. По умолчанию config.STORAGE_BACKEND.
+        """
+        self._root = root or config.CALENDARS_PATH
+        self._max_open = max_open or config.CALENDARS_MAX_OPEN
+        self._backend = backend or config.STORAGE_BACKEND
+        # Open calendars from the least to the most recently used; entries in use are never closed.
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def acquire(self, calendar_id: str, create: bool = False) -> Optional[Calendar]:
+        """
+        <EN>
+        Get an open calendar, opening its storage if needed, and mark it as used until release() is called.
+        Only one thread opens a calendar; the others wait for it. Opening may close idle calendars beyond max_open.
+        Args:
+            calendar_id (str): The calendar ID.
+            create (bool): Whether to create the calendar if it does not exist yet.
+        Returns:
+            Optional[Calendar]: The calendar, or None if it does not exist and create is False, in which case
+                release() must not be called.
+        Raises:
+            ValueError: If the calendar ID is not valid.
+            RegistryException: If the storage of the calendar cannot be opened.
+        """
+        """
+        <RUS>
+        Получает открытый календарь, при необходимости открывая его хранилище, и отмечает его как используемый
+        до вызова release(). Календарь открывает только один поток; остальные его ожидают. Открытие может закрыть
+        простаивающие календари сверх max_open.
+        Аргументы:
+            calendar_id (str): ID календаря.
+            create (bool): Создавать ли календарь, если он еще не существует.
+        Возвращает:
+            Optional[Calendar]: Календарь или None, если он не существует и create равен False; в этом случае
+                release() вызывать не нужно.
+        Вызывает:
+            ValueError: Если ID календаря недопустим.
+            RegistryException: Если хранилище календаря не удается открыть.
+        """
+        check_calendar_id(calendar_id)
+        path = calendar_path(calendar_id, self._root, self._backend)
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(calendar_id)
+            if entry is not None:
+                entry.users += 1
+                self._entries.move_to_end(calendar_id)
+                opener = False
+            else:
+                if not create and not os.path.isdir(os.path.dirname(path)):
+                    return None
+                entry = self._entries[calendar_id] = _Entry()
+                opener = True
+                evicted = self._evict()
+        self._close(evicted)
+        if not opener:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.calendar
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            entry.calendar = _open_calendar(self._backend, path)
+        except Exception as ex:
+            entry.error = RegistryException(f"Failed to open calendar {calendar_id}: {ex}")
+            with self._lock:
+                if self._entries.get(calendar_id) is entry:
+                    del self._entries[calendar_id]
+            raise entry.error
+        finally:
+            entry.ready.set()
+        return entry.calendar
+
+    def release(self, calendar_id: str):
+        """
+        <EN>
+        Finish using a calendar. Once it is idle it may be closed to make room for other calendars.
+        Args:
+            calendar_id (str): The ID the calendar was acquired with.
+        """
+        """
+        <RUS>
+        Завершает использование календаря. Когда он простаивает, его можно закрыть, чтобы освободить место
+        для других календарей.
+        Аргументы:
+            calendar_id (str): ID, с которым календарь был получен.
+        """
+        with self._lock:
+            self._entries[calendar_id].users -= 1
+            evicted = self._evict()
+        self._close(evicted)
+
+    def _evict(self):
+        # Called with the lock held; calendars in use stay open, so the registry may briefly hold more than max_open.
+        evicted = []
+        for calendar_id, entry in list(self._entries.items()):
+            if len(self._entries) <= self._max_open:
+                break
+            if entry.users == 0:
+                del self._entries[calendar_id]
+                evicted.append(entry)
+        return evicted
+
+    @staticmethod
+    def _close(entries):
+        for entry in entries:
+            try:
+                entry.calendar.event_db.close()
+            except db.DBException:
+                # Write-behind reports a failed save to the mutations waiting for it, so nothing is left to do here.
+                pass
+
+    def close(self):
+        """
+        <EN>
+        Close all open calendars, persisting their pending changes.
+        """
+        """
+        <RUS>
+        Закрывает все открытые календари, сохраняя их ожидающие изменения.
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.calendar is not None]
+            self._entries.clear()
+        self._close(entries)
+
+def _open_calendar(backend: str, path: str) -> Calendar:
+    event_db = db.EventDB(backend, path)
+    logic = EventLogic(event_db)
+    response_cache = cache.ResponseCache(config.RESPONSE_CACHE_MAX_ENTRIES)
+    logic.add_listener(response_cache.invalidate)
+    return Calendar(event_db, logic, response_cache)
@@ -0,0 +1,304 @@
+"""
+<EN>
+Sharded Storage for Event Management
+
+This module provides a LocalStorage variant that partitions events into one file per month of the event date, so
+a save rewrites only the months it changed instead of the whole calendar history. Every shard file holds two JSON
+lines: a header with the dates of its events and its recurring series, and the events themselves. On startup only
+the headers are read, which is enough to build the ID map and the date index; the events of a month are loaded
+the first time one of them is accessed, so date-range queries open only the shards of the events they return.
+
+Classes:
+    ShardedStorage: LocalStorage variant that keeps events in per-month shard files loaded on demand.
+
+Methods:
+    __init__(directory='storage_shards', change_log_entries=10000): Initialize the ShardedStorage with the specified shard directory.
+    _load_storage(): Read the shard headers.
+    _save_storage(): Rewrite the shards changed since the last save.
+    search(query: str, limit: int) -> List[Event]: Find events by word prefixes of the title and text. The first
+        search loads every shard to build the text index.
+
+Exceptions:
+    StorageException: Raised for any errors occurring during storage operations.
+"""
+"""
+<RUS>
+Секционированное хранилище для управления событиями
+
+Этот модуль предоставляет вариант LocalStorage, который распределяет события по файлам по месяцу даты события,
+поэтому сохранение перезаписывает только измененные месяцы, а не всю историю календаря. Каждый файл секции содержит
+две строки JSON: заголовок с датами событий и повторяющимися сериями секции и сами события. При запуске читаются
+только заголовки, чего достаточно для построения карты ID и индекса по дате; события месяца загружаются при первом
+обращении к одному из них, поэтому запросы по диапазону дат открывают только секции возвращаемых событий.
+
+Классы:
+    ShardedStorage: Вариант LocalStorage, хранящий события в файлах секций по месяцам, загружаемых по требованию.
+
+Методы:
+    __init__(directory='storage_shards', change_log_entries=10000): Инициализирует ShardedStorage с указанным каталогом секций.
+    _load_storage(): Читает заголовки секций.
+    _save_storage(): Перезаписывает секции, измененные после последнего сохранения.
+    search(query: str, limit: int) -> List[Event]: Находит события по префиксам слов заголовка и текста. Первый
+        поиск загружает все секции, чтобы построить текстовый индекс.
+
+Исключения:
+    StorageException: Возникает при любых ошибках операций с хранилищем.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import List
+from model import Event, parse_date
+from storage import LazyLocalStorage, StorageException, _stat_signature, _write_atomic
+import metrics
+
+_SHARD_SUFFIX = '.jsonl'
+_UNDATED = 'undated'
+_MARKER = 'generation'
+
+
+def _shard_key(value: str) -> str:
+    try:
+        day = parse_date(value)
+    except ValueError:
+        # Events saved before dates were validated share one shard.
+        return _UNDATED
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+class _Shards(MutableMapping):
+    # The event mapping of ShardedStorage: the ID map and the headers are always in memory, the events of a shard are
+    # loaded on first access. Recurring series live in the headers, since they contribute to every month they span.
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self.headers = {}
+        self.series = {}
+        self._shard_of = {}
+        self._bodies = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(_SHARD_SUFFIX):
+                self._read_header(name[:-len(_SHARD_SUFFIX)])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + _SHARD_SUFFIX)
+
+    def _read_header(self, key: str):
+        with open(self._path(key), 'r', encoding='utf-8') as file:
+            header = json.loads(file.readline())
+        dates = {}
+        for event_id, value in header['dates'].items():
+            # A save interrupted while moving an event between months may leave it in both shards.
+            if event_id in self._shard_of:
+                self._dirty.add(key)
+                continue
+            dates[event_id] = value
+            self._shard_of[event_id] = key
+        for event_id, data in header['series'].items():
+            if event_id in dates:
+                self.series[event_id] = Event.from_dict(data)
+        self.headers[key] = dates
+
+    @metrics.timed('storage', 'load_shard')
+    def _read_body(self, key: str) -> dict:
+        dates = self.headers.get(key)
+        if not dates:
+            return {}
+        with open(self._path(key), 'r', encoding='utf-8') as file:
+            file.readline()
+            body = json.loads(file.readline())
+        return {event_id: Event.from_dict(data) for event_id, data in body.items() if event_id in dates}
+
+    def _body(self, key: str) -> dict:
+        body = self._bodies.get(key)
+        if body is None:
+            # Concurrent readers may need the same shard; it is loaded once.
+            with self._lock:
+                body = self._bodies.get(key)
+                if body is None:
+                    body = self._bodies[key] = self._read_body(key)
+        return body
+
+    def __contains__(self, event_id) -> bool:
+        return event_id in self._shard_of
+
+    def __len__(self) -> int:
+        return len(self._shard_of)
+
+    def __iter__(self):
+        for key in sorted(self.headers):
+            yield from self.headers[key]
+
+    def values(self):
+        # Walks whole shards instead of looking up every ID on its own.
+        for key in sorted(self.headers):
+            body = self._body(key)
+            for event_id in self.headers[key]:
+                event = self.series.get(event_id)
+                yield event if event is not None else body[event_id]
+
+    def __getitem__(self, event_id: str) -> Event:
+        key = self._shard_of[event_id]
+        event = self.series.get(event_id)
+        return event if event is not None else self._body(key)[event_id]
+
+    def __setitem__(self, event_id: str, event: Event):
+        key = _shard_key(event.date)
+        previous = self._shard_of.get(event_id)
+        if previous is not None and previous != key:
+            self._discard(event_id, previous)
+        body = self._body(key)
+        self.headers.setdefault(key, {})[event_id] = event.date
+        self._shard_of[event_id] = key
+        if event.rrule is None:
+            body[event_id] = event
+            self.series.pop(event_id, None)
+        else:
+            body.pop(event_id, None)
+            self.series[event_id] = event
+        self._dirty.add(key)
+
+    def __delitem__(self, event_id: str):
+        self._discard(event_id, self._shard_of.pop(event_id))
+
+    def _discard(self, event_id: str, key: str):
+        self._body(key).pop(event_id, None)
+        self.series.pop(event_id, None)
+        del self.headers[key][event_id]
+        self._dirty.add(key)
+
+    def save(self) -> int:
+        # All changed shards are written to temporary files before any of them replaces its shard, which keeps
+        # the window in which a crash leaves a multi-month save half-applied as short as possible.
+        replaced = []
+        for key in sorted(self._dirty):
+            dates = self.headers.get(key)
+            if dates:
+                header = {'dates': dates,
+                          'series': {event_id: self.series[event_id].to_dict()
+                                     for event_id in dates if event_id in self.series}}
+                body = {event_id: event.to_dict() for event_id, event in self._body(key).items()}
+                replaced.append((_write_shard_temp(self._path(key), header, body), key))
+        written = 0
+        for temp_path, key in replaced:
+            written += os.path.getsize(temp_path)
+            os.replace(temp_path, self._path(key))
+        for key in self._dirty:
+            if not self.headers.get(key):
+                self.headers.pop(key, None)
+                self._bodies.pop(key, None)
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+        self._dirty.clear()
+        return written
+
+    def index_items(self):
+        for dates in self.headers.values():
+            yield from dates.items()
+
+    def files(self) -> List[str]:
+        return [self._path(key) for key in self.headers]
+
+
+def _write_shard_temp(path: str, header: dict, body: dict) -> str:
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        for line in (header, body):
+            json.dump(line, file, ensure_ascii=False, separators=(',', ':'))
+            file.write('\n')
+        file.flush()
+        os.fsync(file.fileno())
+    return temp_path
+
+
+class ShardedStorage(LazyLocalStorage):
+    def __init__(self, directory='storage_shards', change_log_entries=10000):
+        """
+        <EN>
+        Initialize the ShardedStorage with the specified shard directory, which is created if it does not exist.
+        Every save also replaces a small marker file in the directory, whose signature tells other processes that
+        the shards have changed. Write-behind is not supported: a save already rewrites only the changed months.
+        Args:
+            directory (str): Path to the directory of shard files. Defaults to 'storage_shards'.
+            change_log_entries (int): Number of changes the change log '<directory>.changes' retains at least.
+        """
+        """
+        <RUS>
+        Инициализирует ShardedStorage с указанным каталогом секций, который создается, если не существует.
+        Каждое сохранение также заменяет небольшой файл-маркер в каталоге, сигнатура которого сообщает другим
+        процессам об изменении секций. Отложенная запись не поддерживается: сохранение и так перезаписывает только
+        измененные месяцы.
+        Аргументы:
+            directory (str): Путь к каталогу файлов секций. По умолчанию 'storage_shards'.
+            change_log_entries (int): Количество изменений, которое журнал изменений '<directory>.changes' хранит
+                как минимум.
+        """
+        self._directory = directory
+        self._marker_path = os.path.join(directory, _MARKER)
+        self._text_indexed = False
+        self._intervals_indexed = False
+        super().__init__(directory, change_log_entries=change_log_entries)
+
+    @metrics.timed('storage', 'load')
+    def _load_storage(self):
+        """
+        <EN>
+        Read the headers of all shards. The events themselves are loaded when they are first accessed.
+        """
+        """
+        <RUS>
+        Читает заголовки всех секций. Сами события загружаются при первом обращении к ним.
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        self._storage = _Shards(self._directory)
+        if not os.path.exists(self._marker_path):
+            _write_atomic(self._marker_path, uuid.uuid4().hex.encode('ascii'))
+        self._signature = self._file_signature()
+
+    @metrics.timed('storage', 'save')
+    def _save_storage(self):
+        """
+        <EN>
+        Rewrite the shards changed since the last save; the other shards are left untouched.
+        Raises:
+            StorageException: If there is an error saving the storage.
+        """
+        """
+        <RUS>
+        Перезаписывает секции, измененные после последнего сохранения; остальные секции не затрагиваются.
+        Вызывает:
+            StorageException: Если возникает ошибка при сохранении хранилища.
+        """
+        try:
+            written = self._storage.save()
+            _write_atomic(self._marker_path, uuid.uuid4().hex.encode('ascii'))
+        except Exception as ex:
+            raise StorageException(f"Failed to save storage: {ex}")
+        self._signature = self._file_signature()
+        metrics.record_written('sharded', written)
+
+    def _file_signature(self):
+        return _stat_signature(self._marker_path)
+
+    def _storage_files(self) -> List[str]:
+        with self._lock.read():
+            return [self._marker_path] + self._storage.files()
+
+    @contextmanager
+    def _reading(self):
+        # Shards are loaded while reading, so other processes must not replace them until the read is over.
+        while True:
+            with self._lock.read(), self._file_lock.shared():
+                if self._file_signature() == self._signature:
+                    yield
+                    return
+            with self._lock.write(), self._file_lock.shared():
+                self._refresh()
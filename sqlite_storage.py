@@ -0,0 +1,787 @@
+"""
+<EN>
+SQLite Storage for Event Management
+
+This module provides a storage backend that keeps events in an SQLite database instead of an in-memory dictionary.
+The database runs in WAL mode, so readers are not blocked by writers, has an index on the event date, an FTS5
+full-text index over the title and text of events and an R*Tree index over the start and end of timed events.
+
+Classes:
+    SQLiteStorage: Class for managing event storage in an SQLite database.
+
+Methods:
+    __init__(file_path='storage.db'): Initialize the SQLiteStorage with the specified database path.
+    create(event: Event, check_conflicts=False) -> str: Create a new event in the database, optionally only if its
+        time does not overlap other events.
+    list() -> List[Event]: List all events from the database.
+    iter_stored(chunk_size=500) -> Iterator[Event]: Iterate over all events, series unexpanded, one query per chunk.
+    read(event_id: str) -> Event: Read a specific event from the database.
+    exists(event_id: str) -> bool: Check whether an event exists without reading it.
+    update(event_id: str, event: Event): Update an existing event in the database.
+    add_exdate(event_id: str, day: str): Cancel one occurrence of a series in a single write transaction.
+    delete(event_id: str): Delete a specific event from the database.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: List a page of events within a date
+        range using the date index, together with the occurrences of recurring series or, if expand is False, each
+        series once.
+    apply_batch(operations) -> List[Optional[StorageException]]: Apply many operations in a single transaction.
+    search(query: str, limit: int) -> List[Event]: Find events by words of the title and text using the FTS index.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Find the timed events and occurrences overlapping
+        a time window using the R*Tree index.
+    version() -> Version: Get the tag and modification time of the whole database.
+    event_version(event_id: str) -> Optional[Version]: Get the tag and modification time of a single event.
+    bulk_import(events: Iterable[dict]) -> int: Insert many events in a single transaction.
+    stats() -> dict: Get the number of stored events and the size of the database files in bytes.
+    close(): Close all database connections.
+
+Exceptions:
+    StorageException: Raised for any errors occurring during storage operations.
+    ConflictException: Raised by create() with check_conflicts when the event overlaps stored events.
+"""
+"""
+<RUS>
+SQLite-хранилище для управления событиями
+
+Этот модуль предоставляет бэкенд хранилища, который хранит события в базе данных SQLite вместо словаря в памяти.
+База данных работает в режиме WAL, поэтому читатели не блокируются писателями, имеет индекс по дате события,
+полнотекстовый индекс FTS5 по заголовку и тексту событий и индекс R*Tree по началу и окончанию событий со временем.
+
+Классы:
+    SQLiteStorage: Класс для управления хранилищем событий в базе данных SQLite.
+
+Методы:
+    __init__(file_path='storage.db'): Инициализирует SQLiteStorage с указанным путем к базе данных.
+    create(event: Event, check_conflicts=False) -> str: Создает новое событие в базе данных, при необходимости
+        только если его время не пересекается с другими событиями.
+    list() -> List[Event]: Получает список всех событий из базы данных.
+    iter_stored(chunk_size=500) -> Iterator[Event]: Перебирает все события, не разворачивая серии, одним запросом
+        на порцию.
+    read(event_id: str) -> Event: Читает конкретное событие из базы данных.
+    exists(event_id: str) -> bool: Проверяет существование события, не читая его.
+    update(event_id: str, event: Event): Обновляет существующее событие в базе данных.
+    add_exdate(event_id: str, day: str): Отменяет одно повторение серии в одной транзакции записи.
+    delete(event_id: str): Удаляет конкретное событие из базы данных.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: Получает страницу событий
+        в диапазоне дат с помощью индекса по дате, с повторениями серий или, если expand равен False, каждой серией
+        один раз.
+    apply_batch(operations) -> List[Optional[StorageException]]: Применяет множество операций в одной транзакции.
+    search(query: str, limit: int) -> List[Event]: Находит события по словам заголовка и текста с помощью FTS-индекса.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Находит события со временем и повторения,
+        пересекающиеся с окном времени, с помощью индекса R*Tree.
+    version() -> Version: Получает тег и время изменения всей базы данных.
+    event_version(event_id: str) -> Optional[Version]: Получает тег и время изменения отдельного события.
+    bulk_import(events: Iterable[dict]) -> int: Вставляет множество событий в одной транзакции.
+    stats() -> dict: Получает количество сохраненных событий и размер файлов базы данных в байтах.
+    close(): Закрывает все соединения с базой данных.
+
+Исключения:
+    StorageException: Возникает при любых ошибках операций с хранилищем.
+    ConflictException: Возникает в create() с check_conflicts, когда событие пересекается с сохраненными событиями.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import replace
+from datetime import date, datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from index import SeriesIndex, tokenize
+from model import Event
+from storage import (BaseStorage, ConflictException, StorageException, Version, _conflicts, _index_date, _interval,
+                     _series_entry, _series_overlapping, _start_key)
+
+def _fold(column: str) -> str:
+    # The FTS index stores 'ё' as 'е', matching the tokenizer of the in-memory TextIndex.
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _seconds(column: str) -> str:
+    # Seconds since the Unix epoch; the R*Tree stores them as 32-bit floats rounded outwards, so it finds a superset
+    # of the overlapping events, which is filtered exactly.
+    return f"(julianday({column}) - 2440587.5) * 86400.0"
+
+
+def _timestamp(value: datetime) -> float:
+    return (value - _EPOCH).total_seconds()
+
+
+def _join_dates(dates) -> Optional[str]:
+    return ','.join(dates) if dates else None
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    rrule TEXT,
+    exdates TEXT,
+    starts_at TEXT,
+    ends_at TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    modified REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    epoch TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5 (
+    title, text, content='events', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, title, text) VALUES (new.rowid, {_fold('new.title')}, {_fold('new.text')});
+END;
+CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN
+    INSERT INTO events_fts (events_fts, rowid, title, text)
+    VALUES ('delete', old.rowid, {_fold('old.title')}, {_fold('old.text')});
+END;
+CREATE TRIGGER IF NOT EXISTS events_au AFTER UPDATE ON events BEGIN
+    INSERT INTO events_fts (events_fts, rowid, title, text)
+    VALUES ('delete', old.rowid, {_fold('old.title')}, {_fold('old.text')});
+    INSERT INTO events_fts (rowid, title, text) VALUES (new.rowid, {_fold('new.title')}, {_fold('new.text')});
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS events_intervals USING rtree (id, starts, ends);
+CREATE TRIGGER IF NOT EXISTS events_intervals_ai AFTER INSERT ON events
+WHEN new.rrule IS NULL AND julianday(new.starts_at) < julianday(new.ends_at) BEGIN
+    INSERT INTO events_intervals (id, starts, ends)
+    VALUES (new.rowid, {_seconds('new.starts_at')}, {_seconds('new.ends_at')});
+END;
+CREATE TRIGGER IF NOT EXISTS events_intervals_ad AFTER DELETE ON events BEGIN
+    DELETE FROM events_intervals WHERE id = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS events_intervals_au AFTER UPDATE ON events BEGIN
+    DELETE FROM events_intervals WHERE id = old.rowid;
+    INSERT INTO events_intervals (id, starts, ends)
+    SELECT new.rowid, {_seconds('new.starts_at')}, {_seconds('new.ends_at')}
+    WHERE new.rrule IS NULL AND julianday(new.starts_at) < julianday(new.ends_at);
+END;
+"""
+
+_COLUMNS = "id, date, title, text, rrule, exdates, starts_at, ends_at"
+_JOINED_COLUMNS = ", ".join(f"e.{column}" for column in _COLUMNS.split(", "))
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, file_path='storage.db'):
+        """
+        <EN>
+        Initialize the SQLiteStorage with the specified database path and create the schema if needed.
+        Every thread gets its own connection; WAL mode lets them read concurrently with a writer.
+        Args:
+            file_path (str): Path to the SQLite database file. Defaults to 'storage.db'.
+        """
+        """
+        <RUS>
+        Инициализирует SQLiteStorage с указанным путем к базе данных и при необходимости создает схему.
+        Каждый поток получает собственное соединение; режим WAL позволяет им читать одновременно с писателем.
+        Аргументы:
+            file_path (str): Путь к файлу базы данных SQLite. По умолчанию 'storage.db'.
+        """
+        super().__init__()
+        self._file_path = file_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        try:
+            connection = self._connection()
+            connection.execute("PRAGMA journal_mode=WAL")
+            reindex = self._drop_outdated_triggers(connection)
+            connection.executescript(_SCHEMA)
+            with connection:
+                self._migrate(connection)
+                if reindex:
+                    connection.execute("INSERT INTO events_fts (events_fts) VALUES ('delete-all')")
+                    connection.execute(f"INSERT INTO events_fts (rowid, title, text) "
+                                       f"SELECT rowid, {_fold('title')}, {_fold('text')} FROM events")
+                connection.execute("INSERT OR IGNORE INTO state (id, epoch, generation, modified) VALUES (0, ?, 0, ?)",
+                                   (uuid.uuid4().hex[:12], time.time()))
+            self._epoch = connection.execute("SELECT epoch FROM state").fetchone()[0]
+        except sqlite3.Error as ex:
+            raise StorageException(f"Failed to open database: {ex}")
+
+    @staticmethod
+    def _drop_outdated_triggers(connection) -> bool:
+        row = connection.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'events_ai'").fetchone()
+        if row is None or 'replace(' in row[0]:
+            return False
+        # Databases created before 'ё' was folded keep the old triggers; they are recreated and the index rebuilt.
+        for trigger in ('events_ai', 'events_ad', 'events_au'):
+            connection.execute(f"DROP TRIGGER {trigger}")
+        return True
+
+    @staticmethod
+    def _migrate(connection):
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(events)")}
+        if 'version' not in columns:
+            connection.execute("ALTER TABLE events ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if 'modified' not in columns:
+            connection.execute("ALTER TABLE events ADD COLUMN modified REAL NOT NULL DEFAULT 0")
+        if 'rrule' not in columns:
+            connection.execute("ALTER TABLE events ADD COLUMN rrule TEXT")
+            connection.execute("ALTER TABLE events ADD COLUMN exdates TEXT")
+        if 'starts_at' not in columns:
+            # Events stored before this column existed have no time, so the interval index needs no backfill.
+            connection.execute("ALTER TABLE events ADD COLUMN starts_at TEXT")
+            connection.execute("ALTER TABLE events ADD COLUMN ends_at TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._file_path, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _to_event(row) -> Event:
+        # Cancelled occurrences of a series are stored as a comma-separated list of dates.
+        return Event(id=row[0], date=row[1], title=row[2], text=row[3], rrule=row[4],
+                     exdates=tuple(row[5].split(',')) if row[5] else (), start=row[6], end=row[7])
+
+    @staticmethod
+    def _apply(connection, operation, event_id, event):
+        # The changed event takes the next generation number; the counter is bumped only if the change succeeds.
+        now = time.time()
+        if operation == 'create':
+            try:
+                connection.execute(f"INSERT INTO events ({_COLUMNS}, version, modified) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT generation + 1 FROM state), ?)",
+                                   (event_id, event.date, event.title, event.text, event.rrule,
+                                    _join_dates(event.exdates), event.start, event.end, now))
+            except sqlite3.IntegrityError:
+                raise StorageException("Event already exists with this ID")
+        else:
+            if operation == 'update':
+                cursor = connection.execute(
+                    "UPDATE events SET date = ?, title = ?, text = ?, rrule = ?, exdates = ?, starts_at = ?, "
+                    "ends_at = ?, version = (SELECT generation + 1 FROM state), modified = ? WHERE id = ?",
+                    (event.date, event.title, event.text, event.rrule, _join_dates(event.exdates), event.start,
+                     event.end, now, event_id))
+            elif operation == 'delete':
+                cursor = connection.execute("DELETE FROM events WHERE id = ?", (event_id,))
+            else:
+                raise StorageException(f"Unknown operation {operation}")
+            if cursor.rowcount == 0:
+                raise StorageException("Event does not exist")
+        connection.execute("UPDATE state SET generation = generation + 1, modified = ?", (now,))
+
+    def create(self, event: Event, check_conflicts: bool = False) -> str:
+        """
+        <EN>
+        Create a new event in the database. The conflict check runs in the same write transaction as the insert,
+        so two events created concurrently, even by different processes, cannot both take the same free time.
+        Args:
+            event (Event): The event to be created.
+            check_conflicts (bool): Whether to refuse a timed event overlapping other events; the occurrences of
+                a series are checked during CONFLICT_HORIZON from the first one.
+        Returns:
+            str: The ID of the created event.
+        Raises:
+            StorageException: If an event with the same ID already exists.
+            ConflictException: If conflicts are checked and the event overlaps other events.
+        """
+        """
+        <RUS>
+        Создает новое событие в базе данных. Проверка конфликтов выполняется в той же транзакции записи, что
+        и вставка, поэтому два одновременно создаваемых события, даже разными процессами, не могут оба занять одно
+        свободное время.
+        Аргументы:
+            event (Event): Событие, которое нужно создать.
+            check_conflicts (bool): Отклонять ли событие со временем, пересекающееся с другими событиями;
+                повторения серии проверяются в течение CONFLICT_HORIZON от первого.
+        Возвращает:
+            str: ID созданного события.
+        Вызывает:
+            StorageException: Если событие с таким ID уже существует.
+            ConflictException: Если конфликты проверяются и событие пересекается с другими событиями.
+        """
+        connection = self._connection()
+        with connection:
+            if check_conflicts:
+                # The write lock is taken before the check, so no other writer can fill the time until the insert.
+                connection.execute("BEGIN IMMEDIATE")
+                conflicts = _conflicts(event, lambda start, end: self._overlapping(connection, start, end))
+                if conflicts:
+                    raise ConflictException(conflicts)
+            self._apply(connection, 'create', event.id, event)
+        self._notify([event.id])
+        return event.id
+
+    def list(self) -> List[Event]:
+        """
+        <EN>
+        List all events from the database.
+        Returns:
+            List[Event]: A list of Event instances.
+        """
+        """
+        <RUS>
+        Получает список всех событий из базы данных.
+        Возвращает:
+            List[Event]: Список экземпляров Event.
+        """
+        cursor = self._connection().execute(f"SELECT {_COLUMNS} FROM events")
+        return [self._to_event(row) for row in cursor]
+
+    def iter_stored(self, chunk_size: int = 500) -> Iterator[Event]:
+        """
+        <EN>
+        Iterate over all events in the order of their IDs, each series once as stored. Every chunk is a separate
+        query continuing after the last ID of the previous one, so no read transaction is kept open between chunks.
+        Args:
+            chunk_size (int): Number of events fetched by one query.
+        Yields:
+            Event: The stored events.
+        """
+        """
+        <RUS>
+        Перебирает все события в порядке их ID, каждую серию один раз в сохраненном виде. Каждая порция — отдельный
+        запрос, продолжающий после последнего ID предыдущей, поэтому транзакция чтения не остается открытой
+        между порциями.
+        Аргументы:
+            chunk_size (int): Количество событий, получаемых одним запросом.
+        Порождает:
+            Event: Сохраненные события.
+        """
+        after = ''
+        while True:
+            rows = self._connection().execute(f"SELECT {_COLUMNS} FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                              (after, chunk_size)).fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            yield from (self._to_event(row) for row in rows)
+
+    def read(self, event_id: str) -> Event:
+        """
+        <EN>
+        Read a specific event from the database.
+        Args:
+            event_id (str): The ID of the event to be read.
+        Returns:
+            Event: The event instance with the specified ID.
+        Raises:
+            StorageException: If the event does not exist.
+        """
+        """
+        <RUS>
+        Читает конкретное событие из базы данных.
+        Аргументы:
+            event_id (str): ID события, которое нужно прочитать.
+        Возвращает:
+            Event: Экземпляр события с указанным ID.
+        Вызывает:
+            StorageException: Если событие не существует.
+        """
+        row = self._connection().execute(f"SELECT {_COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
+        if row is None:
+            raise StorageException("Event does not exist")
+        return self._to_event(row)
+
+    def exists(self, event_id: str) -> bool:
+        """
+        <EN>
+        Check whether an event exists in the database using the primary key index only.
+        Args:
+            event_id (str): The ID of the event.
+        Returns:
+            bool: True if the event exists.
+        """
+        """
+        <RUS>
+        Проверяет, существует ли событие в базе данных, используя только индекс первичного ключа.
+        Аргументы:
+            event_id (str): ID события.
+        Возвращает:
+            bool: True, если событие существует.
+        """
+        return self._connection().execute("SELECT 1 FROM events WHERE id = ?", (event_id,)).fetchone() is not None
+
+    def update(self, event_id: str, event: Event):
+        """
+        <EN>
+        Update an existing event in the database.
+        Args:
+            event_id (str): The ID of the event to be updated.
+            event (Event): The event instance with updated data.
+        Raises:
+            StorageException: If the event does not exist.
+        """
+        """
+        <RUS>
+        Обновляет существующее событие в базе данных.
+        Аргументы:
+            event_id (str): ID события, которое нужно обновить.
+            event (Event): Экземпляр события с обновленными данными.
+        Вызывает:
+            StorageException: Если событие не существует.
+        """
+        connection = self._connection()
+        with connection:
+            self._apply(connection, 'update', event_id, event)
+        self._notify([event_id])
+
+    def add_exdate(self, event_id: str, day: str):
+        """
+        <EN>
+        Cancel one occurrence of a recurring event. The event is read and written in one write transaction, so
+        concurrent cancellations of the same series, even by different processes, do not lose each other's dates.
+        Args:
+            event_id (str): The ID of the recurring event.
+            day (str): The date of the cancelled occurrence in ISO format; a date already cancelled is ignored.
+        Raises:
+            StorageException: If the event does not exist or is not recurring.
+        """
+        """
+        <RUS>
+        Отменяет одно повторение повторяющегося события. Событие читается и записывается в одной транзакции
+        записи, поэтому одновременные отмены повторений одной серии, даже разными процессами, не теряют даты друг
+        друга.
+        Аргументы:
+            event_id (str): ID повторяющегося события.
+            day (str): Дата отменяемого повторения в формате ISO; уже отмененная дата игнорируется.
+        Вызывает:
+            StorageException: Если событие не существует или не является повторяющимся.
+        """
+        connection = self._connection()
+        with connection:
+            # The write lock is taken before the read, so no other writer can change the dates until the update.
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(f"SELECT {_COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
+            if row is None:
+                raise StorageException("Event does not exist")
+            event = self._to_event(row)
+            if event.rrule is None:
+                raise StorageException("Event is not recurring")
+            if day in event.exdates:
+                return
+            self._apply(connection, 'update', event_id, replace(event, exdates=event.exdates + (day,)))
+        self._notify([event_id])
+
+    def delete(self, event_id: str):
+        """
+        <EN>
+        Delete a specific event from the database.
+        Args:
+            event_id (str): The ID of the event to be deleted.
+        Raises:
+            StorageException: If the event does not exist.
+        """
+        """
+        <RUS>
+        Удаляет конкретное событие из базы данных.
+        Аргументы:
+            event_id (str): ID события, которое нужно удалить.
+        Вызывает:
+            StorageException: Если событие не существует.
+        """
+        connection = self._connection()
+        with connection:
+            self._apply(connection, 'delete', event_id, None)
+        self._notify([event_id])
+
+    def list_range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+                   limit: Optional[int] = None, expand: bool = True) -> List[Event]:
+        """
+        <EN>
+        List events whose date lies within the range, inclusive. The query is answered by the (date, id) index.
+        Only the series starting before the end of the range are loaded; their occurrences are expanded lazily
+        and merged with the single events.
+        Args:
+            start (date): First day of the range.
+            end (date): Last day of the range.
+            after (Tuple[date, str]): Optional (date, event_id) key; only events ordered after it are returned.
+            limit (int): Optional maximum number of events to return.
+            expand (bool): Whether series contribute their occurrences; if not, every series starting within the range
+                is listed once as stored, at its first date.
+        Returns:
+            List[Event]: A list of Event instances ordered by date.
+        """
+        """
+        <RUS>
+        Получает события, дата которых лежит в диапазоне включительно. Запрос обслуживается индексом по (date, id).
+        Загружаются только серии, начинающиеся до конца диапазона; их повторения лениво разворачиваются
+        и объединяются с одиночными событиями.
+        Аргументы:
+            start (date): Первый день диапазона.
+            end (date): Последний день диапазона.
+            after (Tuple[date, str]): Необязательный ключ (дата, event_id); возвращаются только события после него.
+            limit (int): Необязательное максимальное количество возвращаемых событий.
+            expand (bool): Добавляют ли серии свои повторения; если нет, каждая серия, начинающаяся в диапазоне,
+                выводится один раз в сохраненном виде на дату первого повторения.
+        Возвращает:
+            List[Event]: Список экземпляров Event, упорядоченный по дате.
+        """
+        query = f"SELECT {_COLUMNS} FROM events WHERE date BETWEEN ? AND ?"
+        if expand:
+            query += " AND rrule IS NULL"
+        params = [start.isoformat(), end.isoformat()]
+        if after is not None:
+            query += " AND (date, id) > (?, ?)"
+            params += [after[0].isoformat(), after[1]]
+        query += " ORDER BY date, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        connection = self._connection()
+        events = [self._to_event(row) for row in connection.execute(query, params)]
+        if not expand:
+            return events
+        cursor = connection.execute(f"SELECT {_COLUMNS} FROM events WHERE rrule IS NOT NULL AND date <= ?",
+                                    (end.isoformat(),))
+        series = {}
+        index = SeriesIndex()
+        for row in cursor:
+            event = self._to_event(row)
+            entry = _series_entry(event)
+            if entry is not None:
+                series[event.id] = event
+                index.add(event.id, *entry)
+        if not series:
+            return events
+        keys = heapq.merge(((_index_date(event), event.id, event) for event in events),
+                           ((day, event_id, None) for day, event_id in index.range(start, end, after, limit)),
+                           key=lambda item: item[:2])
+        return [event or series[event_id].occurrence(day) for day, event_id, event in islice(keys, limit)]
+
+    def apply_batch(self, operations) -> List[Optional[StorageException]]:
+        """
+        <EN>
+        Apply a sequence of operations in a single transaction. A failed operation does not prevent the others
+        from being applied.
+        Args:
+            operations (list): A list of (operation, event_id, event) tuples, where operation is 'create',
+                'update' or 'delete' and event is None for 'delete'.
+        Returns:
+            List[Optional[StorageException]]: For each operation, None on success or the error that occurred.
+        """
+        """
+        <RUS>
+        Применяет последовательность операций в одной транзакции. Неудачная операция не мешает применению остальных.
+        Аргументы:
+            operations (list): Список кортежей (операция, event_id, event), где операция — 'create',
+                'update' или 'delete', а event равен None для 'delete'.
+        Возвращает:
+            List[Optional[StorageException]]: Для каждой операции None при успехе или возникшая ошибка.
+        """
+        connection = self._connection()
+        results = []
+        try:
+            with connection:
+                for operation, event_id, event in operations:
+                    try:
+                        self._apply(connection, operation, event_id, event)
+                        results.append(None)
+                    except StorageException as ex:
+                        results.append(ex)
+        except sqlite3.Error as ex:
+            raise StorageException(f"Failed to apply batch: {ex}")
+        self._notify([operation[1] for operation, error in zip(operations, results) if error is None])
+        return results
+
+    def search(self, query: str, limit: int = 50) -> List[Event]:
+        """
+        <EN>
+        Find events containing every word of the query as a word prefix in the title or text.
+        Results are ranked with BM25, matches in the title weigh more than matches in the text.
+        Args:
+            query (str): Words to search for.
+            limit (int): Maximum number of events to return.
+        Returns:
+            List[Event]: A list of Event instances, best matches first.
+        """
+        """
+        <RUS>
+        Находит события, содержащие каждое слово запроса как префикс слова в заголовке или тексте.
+        Результаты ранжируются по BM25, совпадения в заголовке весят больше, чем совпадения в тексте.
+        Аргументы:
+            query (str): Слова для поиска.
+            limit (int): Максимальное количество возвращаемых событий.
+        Возвращает:
+            List[Event]: Список экземпляров Event, лучшие совпадения первыми.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        match = ' '.join(f'"{word}"*' for word in words)
+        cursor = self._connection().execute(
+            f"SELECT {_JOINED_COLUMNS} FROM events_fts JOIN events e ON e.rowid = events_fts.rowid "
+            "WHERE events_fts MATCH ? ORDER BY bm25(events_fts, 2.0, 1.0) LIMIT ?",
+            (match, limit))
+        return [self._to_event(row) for row in cursor]
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        """
+        <EN>
+        Find the timed events overlapping the window [start, end). Single events are found with the R*Tree index;
+        only the timed series starting before the end of the window are loaded and their occurrences expanded.
+        Args:
+            start (datetime): Start of the window, inclusive.
+            end (datetime): End of the window, exclusive.
+        Returns:
+            List[Event]: Events and occurrences ordered by start and ID.
+        """
+        """
+        <RUS>
+        Находит события со временем, пересекающиеся с окном [start, end). Одиночные события находятся с помощью
+        индекса R*Tree; загружаются только серии со временем, начинающиеся до конца окна, и разворачиваются
+        их повторения.
+        Аргументы:
+            start (datetime): Начало окна включительно.
+            end (datetime): Конец окна не включительно.
+        Возвращает:
+            List[Event]: События и повторения, упорядоченные по началу и ID.
+        """
+        return self._overlapping(self._connection(), start, end)
+
+    def _overlapping(self, connection, start: datetime, end: datetime) -> List[Event]:
+        cursor = connection.execute(
+            f"SELECT {_JOINED_COLUMNS} FROM events_intervals JOIN events e ON e.rowid = events_intervals.id "
+            "WHERE events_intervals.ends >= ? AND events_intervals.starts <= ?", (_timestamp(start), _timestamp(end)))
+        events = []
+        for row in cursor:
+            event = self._to_event(row)
+            interval = _interval(event)
+            if interval is not None and interval[0] < end and interval[1] > start:
+                events.append(event)
+        cursor = connection.execute(f"SELECT {_COLUMNS} FROM events "
+                                    "WHERE rrule IS NOT NULL AND starts_at IS NOT NULL AND date <= ?",
+                                    (end.date().isoformat(),))
+        series = {}
+        intervals = {}
+        index = SeriesIndex()
+        for row in cursor:
+            event = self._to_event(row)
+            entry = _series_entry(event)
+            interval = _interval(event)
+            if entry is not None and interval is not None:
+                series[event.id] = event
+                intervals[event.id] = interval
+                index.add(event.id, *entry)
+        if series:
+            events += _series_overlapping(index, intervals, series, start, end)
+        return sorted(events, key=_start_key)
+
+    def version(self) -> Version:
+        """
+        <EN>
+        Get the version of the whole database. The generation counter is stored in the database, so the tag stays
+        the same across restarts and is shared by every process using the database.
+        Returns:
+            Version: The tag and the last modification time of the database.
+        """
+        """
+        <RUS>
+        Получает версию всей базы данных. Счетчик поколений хранится в базе данных, поэтому тег сохраняется
+        между перезапусками и общий для всех процессов, использующих базу данных.
+        Возвращает:
+            Version: Тег и время последнего изменения базы данных.
+        """
+        generation, modified = self._connection().execute("SELECT generation, modified FROM state").fetchone()
+        return Version(f"{self._epoch}-{generation}", modified)
+
+    def event_version(self, event_id: str) -> Optional[Version]:
+        """
+        <EN>
+        Get the version of a single event: the generation at which it was last created or updated.
+        Args:
+            event_id (str): The ID of the event.
+        Returns:
+            Optional[Version]: The tag and the last modification time of the event, or None if it does not exist.
+        """
+        """
+        <RUS>
+        Получает версию отдельного события: поколение, в котором оно было последний раз создано или обновлено.
+        Аргументы:
+            event_id (str): ID события.
+        Возвращает:
+            Optional[Version]: Тег и время последнего изменения события или None, если событие не существует.
+        """
+        row = self._connection().execute("SELECT version, modified FROM events WHERE id = ?", (event_id,)).fetchone()
+        if row is None:
+            return None
+        return Version(f"{self._epoch}-{row[0]}", row[1])
+
+    def bulk_import(self, events: Iterable[dict]) -> int:
+        """
+        <EN>
+        Insert many events in a single transaction. Events with an existing ID replace the stored ones.
+        Args:
+            events (Iterable[dict]): Event dictionaries as stored in the JSON storage file.
+        Returns:
+            int: The number of imported events.
+        """
+        """
+        <RUS>
+        Вставляет множество событий в одной транзакции. События с существующим ID заменяют сохраненные.
+        Аргументы:
+            events (Iterable[dict]): Словари событий в том виде, в котором они хранятся в JSON-файле хранилища.
+        Возвращает:
+            int: Количество импортированных событий.
+        """
+        connection = self._connection()
+        now = time.time()
+        rows = ((e['id'], e['date'], e['title'], e['text'], e.get('rrule'), _join_dates(e.get('exdates', ())),
+                 e.get('start'), e.get('end'), now) for e in events)
+        try:
+            with connection:
+                cursor = connection.executemany(
+                    f"INSERT INTO events ({_COLUMNS}, version, modified) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT generation + 1 FROM state), ?) "
+                    "ON CONFLICT (id) DO UPDATE SET "
+                    "date = excluded.date, title = excluded.title, text = excluded.text, "
+                    "rrule = excluded.rrule, exdates = excluded.exdates, starts_at = excluded.starts_at, "
+                    "ends_at = excluded.ends_at, "
+                    "version = excluded.version, modified = excluded.modified", rows)
+                connection.execute("UPDATE state SET generation = generation + 1, modified = ?", (now,))
+        except sqlite3.Error as ex:
+            raise StorageException(f"Failed to import events: {ex}")
+        self._notify()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        <EN>
+        Get the number of stored events and the total size of the database and its write-ahead log.
+        Returns:
+            dict: {'events': int, 'size_bytes': int}.
+        """
+        """
+        <RUS>
+        Получает количество сохраненных событий и общий размер базы данных и ее журнала упреждающей записи.
+        Возвращает:
+            dict: {'events': int, 'size_bytes': int}.
+        """
+        events = self._connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        size = 0
+        for path in (self._file_path, f"{self._file_path}-wal"):
+            try:
+                size += os.stat(path).st_size
+            except FileNotFoundError:
+                pass
+        return {'events': events, 'size_bytes': size}
+
+    def close(self):
+        """
+        <EN>
+        Close all database connections opened by this storage.
+        """
+        """
+        <RUS>
+        Закрывает все соединения с базой данных, открытые этим хранилищем.
+        """
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
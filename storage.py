@@ -3,135 +3,901 @@
 Local Storage for Event Management
 
 This module provides a class to handle local storage for events using a JSON file. It includes methods for creating,
-listing, reading, updating, and deleting events.
+listing, reading, updating, and deleting events. The storage is safe to share between threads and between processes:
+saves are atomic, writers hold an advisory file lock, and each process reloads the data changed by the others.
+In write-behind mode LocalStorage applies mutations in memory and a background thread coalesces them into one save.
+The storage file is written with a configurable codec from the codec module (compact JSON by default, indented JSON
+or a binary record format, optionally compressed) and loaded with whichever codec it was written with.
 
 Classes:
     StorageException: Custom exception class for storage operation errors.
+    ConflictException: StorageException raised when a conflict-checked event overlaps stored events, which it lists.
+    Version: Named tuple (tag, modified) describing the version of the storage or of a single event.
+    ChangeSet: Named tuple (seq, changes, events, more) answering a change feed request.
+    BaseStorage: Abstract interface implemented by every storage backend used by EventDB. Listeners registered
+        with add_listener(listener) are called with the IDs of changed events after every mutation, or with None
+        when the whole storage was reloaded, until they are passed to remove_listener(listener).
     LocalStorage: Class for managing event storage in a local JSON file.
+    LogStorage: LocalStorage variant that appends every mutation to a log and periodically compacts it into a snapshot.
+    LazyLocalStorage: Base class of the LocalStorage variants that decode events on demand instead of at load time.
 
 Methods:
     __init__(file_path='storage.json'): Initialize the LocalStorage with the specified file path.
     _load_storage(): Load the storage from the JSON file.
     _save_storage(): Save the current state of storage to the JSON file.
-    create(event: Event) -> str: Create a new event and save it to storage.
+    create(event: Event, check_conflicts=False) -> str: Create a new event and save it to storage, optionally only
+        if its time does not overlap other events.
     list() -> List[Event]: List all events from storage.
+    iter_stored(chunk_size=500) -> Iterator[Event]: Iterate over all stored events, series unexpanded, a chunk at
+        a time without holding a lock between chunks.
     read(event_id: str) -> Event: Read a specific event from storage.
+    exists(event_id: str) -> bool: Check whether an event exists without reading it.
     update(event_id: str, event: Event): Update an existing event in storage.
+    add_exdate(event_id: str, day: str): Cancel one occurrence of a series in a single write.
     delete(event_id: str): Delete a specific event from storage.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: List a page of events within a date
+        range using the date index, with the occurrences of series or, if expand is False, each series once.
+    apply_batch(operations) -> List[Optional[StorageException]]: Apply many operations with a single save.
+    search(query: str, limit: int) -> List[Event]: Find events by word prefixes of the title and text, best first.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Find the timed events and occurrences overlapping
+        a time window using the interval index.
+    version() -> Version: Get the tag and modification time of the whole storage.
+    event_version(event_id: str) -> Optional[Version]: Get the tag and modification time of a single event.
+    changes(since: int, limit=None) -> ChangeSet: Get the events changed after a sequence number of the change log.
+    change_seq() -> Optional[int]: Get the number of the last change, or None if the storage keeps no change log.
+    flush_future() -> Future: Get a future that completes once all changes made so far are persisted.
+    stats() -> dict: Get the number of stored events and the size of the storage files in bytes.
+    close(): Release the resources held by the storage.
 
 Exceptions:
     StorageException: Raised for any errors occurring during storage operations.
+    ConflictException: Raised by create() with check_conflicts when the event overlaps stored events.
 """
 """
 <RUS>
 Локальное хранилище для управления событиями
 
 Этот модуль предоставляет класс для управления локальным хранилищем событий с использованием JSON-файла. Он включает
-методы для создания, перечисления, чтения, обновления и удаления событий.
+методы для создания, перечисления, чтения, обновления и удаления событий. Хранилище можно безопасно разделять между
+потоками и процессами: сохранение атомарно, писатели удерживают рекомендательную блокировку файла, а каждый процесс
+перезагружает данные, измененные другими. В режиме отложенной записи LocalStorage применяет изменения в памяти,
+а фоновый поток объединяет их в одно сохранение. Файл хранилища записывается настраиваемым кодеком из модуля codec
+(по умолчанию компактный JSON, JSON с отступами или двоичный формат записей, при необходимости со сжатием)
+и загружается тем кодеком, которым был записан.
 
 Классы:
     StorageException: Пользовательский класс исключений для ошибок операций с хранилищем.
+    ConflictException: StorageException, возникающее, когда событие с проверкой конфликтов пересекается
+        с сохраненными событиями, которые оно перечисляет.
+    Version: Именованный кортеж (tag, modified), описывающий версию хранилища или отдельного события.
+    ChangeSet: Именованный кортеж (seq, changes, events, more) — ответ на запрос ленты изменений.
+    BaseStorage: Абстрактный интерфейс, который реализует каждый бэкенд хранилища, используемый EventDB. Слушатели,
+        зарегистрированные через add_listener(listener), вызываются с ID измененных событий после каждого изменения
+        или с None, если хранилище было перезагружено целиком, пока их не передадут в remove_listener(listener).
     LocalStorage: Класс для управления хранилищем событий в локальном JSON-файле.
+    LogStorage: Вариант LocalStorage, который дописывает каждое изменение в журнал и периодически сжимает его в снимок.
+    LazyLocalStorage: Базовый класс вариантов LocalStorage, которые декодируют события по требованию, а не при загрузке.
 
 Методы:
     __init__(file_path='storage.json'): Инициализирует LocalStorage с указанным путем к файлу.
     _load_storage(): Загружает данные из JSON-файла.
     _save_storage(): Сохраняет текущее состояние хранилища в JSON-файл.
-    create(event: Event) -> str: Создает новое событие и сохраняет его в хранилище.
+    create(event: Event, check_conflicts=False) -> str: Создает новое событие и сохраняет его в хранилище,
+        при необходимости только если его время не пересекается с другими событиями.
     list() -> List[Event]: Получает список всех событий из хранилища.
+    iter_stored(chunk_size=500) -> Iterator[Event]: Перебирает все сохраненные события, не разворачивая серии,
+        порциями, не удерживая блокировку между порциями.
     read(event_id: str) -> Event: Читает конкретное событие из хранилища.
+    exists(event_id: str) -> bool: Проверяет существование события, не читая его.
     update(event_id: str, event: Event): Обновляет существующее событие в хранилище.
+    add_exdate(event_id: str, day: str): Отменяет одно повторение серии за одну запись.
     delete(event_id: str): Удаляет конкретное событие из хранилища.
+    list_range(start, end, after=None, limit=None, expand=True) -> List[Event]: Получает страницу событий
+        в диапазоне дат с помощью индекса по дате, с повторениями серий или, если expand равен False, каждой серией
+        один раз.
+    apply_batch(operations) -> List[Optional[StorageException]]: Применяет множество операций с одним сохранением.
+    search(query: str, limit: int) -> List[Event]: Находит события по префиксам слов заголовка и текста, лучшие первыми.
+    overlapping(start: datetime, end: datetime) -> List[Event]: Находит события со временем и повторения,
+        пересекающиеся с окном времени, с помощью индекса интервалов.
+    version() -> Version: Получает тег и время изменения всего хранилища.
+    event_version(event_id: str) -> Optional[Version]: Получает тег и время изменения отдельного события.
+    changes(since: int, limit=None) -> ChangeSet: Получает события, измененные после номера журнала изменений.
+    change_seq() -> Optional[int]: Получает номер последнего изменения или None, если хранилище не ведет журнал
+        изменений.
+    flush_future() -> Future: Получает future, который завершается, когда все сделанные изменения сохранены.
+    stats() -> dict: Получает количество сохраненных событий и размер файлов хранилища в байтах.
+    close(): Освобождает ресурсы, занятые хранилищем.
 
 Исключения:
     StorageException: Возникает при любых ошибках операций с хранилищем.
+    ConflictException: Возникает в create() с check_conflicts, когда событие пересекается с сохраненными событиями.
 """
 
+import atexit
+import heapq
 import json
 import os
-from model import Event
+import threading
+import time
+import uuid
+from collections import namedtuple
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+from changelog import ChangeLog
+from codec import check_format, decode_events, encode_events
+from index import DateIndex, IntervalIndex, SeriesIndex, TextIndex
+from locks import FileLock, RWLock
+from model import Event, parse_date, parse_datetime
+from recurrence import Rule, occurrences, parse_rule
+import metrics
 
 class StorageException(Exception):
     pass
 
-class LocalStorage:
-    def __init__(self, file_path='storage.json'):
+class ConflictException(StorageException):
+    def __init__(self, conflicts: List[Event]):
+        super().__init__("Event overlaps other events")
+        self.conflicts = conflicts
+
+Version = namedtuple('Version', ['tag', 'modified'])
+# The sequence number to ask for next time, the changes as (seq, event_id, event) with None for deleted events,
+# or instead all events when the changes are no longer known, and whether more changes are waiting beyond the limit.
+ChangeSet = namedtuple('ChangeSet', ['seq', 'changes', 'events', 'more'])
+# Occurrences of a new series are checked for conflicts during its first year.
+CONFLICT_HORIZON = timedelta(days=366)
+
+class BaseStorage(ABC):
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        # The list is replaced rather than changed, so a mutation notifying the listeners in another thread is safe.
+        self._listeners = [registered for registered in self._listeners if registered != listener]
+
+    def _notify(self, event_ids=None):
+        for listener in self._listeners:
+            listener(event_ids)
+
+    @abstractmethod
+    def create(self, event: Event, check_conflicts: bool = False) -> str:
+        pass
+
+    @abstractmethod
+    def list(self) -> List[Event]:
+        pass
+
+    @abstractmethod
+    def read(self, event_id: str) -> Event:
+        pass
+
+    @abstractmethod
+    def exists(self, event_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def update(self, event_id: str, event: Event):
+        pass
+
+    @abstractmethod
+    def add_exdate(self, event_id: str, day: str):
+        pass
+
+    @abstractmethod
+    def delete(self, event_id: str):
+        pass
+
+    @abstractmethod
+    def list_range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+                   limit: Optional[int] = None, expand: bool = True) -> List[Event]:
+        pass
+
+    @abstractmethod
+    def apply_batch(self, operations) -> List[Optional[StorageException]]:
+        pass
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 50) -> List[Event]:
+        pass
+
+    @abstractmethod
+    def overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        pass
+
+    @abstractmethod
+    def version(self) -> Version:
+        pass
+
+    @abstractmethod
+    def event_version(self, event_id: str) -> Optional[Version]:
+        pass
+
+    def changes(self, since: int, limit: Optional[int] = None) -> ChangeSet:
+        # Backends without a change log answer every request with a full resync.
+        return ChangeSet(0, None, self.list(), False)
+
+    def change_seq(self) -> Optional[int]:
+        return None
+
+    def flush_future(self) -> Future:
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def iter_stored(self, chunk_size: int = 500) -> Iterator[Event]:
+        # Backends without a cheaper way iterate over a full list; a series is yielded once, not expanded.
+        yield from self.list()
+
+    def stats(self) -> dict:
+        return {'events': len(self.list()), 'size_bytes': None}
+
+    def close(self):
+        pass
+
+class LocalStorage(BaseStorage):
+    def __init__(self, file_path='storage.json', write_behind=False, flush_interval=0.02, flush_max_operations=1000,
+                 codec='json', compression='none', change_log_entries=10000):
         """
         <EN>
         Initialize the LocalStorage with the specified file path.
+        Threads of one process are coordinated with a reader/writer lock, processes sharing the file with an advisory
+        lock on '<file_path>.lock'. Before each operation the file is checked for changes made by other processes.
+        In write-behind mode a mutation only updates memory; a background thread saves all mutations collected during
+        flush_interval, or as soon as flush_max_operations are waiting, with one rewrite of the file. Mutations that
+        are not saved yet are reapplied when another process changes the file.
+        Every saved mutation is numbered in the change log '<file_path>.changes', which serves the change feed.
         Args:
             file_path (str): Path to the JSON file used for storage. Defaults to 'storage.json'.
+            write_behind (bool): Whether mutations are saved by the background thread instead of immediately.
+            flush_interval (float): Time in seconds the background thread waits to collect more mutations.
+            flush_max_operations (int): Number of waiting operations that triggers a save without waiting.
+            codec (str): Codec of the storage file written by saves: 'json', 'json-pretty' or 'binary'. Files written
+                with any codec are loaded, since the codec is detected from the content.
+            compression (str): Compression of the storage file written by saves: 'none', 'gzip' or 'zstd'.
+            change_log_entries (int): Number of changes the change log retains at least.
+        Raises:
+            StorageException: If the codec or the compression is unknown or not available.
         """
         """
         <RUS>
         Инициализирует LocalStorage с указанным путем к файлу.
+        Потоки одного процесса согласуются блокировкой читателей/писателей, процессы, разделяющие файл, —
+        рекомендательной блокировкой '<file_path>.lock'. Перед каждой операцией файл проверяется на изменения,
+        сделанные другими процессами.
+        В режиме отложенной записи изменение только обновляет память; фоновый поток сохраняет все изменения,
+        собранные за flush_interval, или сразу, как только ожидают flush_max_operations операций, одной перезаписью
+        файла. Еще не сохраненные изменения применяются повторно, если другой процесс изменил файл.
+        Каждое сохраненное изменение нумеруется в журнале изменений '<file_path>.changes', на котором построена
+        лента изменений.
         Аргументы:
             file_path (str): Путь к JSON-файлу, используемому для хранилища. По умолчанию 'storage.json'.
+            write_behind (bool): Сохраняет ли изменения фоновый поток вместо немедленного сохранения.
+            flush_interval (float): Время в секундах, в течение которого фоновый поток собирает изменения.
+            flush_max_operations (int): Количество ожидающих операций, при котором сохранение начинается без ожидания.
+            codec (str): Кодек файла хранилища, записываемого сохранениями: 'json', 'json-pretty' или 'binary'.
+                Загружаются файлы, записанные любым кодеком, так как кодек определяется по содержимому.
+            compression (str): Сжатие файла хранилища, записываемого сохранениями: 'none', 'gzip' или 'zstd'.
+            change_log_entries (int): Количество изменений, которое журнал изменений хранит как минимум.
+        Вызывает:
+            StorageException: Если кодек или сжатие неизвестны или недоступны.
         """
+        super().__init__()
+        try:
+            check_format(codec, compression)
+        except ValueError as ex:
+            raise StorageException(f"Invalid storage format: {ex}")
         self._file_path = file_path
-        self._load_storage()
+        self._codec = codec
+        self._compression = compression
+        self._lock = RWLock()
+        self._file_lock = FileLock(f"{file_path}.lock")
+        self._date_index = DateIndex()
+        self._series_index = SeriesIndex()
+        self._text_index = TextIndex()
+        self._interval_index = IntervalIndex()
+        # Timed series are expanded on overlap queries; their own index skips the series that have no time.
+        self._timed_series_index = SeriesIndex()
+        self._timed_series = {}
+        self._write_behind = write_behind
+        self._flush_interval = flush_interval
+        self._flush_max_operations = flush_max_operations
+        self._pending = []
+        self._pending_operations = 0
+        self._flush_condition = threading.Condition()
+        self._closed = False
+        with self._file_lock.exclusive():
+            self._change_log = ChangeLog(f"{file_path}.changes", change_log_entries)
+            self._load_storage()
+        self._rebuild_indexes()
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name='storage-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
 
+    @metrics.timed('storage', 'load')
     def _load_storage(self):
         """
         <EN>
-        Load the storage from the JSON file. If the file does not exist, create an empty storage.
+        Load the storage from the file, whatever codec it was written with. If the file does not exist, create
+        an empty storage.
         """
         """
         <RUS>
-        Загружает данные из JSON-файла. Если файл не существует, создается пустое хранилище.
+        Загружает данные из файла, каким бы кодеком он ни был записан. Если файл не существует, создается
+        пустое хранилище.
         """
         if not os.path.exists(self._file_path):
             self._storage = {}
             self._save_storage()
         else:
-            with open(self._file_path, 'r', encoding='utf-8') as file:
-                self._storage = json.load(file)
+            with open(self._file_path, 'rb') as file:
+                self._storage = decode_events(file.read())
+            self._signature = self._file_signature()
 
+    @metrics.timed('storage', 'save')
     def _save_storage(self):
         """
         <EN>
-        Save the current state of storage to the JSON file.
+        Save the current state of storage to the file with the configured codec. The data is written to a temporary
+        file which then atomically replaces the storage file, so readers never see a partially written file.
         Raises:
             StorageException: If there is an error saving the storage.
         """
         """
         <RUS>
-        Сохраняет текущее состояние хранилища в JSON-файл.
+        Сохраняет текущее состояние хранилища в файл настроенным кодеком. Данные записываются во временный файл,
+        который затем атомарно заменяет файл хранилища, поэтому читатели никогда не видят частично записанный файл.
         Вызывает:
             StorageException: Если возникает ошибка при сохранении хранилища.
         """
         try:
-            with open(self._file_path, 'w', encoding='utf-8') as file:
-                json.dump(self._storage, file, ensure_ascii=False, indent=4)
+            _write_atomic(self._file_path, encode_events(self._storage, self._codec, self._compression))
         except Exception as ex:
             raise StorageException(f"Failed to save storage: {ex}")
+        self._signature = self._file_signature()
+        metrics.record_written('local', self._signature[2])
+
+    def _file_signature(self):
+        """
+        <EN>
+        Describe the current version of the storage file on disk. Every save replaces the file with a new one,
+        so the signature changes whenever any process saves the storage.
+        Returns:
+            tuple: The inode, modification time and size of the file, or None if it does not exist.
+        """
+        """
+        <RUS>
+        Описывает текущую версию файла хранилища на диске. Каждое сохранение заменяет файл новым,
+        поэтому сигнатура меняется, когда любой процесс сохраняет хранилище.
+        Возвращает:
+            tuple: Inode, время изменения и размер файла или None, если файл не существует.
+        """
+        return _stat_signature(self._file_path)
 
-    def create(self, event: Event) -> str:
+    def _refresh(self):
         """
         <EN>
-        Create a new event and save it to storage.
+        Reload the storage if another process has changed the file since it was last loaded or saved.
+        Must be called with the write lock held.
+        """
+        """
+        <RUS>
+        Перезагружает хранилище, если другой процесс изменил файл после последней загрузки или сохранения.
+        Должен вызываться при удерживаемой блокировке записи.
+        """
+        if self._file_signature() != self._signature:
+            self._load_storage()
+            self._change_log.sync()
+            # Mutations not yet saved by the write-behind thread are kept on top of the data of other processes.
+            for changes, _ in self._pending:
+                for operation, event_id, event in changes:
+                    if operation == 'put':
+                        self._storage[event_id] = event
+                    else:
+                        self._storage.pop(event_id, None)
+            self._rebuild_indexes()
+
+    @contextmanager
+    def _reading(self):
+        if self._file_signature() != self._signature:
+            with self._lock.write(), self._file_lock.shared():
+                self._refresh()
+        with self._lock.read():
+            yield
+
+    @contextmanager
+    def _writing(self):
+        with self._lock.write(), self._file_lock.exclusive():
+            self._refresh()
+            yield
+
+    def _rebuild_indexes(self):
+        """
+        <EN>
+        Rebuild the secondary indexes from the in-memory storage after it has been loaded.
+        """
+        """
+        <RUS>
+        Перестраивает вторичные индексы по хранилищу в памяти после его загрузки.
+        """
+        # A new epoch makes tags issued before the reload unequal to any tag issued after it.
+        self._epoch = uuid.uuid4().hex[:12]
+        self._last_modified = time.time()
+        self._versions = {}
+        entries = []
+        series = []
+        intervals = []
+        self._timed_series = {}
+        for generation, event in enumerate(self._storage.values(), 1):
+            entry = _series_entry(event)
+            interval = _interval(event)
+            if entry is None:
+                entries.append((_index_date(event), event.id))
+                if interval is not None:
+                    intervals.append((event.id, *interval))
+            else:
+                series.append((event.id, *entry))
+                if interval is not None:
+                    self._timed_series[event.id] = interval
+            self._versions[event.id] = (generation, self._last_modified)
+        self._generation = len(self._storage)
+        self._date_index.rebuild(entries)
+        self._series_index.rebuild(series)
+        self._timed_series_index.rebuild(entry for entry in series if entry[0] in self._timed_series)
+        self._interval_index.rebuild(intervals)
+        self._text_index.rebuild((event.id, event.title, event.text) for event in self._storage.values())
+        self._notify()
+
+    def _index_event(self, event):
+        self._index_events((event,))
+
+    def _index_events(self, events):
+        # A series is kept once in the series index and expanded on queries instead of being stored per occurrence.
+        # The dates and words of all the events are added together, so a large batch is merged into the sorted
+        # indexes at once instead of being inserted one event at a time.
+        dates = []
+        now = time.time()
+        for event in events:
+            entry = _series_entry(event)
+            interval = _interval(event)
+            if entry is None:
+                self._series_index.remove(event.id)
+                dates.append((event.id, _index_date(event)))
+            else:
+                self._date_index.remove(event.id)
+                self._series_index.add(event.id, *entry)
+            self._interval_index.remove(event.id)
+            self._timed_series_index.remove(event.id)
+            self._timed_series.pop(event.id, None)
+            if interval is not None and entry is None:
+                self._interval_index.add(event.id, *interval)
+            elif interval is not None:
+                self._timed_series_index.add(event.id, *entry)
+                self._timed_series[event.id] = interval
+            self._generation += 1
+            self._versions[event.id] = (self._generation, now)
+        self._last_modified = now
+        self._date_index.add_many(dates)
+        self._text_index.add_many((event.id, event.title, event.text) for event in events)
+
+    def _unindex_event(self, event_id):
+        self._date_index.remove(event_id)
+        self._series_index.remove(event_id)
+        self._interval_index.remove(event_id)
+        self._timed_series_index.remove(event_id)
+        self._timed_series.pop(event_id, None)
+        self._text_index.remove(event_id)
+        self._generation += 1
+        self._last_modified = time.time()
+        self._versions.pop(event_id, None)
+
+    def stats(self) -> dict:
+        """
+        <EN>
+        Get the number of stored events and the total size of the storage files, without listing the events.
+        Returns:
+            dict: {'events': int, 'size_bytes': int}.
+        """
+        """
+        <RUS>
+        Получает количество сохраненных событий и общий размер файлов хранилища, не получая список событий.
+        Возвращает:
+            dict: {'events': int, 'size_bytes': int}.
+        """
+        with self._reading():
+            events = len(self._storage)
+        return {'events': events, 'size_bytes': sum(_file_size(path) for path in self._storage_files())}
+
+    def _storage_files(self) -> List[str]:
+        return [self._file_path]
+
+    def version(self) -> Version:
+        """
+        <EN>
+        Get the version of the whole storage. The generation counter grows with every create, update and delete,
+        so the tag changes whenever any event changes.
+        Returns:
+            Version: The tag and the last modification time of the storage.
+        """
+        """
+        <RUS>
+        Получает версию всего хранилища. Счетчик поколений растет при каждом создании, обновлении и удалении,
+        поэтому тег меняется при изменении любого события.
+        Возвращает:
+            Version: Тег и время последнего изменения хранилища.
+        """
+        with self._reading():
+            return Version(f"{self._epoch}-{self._generation}", self._last_modified)
+
+    def event_version(self, event_id: str) -> Optional[Version]:
+        """
+        <EN>
+        Get the version of a single event: the generation at which it was last created or updated.
+        Args:
+            event_id (str): The ID of the event.
+        Returns:
+            Optional[Version]: The tag and the last modification time of the event, or None if it does not exist.
+        """
+        """
+        <RUS>
+        Получает версию отдельного события: поколение, в котором оно было последний раз создано или обновлено.
+        Аргументы:
+            event_id (str): ID события.
+        Возвращает:
+            Optional[Version]: Тег и время последнего изменения события или None, если событие не существует.
+        """
+        with self._reading():
+            version = self._versions.get(event_id)
+            if version is None:
+                return None
+            return Version(f"{self._epoch}-{version[0]}", version[1])
+
+    def _commit(self, changes):
+        """
+        <EN>
+        Persist a group of changes that have already been applied to the in-memory storage.
+        The base implementation rewrites the whole JSON file; subclasses may persist only the changes themselves.
+        Args:
+            changes (list): A list of (operation, event_id, event) tuples, where operation is 'put' or 'del'.
+        """
+        """
+        <RUS>
+        Сохраняет группу изменений, которые уже применены к хранилищу в памяти.
+        Базовая реализация перезаписывает весь JSON-файл; подклассы могут сохранять только сами изменения.
+        Аргументы:
+            changes (list): Список кортежей (операция, event_id, event), где операция — 'put' или 'del'.
+        """
+        if not self._write_behind:
+            self._save_storage()
+            self._log_changes(changes)
+            return
+        self._pending.append((changes, Future()))
+        self._pending_operations += len(changes)
+        with self._flush_condition:
+            self._flush_condition.notify()
+
+    def _log_changes(self, changes):
+        # Changes are numbered once they are persisted, under the same exclusive file lock as the save itself,
+        # so another process never sees a number before the change it stands for.
+        try:
+            self._change_log.append(change[1] for change in changes)
+        except Exception as ex:
+            raise StorageException(f"Failed to append to change log: {ex}")
+
+    def changes(self, since: int, limit: Optional[int] = None) -> ChangeSet:
+        """
+        <EN>
+        Get the events changed after a sequence number of the change log. Every event is reported once, at the
+        number of its latest change, with its current state, or with None if it has been deleted. If the change log
+        no longer retains the changes after the number, or the number was never issued, all events are returned
+        instead, so that the client can start over.
+        Args:
+            since (int): The number of the last change the client has seen; 0 for a client that has seen nothing.
+            limit (Optional[int]): Maximum number of changed events to return.
+        Returns:
+            ChangeSet: The changes and the number to pass as since next time.
+        """
+        """
+        <RUS>
+        Получает события, измененные после номера журнала изменений. Каждое событие сообщается один раз под номером
+        своего последнего изменения с текущим состоянием или с None, если оно удалено. Если журнал изменений уже
+        не хранит изменения после этого номера или такой номер никогда не выдавался, вместо них возвращаются все
+        события, чтобы клиент мог начать заново.
+        Аргументы:
+            since (int): Номер последнего изменения, которое видел клиент; 0 для клиента, не видевшего ничего.
+            limit (Optional[int]): Максимальное количество возвращаемых измененных событий.
+        Возвращает:
+            ChangeSet: Изменения и номер, который нужно передать как since в следующий раз.
+        """
+        with self._reading():
+            entries = self._change_log.since(since)
+            if entries is None:
+                return ChangeSet(self._change_log.seq, None, list(self._storage.values()), False)
+            latest = {}
+            for seq, event_id in entries:
+                latest.pop(event_id, None)
+                latest[event_id] = seq
+            # Reinserting on every change keeps the dictionary ordered by the latest change of each event.
+            items = list(islice(latest.items(), limit))
+            more = limit is not None and len(latest) > limit
+            seq = items[-1][1] if more else self._change_log.seq
+            changes = [(number, event_id, self._storage.get(event_id)) for event_id, number in items]
+            return ChangeSet(seq, changes, None, more)
+
+    def change_seq(self) -> Optional[int]:
+        """
+        <EN>
+        Get the number of the last change recorded in the change log, including the changes of other processes.
+        Returns:
+            Optional[int]: The sequence number; 0 if nothing has changed yet.
+        """
+        """
+        <RUS>
+        Получает номер последнего изменения, записанного в журнал изменений, включая изменения других процессов.
+        Возвращает:
+            Optional[int]: Номер последовательности; 0, если еще ничего не изменялось.
+        """
+        with self._reading():
+            return self._change_log.seq
+
+    def flush_future(self) -> Future:
+        """
+        <EN>
+        Get a future that completes once all changes made so far are persisted. Without write-behind every change is
+        saved before the mutation returns, so the future is already done.
+        Returns:
+            Future: A future with the result None, or with the exception raised while saving.
+        """
+        """
+        <RUS>
+        Получает future, который завершается, когда все сделанные изменения сохранены. Без отложенной записи каждое
+        изменение сохраняется до возврата из операции, поэтому future уже завершен.
+        Возвращает:
+            Future: Future с результатом None или с исключением, возникшим при сохранении.
+        """
+        with self._lock.read():
+            if self._pending:
+                return self._pending[-1][1]
+        return super().flush_future()
+
+    def _flush_loop(self):
+        while True:
+            with self._flush_condition:
+                while not self._pending and not self._closed:
+                    self._flush_condition.wait()
+                if not self._closed and self._pending_operations < self._flush_max_operations:
+                    self._flush_condition.wait(self._flush_interval)
+                if self._closed and not self._pending:
+                    return
+            if not self._flush():
+                if self._closed:
+                    return
+                time.sleep(self._flush_interval)
+
+    @metrics.timed('storage', 'flush')
+    def _flush(self):
+        """
+        <EN>
+        Save the mutations collected by write-behind with one rewrite of the file. The file is serialized and synced
+        without holding the storage lock, which is only taken again to replace the file, so reads and new mutations
+        are not blocked by the disk. If another process saved the file in the meantime, the data is reloaded and
+        the save is retried.
+        Returns:
+            bool: False if the save failed.
+        """
+        """
+        <RUS>
+        Сохраняет изменения, собранные отложенной записью, одной перезаписью файла. Файл сериализуется и сбрасывается
+        на диск без удержания блокировки хранилища, которая захватывается снова только для замены файла, поэтому диск
+        не блокирует чтения и новые изменения. Если за это время другой процесс сохранил файл, данные
+        перезагружаются, а сохранение повторяется.
+        Возвращает:
+            bool: False, если сохранить не удалось.
+        """
+        while True:
+            with self._writing():
+                count = len(self._pending)
+                if count == 0:
+                    return True
+                # Events are immutable, so a shallow copy is a consistent snapshot.
+                snapshot = dict(self._storage)
+                signature = self._signature
+            try:
+                temp_path = _write_temp(self._file_path, encode_events(snapshot, self._codec, self._compression))
+            except Exception as ex:
+                self._fail_pending(count, StorageException(f"Failed to save storage: {ex}"))
+                return False
+            with self._lock.write(), self._file_lock.exclusive():
+                if self._file_signature() == signature:
+                    os.replace(temp_path, self._file_path)
+                    self._signature = self._file_signature()
+                    metrics.record_written('local', self._signature[2])
+                    flushed = self._pending[:count]
+                    del self._pending[:count]
+                    self._pending_operations -= sum(len(changes) for changes, _ in flushed)
+                    try:
+                        self._log_changes([change for changes, _ in flushed for change in changes])
+                        error = None
+                    except StorageException as ex:
+                        error = ex
+                    break
+            os.remove(temp_path)
+        for _, future in flushed:
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+        return True
+
+    def _fail_pending(self, count, error):
+        with self._lock.write():
+            failed = self._pending[:count]
+            # The changes stay pending for a later flush; only the current waiters get the error.
+            self._pending[:count] = [(changes, Future()) for changes, _ in failed]
+        for _, future in failed:
+            future.set_exception(error)
+
+    def close(self):
+        """
+        <EN>
+        Release the resources held by the storage. In write-behind mode the pending mutations are saved and the
+        background thread is stopped; otherwise LocalStorage keeps no open files, so nothing is done.
+        """
+        """
+        <RUS>
+        Освобождает ресурсы, занятые хранилищем. В режиме отложенной записи ожидающие изменения сохраняются,
+        а фоновый поток останавливается; иначе LocalStorage не держит открытых файлов, поэтому ничего не делает.
+        """
+        if not self._write_behind:
+            return
+        with self._flush_condition:
+            self._closed = True
+            self._flush_condition.notify()
+        self._flusher.join()
+        # The exit hook holds the storage, with all its events and indexes, until it is removed.
+        atexit.unregister(self.close)
+
+    def _apply(self, operation, event_id, event, index=True):
+        """
+        <EN>
+        Apply a single operation to the in-memory storage and its indexes without persisting it.
+        Must be called with the write lock held.
+        Args:
+            operation (str): 'create', 'update' or 'delete'.
+            event_id (str): The ID of the event.
+            event (Event): The event data; None for 'delete'.
+            index (bool): Whether to update the indexes; if not, the caller must pass the event ID to _reindex
+                before releasing the write lock.
+        Returns:
+            tuple: The (operation, event_id, event) change to be passed to _commit.
+        Raises:
+            StorageException: If the event already exists on create or does not exist on update and delete.
+        """
+        """
+        <RUS>
+        Применяет одну операцию к хранилищу в памяти и его индексам, не сохраняя ее.
+        Должен вызываться при удерживаемой блокировке записи.
+        Аргументы:
+            operation (str): 'create', 'update' или 'delete'.
+            event_id (str): ID события.
+            event (Event): Данные события; None для 'delete'.
+            index (bool): Обновлять ли индексы; если нет, вызывающий должен передать ID события в _reindex
+                до освобождения блокировки записи.
+        Возвращает:
+            tuple: Изменение (операция, event_id, event), передаваемое в _commit.
+        Вызывает:
+            StorageException: Если при создании событие уже существует или при обновлении и удалении не существует.
+        """
+        if operation == 'create':
+            if event_id in self._storage:
+                raise StorageException("Event already exists with this ID")
+        elif operation in ('update', 'delete'):
+            if event_id not in self._storage:
+                raise StorageException("Event does not exist")
+        else:
+            raise StorageException(f"Unknown operation {operation}")
+        if operation == 'delete':
+            del self._storage[event_id]
+            if index:
+                self._unindex_event(event_id)
+            return 'del', event_id, None
+        self._storage[event_id] = event
+        if index:
+            self._index_event(event)
+        return 'put', event_id, event
+
+    def _reindex(self, event_ids):
+        # Brings the indexes up to date with the stored state of events applied without indexing.
+        events = []
+        for event_id in event_ids:
+            event = self._storage.get(event_id)
+            if event is None:
+                self._unindex_event(event_id)
+            else:
+                events.append(event)
+        self._index_events(events)
+
+    def apply_batch(self, operations) -> List[Optional[StorageException]]:
+        """
+        <EN>
+        Apply a sequence of operations and persist all successful ones in a single step.
+        Operations are applied in order, so a later operation sees the effect of an earlier one.
+        A failed operation does not prevent the others from being applied.
+        Args:
+            operations (list): A list of (operation, event_id, event) tuples, where operation is 'create',
+                'update' or 'delete' and event is None for 'delete'.
+        Returns:
+            List[Optional[StorageException]]: For each operation, None on success or the error that occurred.
+        """
+        """
+        <RUS>
+        Применяет последовательность операций и сохраняет все успешные за один шаг.
+        Операции применяются по порядку, поэтому последующая операция видит результат предыдущей.
+        Неудачная операция не мешает применению остальных.
+        Аргументы:
+            operations (list): Список кортежей (операция, event_id, event), где операция — 'create',
+                'update' или 'delete', а event равен None для 'delete'.
+        Возвращает:
+            List[Optional[StorageException]]: Для каждой операции None при успехе или возникшая ошибка.
+        """
+        results = []
+        changes = []
+        with self._writing():
+            for operation, event_id, event in operations:
+                try:
+                    changes.append(self._apply(operation, event_id, event, index=False))
+                    results.append(None)
+                except StorageException as ex:
+                    results.append(ex)
+            if changes:
+                self._reindex(dict.fromkeys(change[1] for change in changes))
+                self._commit(changes)
+                self._notify([change[1] for change in changes])
+        return results
+
+    def create(self, event: Event, check_conflicts: bool = False) -> str:
+        """
+        <EN>
+        Create a new event and save it to storage. The conflict check runs under the same write lock as the creation,
+        so two events created concurrently cannot both take the same free time.
         Args:
             event (Event): The event to be created.
+            check_conflicts (bool): Whether to refuse a timed event overlapping other events; the occurrences of
+                a series are checked during CONFLICT_HORIZON from the first one.
         Returns:
             str: The ID of the created event.
         Raises:
             StorageException: If an event with the same ID already exists.
+            ConflictException: If conflicts are checked and the event overlaps other events.
         """
         """
         <RUS>
-        Создает новое событие и сохраняет его в хранилище.
+        Создает новое событие и сохраняет его в хранилище. Проверка конфликтов выполняется под той же блокировкой
+        записи, что и создание, поэтому два одновременно создаваемых события не могут оба занять одно свободное время.
         Аргументы:
             event (Event): Событие, которое нужно создать.
+            check_conflicts (bool): Отклонять ли событие со временем, пересекающееся с другими событиями;
+                повторения серии проверяются в течение CONFLICT_HORIZON от первого.
         Возвращает:
             str: ID созданного события.
         Вызывает:
             StorageException: Если событие с таким ID уже существует.
+            ConflictException: Если конфликты проверяются и событие пересекается с другими событиями.
         """
-        event_dict = event.to_dict()
-        if event_dict['id'] in self._storage:
-            raise StorageException("Event already exists with this ID")
-        self._storage[event_dict['id']] = event_dict
-        self._save_storage()
+        with self._writing():
+            if check_conflicts:
+                conflicts = _conflicts(event, self._overlapping)
+                if conflicts:
+                    raise ConflictException(conflicts)
+            self._commit([self._apply('create', event.id, event)])
+            self._notify([event.id])
         return event.id
 
     def list(self):
@@ -147,7 +913,138 @@ class LocalStorage:
         Возвращает:
             List[Event]: Список экземпляров Event.
         """
-        return [Event.from_dict(e) for e in self._storage.values()]
+        with self._reading():
+            return list(self._storage.values())
+
+    def iter_stored(self, chunk_size: int = 500) -> Iterator[Event]:
+        """
+        <EN>
+        Iterate over all stored events, each series once as stored, without expanding its occurrences. The IDs are
+        taken once and the events are fetched chunk_size at a time, each chunk under its own read lock, so a slow
+        consumer never blocks writers. Events created during the iteration are not yielded and deleted ones are
+        skipped.
+        Args:
+            chunk_size (int): Number of events fetched under one read lock.
+        Yields:
+            Event: The stored events.
+        """
+        """
+        <RUS>
+        Перебирает все сохраненные события, каждую серию один раз в сохраненном виде, без развертывания повторений.
+        ID берутся один раз, а события получаются по chunk_size за раз, каждая порция под своей блокировкой чтения,
+        поэтому медленный потребитель никогда не блокирует писателей. События, созданные во время перебора,
+        не выдаются, а удаленные пропускаются.
+        Аргументы:
+            chunk_size (int): Количество событий, получаемых под одной блокировкой чтения.
+        Порождает:
+            Event: Сохраненные события.
+        """
+        with self._reading():
+            event_ids = list(self._storage)
+        for position in range(0, len(event_ids), chunk_size):
+            with self._reading():
+                events = [self._storage.get(event_id) for event_id in event_ids[position:position + chunk_size]]
+            yield from (event for event in events if event is not None)
+
+    def list_range(self, start: date, end: date, after: Optional[Tuple[date, str]] = None,
+                   limit: Optional[int] = None, expand: bool = True) -> List[Event]:
+        """
+        <EN>
+        List events whose date lies within the range, inclusive, using the sorted date index.
+        Recurring series contribute their occurrences within the range, expanded lazily and merged with single events.
+        Events are ordered by (date, ID), which makes the (date, ID) key of the last event a stable pagination cursor.
+        Args:
+            start (date): First day of the range.
+            end (date): Last day of the range.
+            after (Tuple[date, str]): Optional (date, event_id) key; only events ordered after it are returned.
+            limit (int): Optional maximum number of events to return.
+            expand (bool): Whether series contribute their occurrences; if not, every series starting within the range
+                is listed once as stored, at its first date.
+        Returns:
+            List[Event]: A list of Event instances ordered by date.
+        """
+        """
+        <RUS>
+        Получает события, дата которых лежит в диапазоне включительно, с помощью отсортированного индекса по дате.
+        Повторяющиеся серии добавляют свои повторения в диапазоне, лениво развернутые и объединенные с одиночными событиями.
+        События упорядочены по (дате, ID), поэтому ключ (дата, ID) последнего события служит устойчивым курсором страниц.
+        Аргументы:
+            start (date): Первый день диапазона.
+            end (date): Последний день диапазона.
+            after (Tuple[date, str]): Необязательный ключ (дата, event_id); возвращаются только события после него.
+            limit (int): Необязательное максимальное количество возвращаемых событий.
+            expand (bool): Добавляют ли серии свои повторения; если нет, каждая серия, начинающаяся в диапазоне,
+                выводится один раз в сохраненном виде на дату первого повторения.
+        Возвращает:
+            List[Event]: Список экземпляров Event, упорядоченный по дате.
+        """
+        with self._reading():
+            keys = self._date_index.keys(start, end, after, limit)
+            if not self._series_index:
+                return [self._storage[event_id] for _, event_id in keys]
+            if not expand:
+                keys = heapq.merge(keys, self._series_index.firsts(start, end, after, limit))
+                return [self._storage[event_id] for _, event_id in islice(keys, limit)]
+            keys = heapq.merge(keys, self._series_index.range(start, end, after, limit))
+            return [_occurrence(self._storage[event_id], day) for day, event_id in islice(keys, limit)]
+
+    def search(self, query: str, limit: int = 50) -> List[Event]:
+        """
+        <EN>
+        Find events containing every word of the query as a word prefix in the title or text, using the inverted
+        index instead of scanning the storage. Words are compared case-insensitively.
+        Args:
+            query (str): Words to search for.
+            limit (int): Maximum number of events to return.
+        Returns:
+            List[Event]: A list of Event instances, best matches first.
+        """
+        """
+        <RUS>
+        Находит события, содержащие каждое слово запроса как префикс слова в заголовке или тексте, с помощью
+        инвертированного индекса вместо просмотра хранилища. Слова сравниваются без учета регистра.
+        Аргументы:
+            query (str): Слова для поиска.
+            limit (int): Максимальное количество возвращаемых событий.
+        Возвращает:
+            List[Event]: Список экземпляров Event, лучшие совпадения первыми.
+        """
+        with self._reading():
+            return [self._storage[event_id] for event_id in self._text_index.search(query, limit)]
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        """
+        <EN>
+        Find the timed events overlapping the window [start, end) using the interval index, in O(log n + k) instead
+        of scanning the storage. Timed series contribute their overlapping occurrences. Events without a time are
+        not part of any window.
+        Args:
+            start (datetime): Start of the window, inclusive.
+            end (datetime): End of the window, exclusive.
+        Returns:
+            List[Event]: Events and occurrences ordered by start and ID.
+        """
+        """
+        <RUS>
+        Находит события со временем, пересекающиеся с окном [start, end), с помощью индекса интервалов за O(log n + k)
+        вместо просмотра хранилища. Серии со временем добавляют свои пересекающиеся повторения. События без времени
+        не входят ни в одно окно.
+        Аргументы:
+            start (datetime): Начало окна включительно.
+            end (datetime): Конец окна не включительно.
+        Возвращает:
+            List[Event]: События и повторения, упорядоченные по началу и ID.
+        """
+        with self._reading():
+            return self._overlapping(start, end)
+
+    def _overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        # Must be called with a lock held.
+        events = [self._storage[event_id] for _, event_id in self._interval_index.overlapping(start, end)]
+        if self._timed_series:
+            events += _series_overlapping(self._timed_series_index, self._timed_series, self._storage, start, end)
+            events.sort(key=_start_key)
+        return events
 
     def read(self, event_id: str) -> Event:
         """
@@ -170,12 +1067,33 @@ class LocalStorage:
         Вызывает:
             StorageException: Если событие не существует.
         """
-        event = self._storage.get(event_id)
+        with self._reading():
+            event = self._storage.get(event_id)
         if event:
-            return Event.from_dict(event)
+            return event
         else:
             raise StorageException("Event does not exist")
 
+    def exists(self, event_id: str) -> bool:
+        """
+        <EN>
+        Check whether an event exists in storage.
+        Args:
+            event_id (str): The ID of the event.
+        Returns:
+            bool: True if the event exists.
+        """
+        """
+        <RUS>
+        Проверяет, существует ли событие в хранилище.
+        Аргументы:
+            event_id (str): ID события.
+        Возвращает:
+            bool: True, если событие существует.
+        """
+        with self._reading():
+            return event_id in self._storage
+
     def update(self, event_id: str, event: Event):
         """
         <EN>
@@ -195,10 +1113,41 @@ class LocalStorage:
         Вызывает:
             StorageException: Если событие не существует.
         """
-        if event_id not in self._storage:
-            raise StorageException("Event does not exist")
-        self._storage[event_id] = event.to_dict()
-        self._save_storage()
+        with self._writing():
+            self._commit([self._apply('update', event_id, event)])
+            self._notify([event_id])
+
+    def add_exdate(self, event_id: str, day: str):
+        """
+        <EN>
+        Cancel one occurrence of a recurring event. The event is read and written under one write lock, so
+        concurrent cancellations of the same series do not lose each other's dates.
+        Args:
+            event_id (str): The ID of the recurring event.
+            day (str): The date of the cancelled occurrence in ISO format; a date already cancelled is ignored.
+        Raises:
+            StorageException: If the event does not exist or is not recurring.
+        """
+        """
+        <RUS>
+        Отменяет одно повторение повторяющегося события. Событие читается и записывается под одной блокировкой
+        записи, поэтому одновременные отмены повторений одной серии не теряют даты друг друга.
+        Аргументы:
+            event_id (str): ID повторяющегося события.
+            day (str): Дата отменяемого повторения в формате ISO; уже отмененная дата игнорируется.
+        Вызывает:
+            StorageException: Если событие не существует или не является повторяющимся.
+        """
+        with self._writing():
+            event = self._storage.get(event_id)
+            if event is None:
+                raise StorageException("Event does not exist")
+            if event.rrule is None:
+                raise StorageException("Event is not recurring")
+            if day in event.exdates:
+                return
+            self._commit([self._apply('update', event_id, replace(event, exdates=event.exdates + (day,)))])
+            self._notify([event_id])
 
     def delete(self, event_id: str):
         """
@@ -217,7 +1166,493 @@ class LocalStorage:
         Вызывает:
             StorageException: Если событие не существует.
         """
-        if event_id not in self._storage:
-            raise StorageException("Event does not exist")
-        del self._storage[event_id]
-        self._save_storage()
+        with self._writing():
+            self._commit([self._apply('delete', event_id, None)])
+            self._notify([event_id])
+
+
+class LogStorage(LocalStorage):
+    def __init__(self, file_path='storage.json', log_path=None, compact_threshold=4 * 1024 * 1024, fsync=False,
+                 codec='json', compression='none', change_log_entries=10000):
+        """
+        <EN>
+        Initialize the LogStorage. The state is kept in a JSON snapshot plus an append-only log of mutations.
+        Args:
+            file_path (str): Path to the JSON snapshot file. Defaults to 'storage.json'.
+            log_path (str): Path to the log file. Defaults to file_path with the '.log' suffix.
+            compact_threshold (int): Log size in bytes after which the log is compacted into a new snapshot.
+            fsync (bool): Whether every appended record is flushed to disk with fsync.
+            codec (str): Codec of the snapshot written by compactions; the log itself is always JSON lines.
+            compression (str): Compression of the snapshot written by compactions.
+            change_log_entries (int): Number of changes the change log of the change feed retains at least.
+        """
+        """
+        <RUS>
+        Инициализирует LogStorage. Состояние хранится в JSON-снимке и журнале изменений, открытом только на дозапись.
+        Аргументы:
+            file_path (str): Путь к JSON-файлу снимка. По умолчанию 'storage.json'.
+            log_path (str): Путь к файлу журнала. По умолчанию file_path с суффиксом '.log'.
+            compact_threshold (int): Размер журнала в байтах, после которого журнал сжимается в новый снимок.
+            fsync (bool): Сбрасывать ли каждую добавленную запись на диск через fsync.
+            codec (str): Кодек снимка, записываемого сжатием; сам журнал всегда состоит из строк JSON.
+            compression (str): Сжатие снимка, записываемого сжатием журнала.
+            change_log_entries (int): Количество изменений, которое журнал изменений ленты хранит как минимум.
+        """
+        self._log_path = log_path or f"{file_path}.log"
+        self._old_log_path = f"{self._log_path}.old"
+        self._compact_threshold = compact_threshold
+        self._fsync = fsync
+        self._log_lock = threading.Lock()
+        self._compacting = False
+        self._log = None
+        super().__init__(file_path, codec=codec, compression=compression, change_log_entries=change_log_entries)
+
+    @metrics.timed('storage', 'load')
+    def _load_storage(self):
+        """
+        <EN>
+        Load the snapshot and replay the logs on top of it. A record torn by a crash at the end of the active log
+        is cut off, so that new records are appended after the last complete one.
+        """
+        """
+        <RUS>
+        Загружает снимок и воспроизводит поверх него журналы. Запись, оборванная сбоем в конце активного журнала,
+        отрезается, чтобы новые записи добавлялись после последней целой записи.
+        """
+        if self._log is not None:
+            self._log.close()
+        self._storage = {}
+        if os.path.exists(self._file_path):
+            with open(self._file_path, 'rb') as file:
+                self._storage = decode_events(file.read())
+        self._replay(self._old_log_path)
+        valid_size = self._replay(self._log_path)
+        self._log = open(self._log_path, 'ab')
+        if self._log.tell() != valid_size:
+            self._log.truncate(valid_size)
+            self._log.seek(valid_size)
+        self._log_offset = valid_size
+        self._signature = self._file_signature()
+
+    def _storage_files(self) -> List[str]:
+        return [self._file_path, self._log_path, self._old_log_path]
+
+    def _replay(self, path, offset=0, reindex=False) -> int:
+        """
+        <EN>
+        Apply the records of a log file to the in-memory storage.
+        Args:
+            path (str): Path to the log file.
+            offset (int): Position in the file to start reading from.
+            reindex (bool): Whether to update the secondary indexes for every applied record.
+        Returns:
+            int: Position in the file right after the last complete record.
+        """
+        """
+        <RUS>
+        Применяет записи файла журнала к хранилищу в памяти.
+        Аргументы:
+            path (str): Путь к файлу журнала.
+            offset (int): Позиция в файле, с которой начинается чтение.
+            reindex (bool): Обновлять ли вторичные индексы для каждой примененной записи.
+        Возвращает:
+            int: Позиция в файле сразу после последней целой записи.
+        """
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return offset
+        with file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record['op'] == 'put':
+                    event = Event.from_dict(record['event'])
+                    self._storage[event.id] = event
+                    if reindex:
+                        self._index_event(event)
+                else:
+                    self._storage.pop(record['id'], None)
+                    if reindex:
+                        self._unindex_event(record['id'])
+                offset += len(line)
+        return offset
+
+    def _file_signature(self):
+        """
+        <EN>
+        Describe the current version of the snapshot and the log on disk.
+        Returns:
+            tuple: The signature of the snapshot file, the inode of the active log and the size of the active log.
+        """
+        """
+        <RUS>
+        Описывает текущую версию снимка и журнала на диске.
+        Возвращает:
+            tuple: Сигнатура файла снимка, inode активного журнала и размер активного журнала.
+        """
+        log_signature = _stat_signature(self._log_path)
+        if log_signature is None:
+            return _stat_signature(self._file_path), None, 0
+        return _stat_signature(self._file_path), log_signature[0], log_signature[2]
+
+    def _refresh(self):
+        """
+        <EN>
+        Bring the in-memory storage up to date with changes made by other processes. If they only appended records
+        to the active log, just the new records are replayed; after a compaction or a log rotation the storage is
+        reloaded completely. Must be called with the write lock held.
+        """
+        """
+        <RUS>
+        Приводит хранилище в памяти в соответствие с изменениями, сделанными другими процессами. Если они только
+        дописали записи в активный журнал, воспроизводятся лишь новые записи; после сжатия или ротации журнала
+        хранилище перезагружается полностью. Должен вызываться при удерживаемой блокировке записи.
+        """
+        current = self._file_signature()
+        if current == self._signature:
+            return
+        snapshot_signature, log_inode, log_size = current
+        if (snapshot_signature, log_inode) == self._signature[:2] and log_size > self._log_offset:
+            self._log_offset = self._replay(self._log_path, self._log_offset, reindex=True)
+            self._signature = (snapshot_signature, log_inode, self._log_offset)
+            self._change_log.sync()
+            self._notify()
+        else:
+            self._load_storage()
+            self._change_log.sync()
+            self._rebuild_indexes()
+
+    @staticmethod
+    def _encode_record(operation, event_id, event) -> bytes:
+        if operation == 'put':
+            record = {'op': 'put', 'event': event.to_dict()}
+        else:
+            record = {'op': 'del', 'id': event_id}
+        return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+    @metrics.timed('storage', 'append')
+    def _commit(self, changes):
+        """
+        <EN>
+        Append the changes to the log instead of rewriting the whole storage file.
+        Starts a background compaction once the log grows past the threshold.
+        Args:
+            changes (list): A list of (operation, event_id, event) tuples.
+        Raises:
+            StorageException: If the records cannot be written to the log.
+        """
+        """
+        <RUS>
+        Дописывает изменения в журнал вместо перезаписи всего файла хранилища.
+        Запускает фоновое сжатие, когда журнал превышает пороговый размер.
+        Аргументы:
+            changes (list): Список кортежей (операция, event_id, event).
+        Вызывает:
+            StorageException: Если записи не удается записать в журнал.
+        """
+        data = b''.join(self._encode_record(*change) for change in changes)
+        try:
+            with self._log_lock:
+                if os.fstat(self._log.fileno()).st_size != self._log_offset:
+                    # A record torn by a crashed process must not be followed by new records.
+                    self._log.truncate(self._log_offset)
+                self._log.write(data)
+                self._log.flush()
+                if self._fsync:
+                    os.fsync(self._log.fileno())
+                self._log_offset = self._log.tell()
+                self._signature = self._signature[:2] + (self._log_offset,)
+        except Exception as ex:
+            raise StorageException(f"Failed to append to log: {ex}")
+        metrics.record_written('log', len(data))
+        self._log_changes(changes)
+        if self._log_offset >= self._compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        """
+        <EN>
+        Rotate the active log and write a snapshot of the current state in a background thread.
+        Records appended after the rotation go to the new log, so writers are never blocked by the compaction.
+        If a previous compaction failed and its rotated log is still present, only the snapshot is rewritten.
+        Must be called with the write lock and the exclusive file lock held.
+        """
+        """
+        <RUS>
+        Ротирует активный журнал и записывает снимок текущего состояния в фоновом потоке.
+        Записи, добавленные после ротации, попадают в новый журнал, поэтому сжатие никогда не блокирует запись.
+        Если предыдущее сжатие завершилось ошибкой и ротированный журнал еще существует, перезаписывается только снимок.
+        Должен вызываться при удерживаемых блокировке записи и исключительной блокировке файла.
+        """
+        with self._log_lock:
+            if self._compacting:
+                return
+            self._compacting = True
+            if not os.path.exists(self._old_log_path):
+                self._log.close()
+                os.replace(self._log_path, self._old_log_path)
+                self._log = open(self._log_path, 'ab')
+                self._log_offset = 0
+                self._signature = self._file_signature()
+            # Events are immutable, so a shallow copy is a consistent snapshot.
+            snapshot = dict(self._storage)
+        threading.Thread(target=self._compact, args=(snapshot,), daemon=True).start()
+
+    @metrics.timed('storage', 'compact')
+    def _compact(self, snapshot):
+        try:
+            temp_path = _write_temp(self._file_path, encode_events(snapshot, self._codec, self._compression))
+            metrics.record_written('log', os.path.getsize(temp_path))
+            with self._lock.write(), self._file_lock.exclusive():
+                os.replace(temp_path, self._file_path)
+                try:
+                    os.remove(self._old_log_path)
+                except FileNotFoundError:
+                    pass
+                # The in-memory state already contains everything in the new snapshot.
+                self._signature = (_stat_signature(self._file_path),) + self._signature[1:]
+        except Exception:
+            # The rotated log is kept, so nothing is lost and the next compaction retries the snapshot.
+            pass
+        finally:
+            with self._log_lock:
+                self._compacting = False
+
+    def close(self):
+        """
+        <EN>
+        Close the log file.
+        """
+        """
+        <RUS>
+        Закрывает файл журнала.
+        """
+        with self._log_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+class LazyLocalStorage(LocalStorage):
+    # Base of the LocalStorage variants whose event mapping decodes events on demand. The mapping provides
+    # index_items(), yielding the (event_id, date) pairs of all events without decoding them, and a 'series'
+    # dictionary of the decoded recurring series; the text and interval indexes need every event, so the first
+    # search builds the one and the first overlap query the other.
+
+    def _rebuild_indexes(self):
+        """
+        <EN>
+        Rebuild the event versions, the date index and the series indexes without decoding any single event.
+        """
+        """
+        <RUS>
+        Перестраивает версии событий, индекс по дате и индексы серий, не декодируя одиночные события.
+        """
+        self._epoch = uuid.uuid4().hex[:12]
+        self._last_modified = time.time()
+        items = list(self._storage.index_items())
+        series = []
+        for event_id, event in self._storage.series.items():
+            entry = _series_entry(event)
+            if entry is not None:
+                series.append((event_id, *entry))
+        recurring = {entry[0] for entry in series}
+        self._timed_series = {}
+        for event_id, event in self._storage.series.items():
+            interval = _interval(event)
+            if interval is not None and event_id in recurring:
+                self._timed_series[event_id] = interval
+        # Many events share a date, so every distinct date is parsed once.
+        days = {value: _parse_index_date(value) for value in {value for _, value in items}}
+        entries = [(days[value], event_id) for event_id, value in items if event_id not in recurring]
+        self._versions = {event_id: (generation, self._last_modified)
+                          for generation, (event_id, _) in enumerate(items, 1)}
+        self._generation = len(self._versions)
+        self._date_index.rebuild(entries)
+        self._series_index.rebuild(series)
+        self._timed_series_index.rebuild(entry for entry in series if entry[0] in self._timed_series)
+        self._interval_index.rebuild(())
+        self._intervals_indexed = False
+        self._text_index.rebuild(())
+        self._text_indexed = False
+        self._notify()
+
+    def search(self, query: str, limit: int = 50) -> List[Event]:
+        """
+        <EN>
+        Find events containing every word of the query as a word prefix in the title or text. The first search
+        decodes every event to build the text index; later searches use the index.
+        Args:
+            query (str): Words to search for.
+            limit (int): Maximum number of events to return.
+        Returns:
+            List[Event]: A list of Event instances, best matches first.
+        """
+        """
+        <RUS>
+        Находит события, содержащие каждое слово запроса как префикс слова в заголовке или тексте. Первый поиск
+        декодирует все события, чтобы построить текстовый индекс; последующие поиски используют индекс.
+        Аргументы:
+            query (str): Слова для поиска.
+            limit (int): Максимальное количество возвращаемых событий.
+        Возвращает:
+            List[Event]: Список экземпляров Event, лучшие совпадения первыми.
+        """
+        with self._reading():
+            if self._text_indexed:
+                return [self._storage[event_id] for event_id in self._text_index.search(query, limit)]
+        with self._lock.write(), self._file_lock.shared():
+            self._refresh()
+            if not self._text_indexed:
+                self._text_index.rebuild((event.id, event.title, event.text) for event in self._storage.values())
+                self._text_indexed = True
+            return [self._storage[event_id] for event_id in self._text_index.search(query, limit)]
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        """
+        <EN>
+        Find the timed events overlapping the window [start, end). The first query decodes every event to build
+        the interval index; later queries use the index.
+        Args:
+            start (datetime): Start of the window, inclusive.
+            end (datetime): End of the window, exclusive.
+        Returns:
+            List[Event]: Events and occurrences ordered by start and ID.
+        """
+        """
+        <RUS>
+        Находит события со временем, пересекающиеся с окном [start, end). Первый запрос декодирует все события,
+        чтобы построить индекс интервалов; последующие запросы используют индекс.
+        Аргументы:
+            start (datetime): Начало окна включительно.
+            end (datetime): Конец окна не включительно.
+        Возвращает:
+            List[Event]: События и повторения, упорядоченные по началу и ID.
+        """
+        with self._reading():
+            if self._intervals_indexed:
+                return self._overlapping(start, end)
+        with self._lock.write(), self._file_lock.shared():
+            self._refresh()
+            return self._overlapping(start, end)
+
+    def _overlapping(self, start: datetime, end: datetime) -> List[Event]:
+        # Must be called with the write lock held until the interval index is built.
+        if not self._intervals_indexed:
+            intervals = ((event.id, _interval(event)) for event in self._storage.values() if event.rrule is None)
+            self._interval_index.rebuild((event_id, *interval) for event_id, interval in intervals
+                                         if interval is not None)
+            self._intervals_indexed = True
+        return super()._overlapping(start, end)
+
+
+def _index_date(event: Event) -> date:
+    return _parse_index_date(event.date)
+
+
+def _parse_index_date(value: str) -> date:
+    try:
+        return parse_date(value)
+    except ValueError:
+        # Events saved before dates were validated are kept at the start of the index.
+        return date.min
+
+
+def _series_entry(event: Event) -> Optional[Tuple[date, Rule, frozenset]]:
+    # Returns the (first date, rule, cancelled dates) of a series, or None for an event that does not recur.
+    if event.rrule is None:
+        return None
+    try:
+        first = parse_date(event.date)
+        rule = parse_rule(event.rrule)
+    except ValueError:
+        return None
+    exdates = set()
+    for value in event.exdates:
+        try:
+            exdates.add(parse_date(value))
+        except ValueError:
+            pass
+    return first, rule, frozenset(exdates)
+
+
+def _occurrence(event: Event, day: date) -> Event:
+    return event if event.rrule is None else event.occurrence(day)
+
+
+def _interval(event: Event) -> Optional[Tuple[datetime, datetime]]:
+    # Returns the (start, end) of a timed event, or of the first occurrence of a timed series, or None.
+    if event.start is None:
+        return None
+    try:
+        start, end = parse_datetime(event.start), parse_datetime(event.end)
+    except ValueError:
+        return None
+    return (start, end) if start < end else None
+
+
+def _start_key(event: Event) -> Tuple[datetime, str]:
+    return parse_datetime(event.start), event.id
+
+
+def _series_overlapping(index: SeriesIndex, intervals, events, start: datetime, end: datetime) -> Iterator[Event]:
+    # Yields the occurrences of the timed series in the index overlapping the window. An occurrence may begin on an
+    # earlier day than the window, by up to the longest duration among the series.
+    longest = max(interval_end - interval_start for interval_start, interval_end in intervals.values())
+    for day, event_id in index.range((start - longest).date(), end.date()):
+        interval_start, interval_end = intervals[event_id]
+        shift = day - interval_start.date()
+        if interval_start + shift < end and interval_end + shift > start:
+            yield events[event_id].occurrence(day)
+
+
+def _conflicts(event: Event, overlapping) -> List[Event]:
+    # Returns the events overlapping a timed event, or any occurrence of a timed series within CONFLICT_HORIZON,
+    # found with the given overlapping(start, end) function.
+    interval = _interval(event)
+    if interval is None:
+        return []
+    entry = _series_entry(event)
+    if entry is None:
+        return overlapping(*interval)
+    first, rule, exdates = entry
+    conflicts = {}
+    for day in occurrences(first, rule, first, first + CONFLICT_HORIZON, exdates):
+        shift = day - first
+        for conflict in overlapping(interval[0] + shift, interval[1] + shift):
+            conflicts.setdefault((conflict.id, conflict.date), conflict)
+    return sorted(conflicts.values(), key=_start_key)
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _file_size(path) -> int:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _write_temp(file_path, data: bytes) -> str:
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    return temp_path
+
+
+def _write_atomic(file_path, data: bytes):
+    os.replace(_write_temp(file_path, data), file_path)